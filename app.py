@@ -13,11 +13,18 @@ from config import APP_CONFIG
 from routes import routes, auto_preload_job
 from data_manager import (
     load_state,
+    load_worker_registry,
+    save_worker_registry,
+    flush_state,
+    flush_schedule_backups,
+    refresh_shared_state,
+    publish_schedule_changes,
     check_and_perform_daily_reset,
     modality_data,
     allowed_modalities,
     attempt_initialize_data,
-    lock
+    load_live_snapshot,
+    schedule_snapshot_path
 )
 from lib.utils import selection_logger
 
@@ -40,21 +47,33 @@ app.register_blueprint(routes)
 # -----------------------------------------------------------
 scheduler = BackgroundScheduler()
 
-# Daily reset check runs on every request
+# Shared-state sync and daily reset check run on every request
 @app.before_request
 def before_request_hook():
+    refresh_shared_state()
     check_and_perform_daily_reset()
 
+@app.after_request
+def after_request_hook(response):
+    publish_schedule_changes()
+    return response
+
 # Schedule auto-preload daily from Master CSV
 preload_hour = APP_CONFIG.get('scheduler', {}).get('auto_preload_time', 14)
 scheduler.add_job(auto_preload_job, 'cron', hour=preload_hour, minute=0)
 scheduler.start()
 atexit.register(lambda: scheduler.shutdown())
+# Drain the write-behind state writer (journal + final snapshot) on shutdown
+atexit.register(flush_state)
+# Write schedule backups still waiting for their debounce window
+atexit.register(flush_schedule_backups)
+atexit.register(save_worker_registry)
 
 # -----------------------------------------------------------
 # Startup Logic
 # -----------------------------------------------------------
 def startup_initialization():
+    load_worker_registry()
     load_state()
     
     # Check for master CSV existence
@@ -72,11 +91,23 @@ def startup_initialization():
         # Priority 3: Start empty
         
         backup_dir = os.path.join(app.config['UPLOAD_FOLDER'], "backups")
+        live_snapshot = schedule_snapshot_path(mod)
         live_backup = os.path.join(backup_dir, f"Cortex_{mod.upper()}_live.xlsx")
         
         loaded = False
-        
-        if os.path.exists(live_backup):
+
+        # Priority 0: schedule already published by another worker process
+        if d['working_hours_df'] is not None:
+            selection_logger.info(f"Using shared schedule for {mod}")
+            loaded = True
+
+        if not loaded and os.path.exists(live_snapshot):
+            selection_logger.info(f"Attempting to load LIVE snapshot for {mod}: {live_snapshot}")
+            if load_live_snapshot(mod):
+                loaded = True
+
+        # Legacy Excel backup (written before snapshots existed)
+        if not loaded and not os.path.exists(live_snapshot) and os.path.exists(live_backup):
             selection_logger.info(f"Attempting to load LIVE backup for {mod}: {live_backup}")
             if attempt_initialize_data(live_backup, mod, context='startup backup'):
                 loaded = True
@@ -89,6 +120,8 @@ def startup_initialization():
         if not loaded:
             selection_logger.warning(f"Starting {mod} with EMPTY data (no valid backup or default file).")
 
+    publish_schedule_changes()
+
 
 # -----------------------------------------------------------
 # Main Entry Point
@@ -20,6 +20,8 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 MASTER_CSV_PATH = os.path.join(UPLOAD_FOLDER, 'master_medweb.csv')
 STATE_FILE_PATH = os.path.join(UPLOAD_FOLDER, 'fairness_state.json')
+STATE_JOURNAL_PATH = os.path.join(UPLOAD_FOLDER, 'fairness_journal.jsonl')
+WORKER_IDS_PATH = os.path.join(UPLOAD_FOLDER, 'worker_ids.json')
 
 os.makedirs('logs', exist_ok=True)
 selection_logger.setLevel(logging.INFO)
@@ -44,6 +46,9 @@ DEFAULT_BALANCER = {
     'allow_fallback_on_imbalance': True,
     'disable_overflow_at_shift_start_minutes': 0,  # 0 = disabled
     'disable_overflow_at_shift_end_minutes': 0,  # 0 = disabled
+    'work_hours_cache_seconds': 60,  # 0 = recompute hours worked on every request
+    'precompute_next_assignee': True,  # keep the next winner per (modality, role) ready
+    'max_batch_assignments': 100,  # cases per /api/assign-batch call (keeps the locked pass short)
 }
 
 # -----------------------------------------------------------
@@ -150,6 +155,16 @@ def _build_app_config() -> Dict[str, Any]:
         'auto_preload_time': 14
     })
 
+    # Shared state backend (needed for more than one gunicorn worker)
+    state_backend_config = raw_config.get('state_backend', {})
+    if not isinstance(state_backend_config, dict):
+        state_backend_config = {}
+    config['state_backend'] = {
+        'type': str(state_backend_config.get('type', 'local')),
+        'path': state_backend_config.get('path') or os.path.join(UPLOAD_FOLDER, 'cortex_state.sqlite'),
+        'timeout_seconds': coerce_float(state_backend_config.get('timeout_seconds', 30.0), 30.0)
+    }
+
     # Auto-import toggle for worker skill roster
     config['skill_roster_auto_import'] = bool(
         raw_config.get('skill_roster_auto_import', True)
@@ -339,6 +354,17 @@ def normalize_modality(modality_value: Optional[str]) -> str:
     return allowed_modalities_map.get(modality_value_lower, default_modality)
 
 
+def normalize_role(role: Optional[str]) -> Optional[str]:
+    """
+    Role slug of an assignment request; unknown roles fall back to 'normal'.
+    None if neither the role nor 'normal' is configured.
+    """
+    role_lower = (role or '').strip().lower()
+    if role_lower in ROLE_MAP:
+        return role_lower
+    return 'normal' if 'normal' in ROLE_MAP else None
+
+
 def normalize_skill(skill_name: Optional[str]) -> str:
     if not skill_name:
         return SKILL_COLUMNS[0] if SKILL_COLUMNS else ''
@@ -1,12 +1,16 @@
 # Standard library imports
+import io
 import os
 import json
 import copy
 import shutil
 import logging
-from threading import Lock
-from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from threading import Lock, RLock, Event, Thread
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from datetime import datetime, time, timedelta, date
+from time import monotonic
 from pathlib import Path
 
 # Third-party imports
@@ -26,6 +30,8 @@ from config import (
     UPLOAD_FOLDER,
     MASTER_CSV_PATH,
     STATE_FILE_PATH,
+    STATE_JOURNAL_PATH,
+    WORKER_IDS_PATH,
     normalize_modality
 )
 from lib.utils import (
@@ -33,6 +39,9 @@ from lib.utils import (
     get_local_berlin_now,
     parse_time_range,
     compute_shift_window,
+    compact_schedule_df,
+    expand_schedule_df,
+    set_schedule_skill_value,
     calculate_shift_duration_hours,
     validate_excel_structure,
     normalize_skill_value,
@@ -41,18 +50,58 @@ from lib.utils import (
     get_next_workday,
     coerce_float
 )
+from lib.state_backend import create_state_backend
+from lib.worker_counters import AssignmentCounts, WeightedCounts, WorkerIndex
+from lib.worker_registry import WorkerNameRegistry
+from lib.intervals import (
+    align_to_shift,
+    interval_from_times,
+    minutes_to_time,
+    overlaps,
+    subtract_intervals,
+    resolve_later_wins,
+)
 
 # -----------------------------------------------------------
 # Global State & Locks
 # -----------------------------------------------------------
-lock = Lock()
+# Lock order (always acquire left to right, never the reverse):
+#   state_backend transaction -> lock -> modality_locks (allowed_modalities order)
+#   -> counts_lock -> _journal_lock
+# An assignment holds only its modality's lock (plus counts_lock briefly for
+# the cross-modality weighted counts), so CT and MR requests run in parallel.
+# Whole-state sections (schedule loads, resets, snapshots, shared sync) hold
+# lock *and* every modality lock; see whole_state_locked(). Code holding only a
+# modality lock must never enter a whole-state section.
+lock = RLock()  # Re-entrant so state_transaction() sections can nest
+modality_locks = {mod: RLock() for mod in allowed_modalities}
+counts_lock = Lock()  # Read-modify-write of global_worker_data['weighted_counts']
+
+# Where counters and schedules are shared between worker processes (see state_transaction)
+state_backend = create_state_backend(APP_CONFIG.get('state_backend'))
+
+# Cross-modality counters are NumPy arrays indexed by interned worker codes
+# (lib/worker_counters.py); they keep the dict-shaped API of
+# {worker_id: count} and {mod: {worker_id: {skill: n, 'total': n}}}.
+worker_index = WorkerIndex()  # Canonical worker ID -> dense code, shared by all counters
+
+def new_weighted_counts(data: Optional[Dict[str, float]] = None) -> WeightedCounts:
+    return WeightedCounts(worker_index, data)
+
+def new_assignment_counts(data: Optional[Dict[str, Any]] = None) -> AssignmentCounts:
+    return AssignmentCounts(worker_index, allowed_modalities, SKILL_COLUMNS, data)
+
+# Name variants <-> canonical worker IDs; compacted at the daily reset and
+# persisted to WORKER_IDS_PATH, separately from the fairness state
+WORKER_ID_RETENTION_DAYS = 30    # Evict variants not seen for this many daily resets
+WORKER_ID_MAX_VARIANTS = 5000    # Hard limit, least recently seen evicted first
+worker_registry = WorkerNameRegistry(max_variants=WORKER_ID_MAX_VARIANTS)
 
 # Global worker data structure for cross-modality tracking
 global_worker_data = {
-    'worker_ids': {},  # Map of worker name variations to canonical ID
     # Single global weighted counts (consolidated across all modalities):
-    'weighted_counts': {},  # {worker_id: count}
-    'assignments_per_mod': {mod: {} for mod in allowed_modalities},
+    'weighted_counts': new_weighted_counts(),  # {worker_id: count}
+    'assignments_per_mod': new_assignment_counts(),
     'last_reset_date': None  # Global reset date tracker
 }
 
@@ -66,10 +115,12 @@ for mod in allowed_modalities:
         'worker_modifiers': {},
         'draw_counts': {},
         'skill_counts': {skill: {} for skill in SKILL_COLUMNS},
-        'WeightedCounts': {},
         'last_uploaded_filename': f"Cortex_{mod.upper()}.xlsx",
         'default_file_path': os.path.join(UPLOAD_FOLDER, f"Cortex_{mod.upper()}.xlsx"),
         'scheduled_file_path': os.path.join(UPLOAD_FOLDER, f"Cortex_{mod.upper()}_scheduled.xlsx"),
+        'schedule_version': 0,  # Bumped on every schedule load/edit (see mark_schedule_changed)
+        'rows_base_version': 0, # Version of the last full replacement (row deltas start here)
+        'row_versions': {},     # {row_index: version of its last edit} since rows_base_version
         'last_reset_date': None
     }
 
@@ -85,9 +136,38 @@ for mod in allowed_modalities:
         'staged_file_path': os.path.join(UPLOAD_FOLDER, "backups", f"Cortex_{mod.upper()}_staged.xlsx"),
         'last_modified': None,
         'last_prepped_at': None,
-        'last_prepped_by': None
+        'last_prepped_by': None,
+        'schedule_version': 0,
+        'rows_base_version': 0,
+        'row_versions': {}
     }
 
+_WHOLE_STATE_LOCKS = [lock] + [modality_locks[mod] for mod in allowed_modalities]
+
+def acquire_whole_state(timeout: float = -1) -> bool:
+    """Acquire lock and every modality lock in lock order; False on timeout."""
+    acquired = []
+    for state_lock in _WHOLE_STATE_LOCKS:
+        if not state_lock.acquire(timeout=timeout):
+            for held in reversed(acquired):
+                held.release()
+            return False
+        acquired.append(state_lock)
+    return True
+
+def release_whole_state() -> None:
+    for state_lock in reversed(_WHOLE_STATE_LOCKS):
+        state_lock.release()
+
+@contextmanager
+def whole_state_locked():
+    """Exclude every other reader/writer of the balancer state."""
+    acquire_whole_state()
+    try:
+        yield
+    finally:
+        release_whole_state()
+
 # JSON worker skill roster (loaded dynamically)
 worker_skill_json_roster = {}
 
@@ -96,31 +176,67 @@ worker_skill_json_roster = {}
 # -----------------------------------------------------------
 def get_canonical_worker_id(worker_name: str) -> str:
     """Map worker name variations to a single canonical identifier."""
-    worker_name = '' if worker_name is None else str(worker_name)
-    worker_key = worker_name.strip()
+    return worker_registry.canonical_id(worker_name)
 
-    if worker_key in global_worker_data['worker_ids']:
-        return global_worker_data['worker_ids'][worker_key]
 
-    canonical_id = worker_key
-    abk_match = worker_key.split('(')
-    if len(abk_match) > 1 and ')' in abk_match[1]:
-        abbreviation = abk_match[1].split(')')[0].strip()
-        if abbreviation:
-            canonical_id = abbreviation
+def get_all_workers_by_canonical_id():
+    return worker_registry.by_canonical_id()
+
 
-    canonical_id = canonical_id or worker_key
-    global_worker_data['worker_ids'][worker_key] = canonical_id
-    return canonical_id
+def load_worker_registry() -> None:
+    """Load the name variant registry saved by save_worker_registry()."""
+    if not os.path.exists(WORKER_IDS_PATH):
+        return
+    try:
+        with open(WORKER_IDS_PATH, 'r', encoding='utf-8') as f:
+            worker_registry.load(json.load(f))
+        selection_logger.info(f"Loaded {len(worker_registry)} worker name variants")
+    except Exception as e:
+        selection_logger.error(f"Failed to load worker name registry: {str(e)}", exc_info=True)
 
 
-def get_all_workers_by_canonical_id():
-    canonical_to_variations = {}
-    for name, canonical in global_worker_data['worker_ids'].items():
-        if canonical not in canonical_to_variations:
-            canonical_to_variations[canonical] = []
-        canonical_to_variations[canonical].append(name)
-    return canonical_to_variations
+def save_worker_registry() -> None:
+    try:
+        tmp_path = f"{WORKER_IDS_PATH}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(worker_registry.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, WORKER_IDS_PATH)
+    except Exception as e:
+        selection_logger.error(f"Failed to save worker name registry: {str(e)}", exc_info=True)
+
+
+def compact_worker_registry() -> int:
+    """Evict stale name variants (daily reset); names on current schedules are kept."""
+    keep = set()
+    for source in (modality_data, staged_modality_data):
+        for d in source.values():
+            df = d.get('working_hours_df')
+            if df is not None and 'PPL' in df.columns:
+                keep.update(str(name) for name in df['PPL'].unique())
+    evicted = worker_registry.compact(keep, max_idle_epochs=WORKER_ID_RETENTION_DAYS)
+    save_worker_registry()
+    if evicted:
+        selection_logger.info(f"Evicted {evicted} stale worker name variants")
+    return evicted
+
+
+def compact_worker_index() -> int:
+    """
+    Drop counter slots of workers that are neither registered nor counted
+    (daily reset, after compact_worker_registry()). Caller holds the whole state.
+    """
+    weighted = global_worker_data['weighted_counts'].to_dict()
+    assignments = global_worker_data['assignments_per_mod'].to_dict()
+    keep = set(worker_registry.by_canonical_id()) | set(weighted)
+    for workers in assignments.values():
+        keep.update(workers)
+    dropped = worker_index.compact(keep)
+    if dropped:
+        # Codes were renumbered: rebuild the arrays indexed by them
+        global_worker_data['weighted_counts'] = new_weighted_counts(weighted)
+        global_worker_data['assignments_per_mod'] = new_assignment_counts(assignments)
+        selection_logger.info(f"Compacted worker index: dropped {dropped} IDs, {len(worker_index)} left")
+    return dropped
 
 
 def load_worker_skill_json() -> Dict[str, Any]:
@@ -270,16 +386,131 @@ def get_merged_worker_roster(config: Dict[str, Any]) -> Dict[str, Any]:
 # -----------------------------------------------------------
 # State Persistence
 # -----------------------------------------------------------
-def save_state():
+# Assignments are appended to a compact journal (one JSON line per assignment)
+# instead of rewriting the whole state file each time. save_state() requests a
+# full snapshot of STATE_FILE_PATH, after which the journal is truncated
+# (compaction); load_state() loads the snapshot and replays newer records.
+#
+# All disk I/O happens on a background write-behind thread: request handlers
+# only queue journal lines / snapshot requests and wake the writer, which
+# coalesces them. Snapshots are written to a temp file and atomically renamed.
+# flush_state() drains everything synchronously (registered via atexit).
+STATE_JOURNAL_FSYNC_EVERY = 20      # fsync the journal after this many records
+STATE_JOURNAL_COMPACT_EVERY = 500   # compact into the snapshot after this many records
+STATE_WRITER_INTERVAL_SECONDS = 1.0 # idle wake-up to fsync stragglers
+
+_journal_lock = Lock()   # Guards _journal_state (cheap, never held during I/O)
+_state_io_lock = Lock()  # Serializes journal/snapshot file I/O
+_journal_state = {
+    'file': None,                # Open append handle (writer thread only)
+    'seq': 0,                    # Sequence number of the last journal record
+    'pending': [],               # Serialized records not yet written
+    'unsynced': 0,               # Records written since the last fsync
+    'since_compaction': 0,       # Records queued since the last snapshot
+    'snapshot_requested': False  # Coalesced save_state() requests
+}
+_state_writer = {
+    'thread': None,
+    'wakeup': Event()
+}
+
+def _apply_assignment_record(record: Dict[str, Any]) -> None:
+    """Apply one journaled assignment to the in-memory counters."""
+    modality = record.get('mod')
+    if modality not in modality_data:
+        return
+    person = record.get('ppl', '')
+    canonical_id = record.get('id') or person
+    skill = record.get('skill')
+    weight = coerce_float(record.get('w', 0.0), 0.0)
+
+    d = modality_data[modality]
+    d['draw_counts'][person] = d['draw_counts'].get(person, 0) + 1
+    if skill in SKILL_COLUMNS:
+        skill_counts = d['skill_counts'].setdefault(skill, {})
+        skill_counts[person] = skill_counts.get(person, 0) + 1
+
+    worker_registry.register(str(person).strip(), canonical_id)
+    global_worker_data['weighted_counts'].add(canonical_id, weight)
+    global_worker_data['assignments_per_mod'].add(modality, canonical_id, skill)
+
+def _open_state_journal():
+    # Caller holds _state_io_lock
+    if _journal_state['file'] is None:
+        journal = open(STATE_JOURNAL_PATH, 'a+', encoding='utf-8')
+        # Terminate a torn final line left by a crash so the next record stays readable
+        if journal.tell() > 0:
+            journal.seek(journal.tell() - 1)
+            if journal.read(1) != '\n':
+                journal.write('\n')
+        _journal_state['file'] = journal
+    return _journal_state['file']
+
+def _wake_state_writer() -> None:
+    thread = _state_writer['thread']
+    if thread is None or not thread.is_alive():
+        thread = Thread(target=_state_writer_loop, name='state-writer', daemon=True)
+        _state_writer['thread'] = thread
+        thread.start()
+    _state_writer['wakeup'].set()
+
+def record_assignment(modality: str, person: str, canonical_id: str, skill: str, weight: float) -> None:
+    """
+    Queue one assignment record for the fairness journal.
+
+    Cost in the request path is O(1) and involves no disk I/O; the writer
+    thread appends the record, fsyncs in batches of STATE_JOURNAL_FSYNC_EVERY
+    and compacts into the snapshot every STATE_JOURNAL_COMPACT_EVERY records.
+
+    With a shared backend the record is appended to the shared event log
+    instead; the caller holds state_transaction(), so it commits together
+    with the selection that produced it.
+    """
+    shared = state_backend.shared
     try:
+        record = {
+            'ts': get_local_berlin_now().isoformat(timespec='seconds'),
+            'mod': modality,
+            'ppl': person,
+            'id': canonical_id,
+            'skill': skill,
+            'w': weight,
+        }
+        if shared:
+            _shared_sync['seq'] = state_backend.append_assignment(record)
+        with _journal_lock:
+            if not shared:
+                _journal_state['seq'] += 1
+                record['seq'] = _journal_state['seq']
+                _journal_state['pending'].append(
+                    json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+                )
+            _journal_state['since_compaction'] += 1
+            if _journal_state['since_compaction'] >= STATE_JOURNAL_COMPACT_EVERY:
+                _journal_state['snapshot_requested'] = True
+        _wake_state_writer()
+    except Exception as e:
+        selection_logger.error(f"Failed to journal assignment: {str(e)}", exc_info=True)
+        if shared:
+            # Local counters now run ahead of the shared log: rebuild them on the next sync
+            _shared_sync['snapshot_generation'] = -1
+
+def _capture_state_snapshot(timeout: float = -1) -> Optional[Tuple[str, int]]:
+    """Serialize the current state under the whole-state lock; returns (json, journal_seq)."""
+    if not acquire_whole_state(timeout):
+        return None
+    try:
+        with _journal_lock:
+            seq = _shared_sync['seq'] if state_backend.shared else _journal_state['seq']
+            _journal_state['since_compaction'] = 0
         state = {
             'global_worker_data': {
-                'worker_ids': global_worker_data['worker_ids'],
-                'weighted_counts': global_worker_data['weighted_counts'],
-                'assignments_per_mod': global_worker_data['assignments_per_mod'],
+                'weighted_counts': global_worker_data['weighted_counts'].to_dict(),
+                'assignments_per_mod': global_worker_data['assignments_per_mod'].to_dict(),
                 'last_reset_date': global_worker_data['last_reset_date'].isoformat() if global_worker_data['last_reset_date'] else None
             },
-            'modality_data': {}
+            'modality_data': {},
+            'journal_seq': seq
         }
 
         for mod in allowed_modalities:
@@ -287,53 +518,404 @@ def save_state():
             state['modality_data'][mod] = {
                 'draw_counts': d['draw_counts'],
                 'skill_counts': d['skill_counts'],
-                'WeightedCounts': d['WeightedCounts'],
                 'last_reset_date': d['last_reset_date'].isoformat() if d['last_reset_date'] else None,
                 'last_uploaded_filename': d['last_uploaded_filename']
             }
 
-        with open(STATE_FILE_PATH, 'w') as f:
-            json.dump(state, f, indent=2)
+        return json.dumps(state, indent=2), seq
+    finally:
+        release_whole_state()
 
+def _write_state_snapshot(timeout: float = -1) -> bool:
+    # Caller holds _state_io_lock
+    captured = _capture_state_snapshot(timeout)
+    if captured is None:
+        selection_logger.warning("State snapshot skipped: data lock busy")
+        return False
+    payload, _ = captured
+
+    tmp_path = f"{STATE_FILE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, STATE_FILE_PATH)
+
+    # Every record already in the journal file is covered by the snapshot;
+    # records still pending are newer (or skipped on replay by seq).
+    if _journal_state['file'] is not None:
+        _journal_state['file'].close()
+        _journal_state['file'] = None
+    with open(STATE_JOURNAL_PATH, 'w', encoding='utf-8'):
+        pass
+    _journal_state['unsynced'] = 0
+    return True
+
+def _write_pending_state(force_snapshot: bool = False, fsync: bool = False, timeout: float = -1) -> bool:
+    """
+    Append pending journal records and write a snapshot if one is requested.
+    Returns whether a snapshot was written. Errors propagate to the caller,
+    which logs them. Caller holds _state_io_lock.
+    """
+    with _journal_lock:
+        lines = _journal_state['pending']
+        _journal_state['pending'] = []
+        snapshot = _journal_state['snapshot_requested'] or force_snapshot
+        _journal_state['snapshot_requested'] = False
+
+    if lines:
+        journal = _open_state_journal()
+        journal.write('\n'.join(lines) + '\n')
+        journal.flush()
+        _journal_state['unsynced'] += len(lines)
+
+    journal = _journal_state['file']
+    if journal is not None and _journal_state['unsynced'] and (
+        fsync or _journal_state['unsynced'] >= STATE_JOURNAL_FSYNC_EVERY
+    ):
+        os.fsync(journal.fileno())
+        _journal_state['unsynced'] = 0
+
+    if not snapshot:
+        return False
+    written = False
+    try:
+        if state_backend.shared:
+            written = _write_shared_snapshot(timeout)
+        else:
+            written = _write_state_snapshot(timeout)
+    finally:
+        if not written:
+            # Keep the request so the next wake-up retries the snapshot
+            with _journal_lock:
+                _journal_state['snapshot_requested'] = True
+    if written:
         selection_logger.debug("State saved successfully")
+    return written
+
+def _state_writer_loop() -> None:
+    wakeup = _state_writer['wakeup']
+    while True:
+        woken = wakeup.wait(timeout=STATE_WRITER_INTERVAL_SECONDS)
+        wakeup.clear()
+        try:
+            with _state_io_lock:
+                # On idle wake-ups, fsync whatever is still unsynced
+                _write_pending_state(fsync=not woken)
+        except Exception as e:
+            selection_logger.error(f"Failed to save state: {str(e)}", exc_info=True)
+
+def save_state(wait: bool = False):
+    """
+    Request a full snapshot of the fairness state (written by the background writer).
+
+    With a shared backend, ``wait=True`` writes the snapshot immediately so
+    other worker processes pick up resets on their next sync; call it inside
+    state_transaction().
+    """
+    if wait and state_backend.shared:
+        if not _write_shared_snapshot():
+            selection_logger.warning("Shared state snapshot skipped")
+        return
+    with _journal_lock:
+        _journal_state['snapshot_requested'] = True
+    _wake_state_writer()
+
+def flush_state(timeout: float = 5.0) -> None:
+    """Synchronously write pending journal records and a final snapshot (shutdown hook)."""
+    try:
+        with _state_io_lock:
+            written = _write_pending_state(force_snapshot=True, fsync=True, timeout=timeout)
+        if written:
+            selection_logger.info("State flushed to disk")
+        else:
+            selection_logger.warning("State flush wrote the journal only: snapshot skipped")
     except Exception as e:
-        selection_logger.error(f"Failed to save state: {str(e)}", exc_info=True)
+        selection_logger.error(f"Failed to flush state: {str(e)}", exc_info=True)
+
+def _replay_state_journal(snapshot_seq: int) -> int:
+    """Replay journal records newer than ``snapshot_seq``. Returns the number applied."""
+    if not os.path.exists(STATE_JOURNAL_PATH):
+        return 0
+
+    applied = 0
+    last_seq = snapshot_seq
+    with open(STATE_JOURNAL_PATH, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line after a crash is expected; skip it
+                selection_logger.warning(f"Skipping unreadable journal line {line_no}")
+                continue
+            seq = record.get('seq', 0)
+            if seq <= snapshot_seq:
+                continue
+            _apply_assignment_record(record)
+            last_seq = max(last_seq, seq)
+            applied += 1
+
+    with _state_io_lock:
+        # Reopen on the next append so a torn final line gets terminated first
+        if _journal_state['file'] is not None:
+            _journal_state['file'].close()
+            _journal_state['file'] = None
+    with _journal_lock:
+        _journal_state['seq'] = max(_journal_state['seq'], last_seq)
+        _journal_state['since_compaction'] = applied
+    return applied
+
+def _apply_state_payload(state: Dict[str, Any]) -> None:
+    """Replace the in-memory counters with a deserialized state snapshot."""
+    if 'global_worker_data' in state:
+        gwd = state['global_worker_data']
+        # State files written before the registry had its own file
+        worker_registry.load(gwd.get('worker_ids'))
+        global_worker_data['weighted_counts'] = new_weighted_counts(gwd.get('weighted_counts'))
+        global_worker_data['assignments_per_mod'] = new_assignment_counts(gwd.get('assignments_per_mod'))
+
+        last_reset_str = gwd.get('last_reset_date')
+        if last_reset_str:
+            global_worker_data['last_reset_date'] = datetime.fromisoformat(last_reset_str).date()
+
+    if 'modality_data' in state:
+        for mod in allowed_modalities:
+            if mod in state['modality_data']:
+                mod_state = state['modality_data'][mod]
+                modality_data[mod]['draw_counts'] = mod_state.get('draw_counts', {})
+                modality_data[mod]['skill_counts'] = mod_state.get('skill_counts', {skill: {} for skill in SKILL_COLUMNS})
+                modality_data[mod]['last_uploaded_filename'] = mod_state.get('last_uploaded_filename', f"Cortex_{mod.upper()}.xlsx")
+
+                last_reset_str = mod_state.get('last_reset_date')
+                if last_reset_str:
+                    modality_data[mod]['last_reset_date'] = datetime.fromisoformat(last_reset_str).date()
 
 def load_state():
+    if state_backend.shared:
+        with state_transaction():
+            if state_backend.snapshot_generation() or state_backend.has_assignments():
+                selection_logger.info("State loaded from shared backend")
+                return
+        # First start on a fresh shared backend: seed it from the local state files below
+
+    snapshot_seq = 0
     if not os.path.exists(STATE_FILE_PATH):
         selection_logger.info("No saved state found, starting fresh")
-        return
+    else:
+        try:
+            with open(STATE_FILE_PATH, 'r') as f:
+                state = json.load(f)
+
+            _apply_state_payload(state)
+
+            snapshot_seq = int(state.get('journal_seq', 0) or 0)
+            with _journal_lock:
+                _journal_state['seq'] = max(_journal_state['seq'], snapshot_seq)
+            selection_logger.info("State loaded successfully from disk")
+        except Exception as e:
+            selection_logger.error(f"Failed to load state: {str(e)}", exc_info=True)
 
     try:
-        with open(STATE_FILE_PATH, 'r') as f:
-            state = json.load(f)
+        replayed = _replay_state_journal(snapshot_seq)
+        if replayed:
+            selection_logger.info(f"Replayed {replayed} journaled assignments")
+    except Exception as e:
+        selection_logger.error(f"Failed to replay state journal: {str(e)}", exc_info=True)
 
-        if 'global_worker_data' in state:
-            gwd = state['global_worker_data']
-            global_worker_data['worker_ids'] = gwd.get('worker_ids', {})
-            global_worker_data['weighted_counts'] = gwd.get('weighted_counts', {})
-            global_worker_data['assignments_per_mod'] = gwd.get('assignments_per_mod', {mod: {} for mod in allowed_modalities})
+    if state_backend.shared:
+        with state_transaction():
+            save_state(wait=True)
 
-            last_reset_str = gwd.get('last_reset_date')
-            if last_reset_str:
-                global_worker_data['last_reset_date'] = datetime.fromisoformat(last_reset_str).date()
+# -----------------------------------------------------------
+# Shared State (multi-process)
+# -----------------------------------------------------------
+# With a shared backend (state_backend.type: sqlite) every gunicorn worker keeps
+# its own working copy of the dicts above and syncs it from the backend:
+#   - assignments: append-only event log, replayed with _apply_assignment_record
+#   - resets/compaction: full snapshots (same payload as STATE_FILE_PATH)
+#   - schedules: versioned per key ("live:ct", "staged:mr", ...), published at
+#     the end of each request by publish_schedule_changes(); the DataFrame is
+#     stored as Parquet bytes, the other fields as JSON (nothing is unpickled);
+#     row versions ride along in backend version numbers (shared_* keys)
+# state_transaction() holds the backend write lock plus the whole-state lock, so
+# sync -> select -> record in _assign_worker is atomic across processes.
+SHARED_SCHEDULE_FIELDS = (
+    'working_hours_df', 'info_texts', 'total_work_hours', 'worker_modifiers',
+    'last_uploaded_filename', 'last_modified', 'last_prepped_at', 'last_prepped_by'
+)
 
-        if 'modality_data' in state:
-            for mod in allowed_modalities:
-                if mod in state['modality_data']:
-                    mod_state = state['modality_data'][mod]
-                    modality_data[mod]['draw_counts'] = mod_state.get('draw_counts', {})
-                    modality_data[mod]['skill_counts'] = mod_state.get('skill_counts', {skill: {} for skill in SKILL_COLUMNS})
-                    modality_data[mod]['WeightedCounts'] = mod_state.get('WeightedCounts', {})
-                    modality_data[mod]['last_uploaded_filename'] = mod_state.get('last_uploaded_filename', f"Cortex_{mod.upper()}.xlsx")
-
-                    last_reset_str = mod_state.get('last_reset_date')
-                    if last_reset_str:
-                        modality_data[mod]['last_reset_date'] = datetime.fromisoformat(last_reset_str).date()
-
-        selection_logger.info("State loaded successfully from disk")
+_shared_sync = {
+    'seq': 0,                  # Last assignment event applied locally
+    'snapshot_generation': 0,  # Last snapshot applied locally
+    'schedule_versions': {},   # {schedule key: version applied locally}
+    'dirty': {}                # {schedule key: rows edited locally (None: replaced)}, not yet published
+}
+
+def _schedule_key(modality: str, use_staged: bool) -> str:
+    return f"{'staged' if use_staged else 'live'}:{modality}"
+
+def _encode_shared_schedule(data_dict: dict) -> Tuple[Optional[bytes], str]:
+    """
+    SHARED_SCHEDULE_FIELDS of a schedule as (Parquet bytes or None, JSON meta).
+
+    The meta also carries the row versions in the backend's version space, so
+    every worker serves the same row deltas (see schedule_changes_since).
+    """
+    df = data_dict.get('working_hours_df')
+    frame = df.to_parquet() if df is not None else None
+    last_modified = data_dict.get('last_modified')
+    meta = {
+        'info_texts': list(data_dict.get('info_texts') or []),
+        'total_work_hours': {str(k): float(v) for k, v in (data_dict.get('total_work_hours') or {}).items()},
+        'worker_modifiers': {str(k): float(v) for k, v in (data_dict.get('worker_modifiers') or {}).items()},
+        'last_uploaded_filename': data_dict.get('last_uploaded_filename'),
+        'last_modified': last_modified.isoformat() if last_modified else None,
+        'last_prepped_at': data_dict.get('last_prepped_at'),
+        'last_prepped_by': data_dict.get('last_prepped_by'),
+        'rows_base_version': data_dict.get('shared_rows_base_version', 0),
+        'row_versions': {str(k): v for k, v in data_dict.get('shared_row_versions', {}).items()},
+    }
+    return frame, json.dumps(meta, ensure_ascii=False)
+
+def _decode_shared_schedule(frame: Optional[bytes], meta_json: str) -> dict:
+    schedule = json.loads(meta_json)
+    schedule['working_hours_df'] = pd.read_parquet(io.BytesIO(frame)) if frame is not None else None
+    if schedule.get('last_modified'):
+        schedule['last_modified'] = datetime.fromisoformat(schedule['last_modified'])
+    return schedule
+
+def _pull_shared_schedule(key: str) -> None:
+    # Caller holds the whole-state lock
+    stored = state_backend.read_schedule(key)
+    if stored is None:
+        return
+    version, frame, meta_json = stored
+    kind, _, modality = key.partition(':')
+    if modality not in allowed_modalities:
+        return
+    schedule = _decode_shared_schedule(frame, meta_json)
+    data_dict = _get_schedule_data_dict(modality, kind == 'staged')
+    for field in SHARED_SCHEDULE_FIELDS:
+        if field in schedule:
+            data_dict[field] = schedule[field]
+    # Local bump only: invalidates caches without publishing the schedule back
+    _advance_row_versions(data_dict, data_dict.get('schedule_version', 0) + 1, None)
+    data_dict['shared_schedule_version'] = version
+    data_dict['shared_rows_base_version'] = schedule.get('rows_base_version', version)
+    data_dict['shared_row_versions'] = {int(k): v for k, v in schedule.get('row_versions', {}).items()}
+    _shared_sync['schedule_versions'][key] = version
+
+def sync_shared_state() -> None:
+    """
+    Bring the local working copy up to date with the shared backend.
+
+    No-op for the local backend. Caller holds state_transaction().
+    """
+    if not state_backend.shared:
+        return
+
+    generation = state_backend.snapshot_generation()
+    if generation != _shared_sync['snapshot_generation']:
+        snapshot = state_backend.read_snapshot()
+        if snapshot is not None:
+            generation, seq, payload = snapshot
+            _apply_state_payload(json.loads(payload))
+            _shared_sync['seq'] = seq
+        _shared_sync['snapshot_generation'] = generation
+
+    for record in state_backend.assignments_since(_shared_sync['seq']):
+        _apply_assignment_record(record)
+        _shared_sync['seq'] = record['seq']
+
+    for key, version in state_backend.schedule_versions().items():
+        if key in _shared_sync['dirty']:
+            continue  # Local edit wins; published at the end of the request
+        if _shared_sync['schedule_versions'].get(key) != version:
+            _pull_shared_schedule(key)
+
+@contextmanager
+def state_transaction(modality: Optional[str] = None):
+    """
+    Exclusive section for reading and mutating the balancer state.
+
+    With ``modality`` (assignment requests) only that modality's lock is held
+    for the local backend. Without it, the whole state is locked. A shared
+    backend always takes its database write lock and syncs the working copy
+    first, so no other worker process can select or count concurrently; that
+    serializes every modality anyway, so it also locks the whole state.
+    """
+    if modality in modality_locks and not state_backend.shared:
+        with modality_locks[modality]:
+            yield
+        return
+    with state_backend.transaction():
+        with whole_state_locked():
+            sync_shared_state()
+            yield
+
+def _shared_state_changed() -> bool:
+    """Whether the backend holds anything this worker has not applied (no local lock needed)."""
+    generation, seq, versions = state_backend.sync_markers()
+    if generation != _shared_sync['snapshot_generation'] or seq > _shared_sync['seq']:
+        return True
+    return any(
+        _shared_sync['schedule_versions'].get(key) != version
+        for key, version in versions.items()
+        if key not in _shared_sync['dirty']
+    )
+
+def refresh_shared_state() -> None:
+    """Sync the working copy before serving a request (shared backends only)."""
+    if not state_backend.shared:
+        return
+    try:
+        # Read-only sync: a deferred transaction does not block other workers,
+        # and the whole-state lock is only taken when there is something to apply
+        with state_backend.transaction(exclusive=False):
+            if not _shared_state_changed():
+                return
+            with whole_state_locked():
+                sync_shared_state()
+    except Exception as e:
+        selection_logger.error(f"Failed to sync shared state: {str(e)}", exc_info=True)
+
+def publish_schedule_changes() -> None:
+    """Publish locally changed schedules to the shared backend (no-op for local)."""
+    if not state_backend.shared or not _shared_sync['dirty']:
+        return
+    try:
+        with state_backend.transaction():
+            with whole_state_locked():
+                versions = state_backend.schedule_versions()
+                for key, changed_rows in sorted(_shared_sync['dirty'].items()):
+                    kind, _, modality = key.partition(':')
+                    data_dict = _get_schedule_data_dict(modality, kind == 'staged')
+                    version = versions.get(key, 0) + 1
+                    if data_dict.get('shared_schedule_version', 0) != version - 1:
+                        # Another worker published in between; this copy replaces it
+                        changed_rows = None
+                    _advance_row_versions(data_dict, version, changed_rows, prefix='shared_')
+                    frame, meta = _encode_shared_schedule(data_dict)
+                    _shared_sync['schedule_versions'][key] = state_backend.publish_schedule(key, frame, meta)
+                _shared_sync['dirty'].clear()
     except Exception as e:
-        selection_logger.error(f"Failed to load state: {str(e)}", exc_info=True)
+        selection_logger.error(f"Failed to publish schedule changes: {str(e)}", exc_info=True)
+
+def _write_shared_snapshot(timeout: float = -1) -> bool:
+    with state_backend.transaction():
+        if not acquire_whole_state(timeout):
+            return False
+        try:
+            sync_shared_state()
+            captured = _capture_state_snapshot()
+        finally:
+            release_whole_state()
+        payload, seq = captured
+        _shared_sync['snapshot_generation'] = state_backend.write_snapshot(payload, seq)
+    return True
 
 # -----------------------------------------------------------
 # Core Data Calculators
@@ -358,53 +940,250 @@ def _calculate_total_work_hours(df: pd.DataFrame) -> dict:
 # -----------------------------------------------------------
 # File Operations (Backup, Loading)
 # -----------------------------------------------------------
+# Live and staged schedules are persisted after every edit as a snapshot of the
+# typed DataFrame (Parquet, dtypes preserved) plus a JSON sidecar with the
+# metadata, each replaced atomically, so saving and restarting skips the
+# openpyxl round trip. Nothing is unpickled from uploads/. Excel is only
+# produced on demand by write_schedule_excel(); legacy .xlsx backups are still
+# read if no snapshot exists yet.
+SCHEDULE_SNAPSHOT_FORMAT = 2
+
+def schedule_snapshot_path(modality: str, use_staged: bool = False) -> str:
+    """Path of the snapshot's Parquet file; the metadata sidecar is ``<path>.json``."""
+    suffix = "_staged" if use_staged else "_live"
+    return os.path.join(UPLOAD_FOLDER, "backups", f"Cortex_{modality.upper()}{suffix}.snapshot.parquet")
+
+def read_schedule_snapshot(modality: str, use_staged: bool = False) -> Optional[dict]:
+    """Return the snapshot payload ({'df', 'info_texts', 'saved_at'}) or None if there is none."""
+    snapshot_file = schedule_snapshot_path(modality, use_staged)
+    meta_file = f"{snapshot_file}.json"
+    if not os.path.exists(snapshot_file) or not os.path.exists(meta_file):
+        return None
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if not isinstance(meta, dict) or meta.get('format') != SCHEDULE_SNAPSHOT_FORMAT:
+        raise ValueError(f"Unbekanntes Snapshot-Format in {meta_file}")
+    return {
+        'df': pd.read_parquet(snapshot_file),
+        'info_texts': list(meta.get('info_texts') or []),
+        'saved_at': datetime.fromisoformat(meta['saved_at']),
+        'schedule_version': meta.get('schedule_version', 0),
+    }
+
+def _replace_file(path: str, write) -> None:
+    """Write ``path`` via a temporary file and os.replace()."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _write_schedule_snapshot(modality: str, use_staged: bool) -> Optional[datetime]:
+    """Write the snapshot now; returns its timestamp, or None if there was nothing to write."""
+    d = _get_schedule_data_dict(modality, use_staged)
+    mode_label = "staged" if use_staged else "live"
+    with modality_locks[modality]:
+        df = d['working_hours_df']
+        if df is None:
+            return None
+        version = d.get('schedule_version', 0)
+        df = df.copy()
+        saved_at = get_local_berlin_now()
+        meta = {
+            'format': SCHEDULE_SNAPSHOT_FORMAT,
+            'saved_at': saved_at.isoformat(),
+            'schedule_version': version,
+            'info_texts': list(d.get('info_texts') or []),
+        }
+
+    backup_file = schedule_snapshot_path(modality, use_staged)
+    try:
+        os.makedirs(os.path.dirname(backup_file), exist_ok=True)
+        # Data first: a sidecar always describes a complete Parquet file
+        _replace_file(backup_file, lambda path: df.to_parquet(path))
+
+        def write_meta(path: str) -> None:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        _replace_file(f"{backup_file}.json", write_meta)
+    except Exception as e:
+        selection_logger.info(f"Error backing up {mode_label} DataFrame for modality {modality}: {e}")
+        return None
+
+    with _schedule_backups_lock:
+        persisted = _schedule_backups['persisted']
+        key = (modality, use_staged)
+        persisted[key] = max(persisted.get(key, 0), version)
+    selection_logger.info(f"{mode_label.capitalize()} backup updated for modality {modality} at {backup_file}")
+    return saved_at
+
 def backup_dataframe(modality: str, use_staged: bool = False):
+    """Write the live/staged snapshot synchronously (loads, resets, preloads)."""
+    with _schedule_backups_lock:
+        _schedule_backups['due'].pop((modality, use_staged), None)
+    saved_at = _write_schedule_snapshot(modality, use_staged)
+    if saved_at is not None and use_staged:
+        d = staged_modality_data[modality]
+        d['last_modified'] = saved_at
+        d['last_prepped_at'] = saved_at.strftime('%d.%m.%Y %H:%M')
+
+# -----------------------------------------------------------
+# Debounced Schedule Backups
+# -----------------------------------------------------------
+# Admin edits only mark their schedule as due for a backup. A background writer
+# coalesces edits that arrive within SCHEDULE_BACKUP_DEBOUNCE_SECONDS into one
+# snapshot write (at the latest SCHEDULE_BACKUP_MAX_DELAY_SECONDS after the
+# first pending edit). schedule_backup_status() reports the last persisted
+# schedule_version; flush_schedule_backups() drains everything (atexit).
+SCHEDULE_BACKUP_DEBOUNCE_SECONDS = 2.0
+SCHEDULE_BACKUP_MAX_DELAY_SECONDS = 10.0
+
+_schedule_backups_lock = Lock()
+_schedule_backups = {
+    'due': {},        # (modality, use_staged) -> (first_request, deadline) in monotonic seconds
+    'persisted': {},  # (modality, use_staged) -> schedule_version of the last written snapshot
+    'thread': None,
+    'wakeup': Event()
+}
+
+def request_schedule_backup(modality: str, use_staged: bool = False) -> None:
+    """Queue a debounced snapshot of the live/staged schedule after an edit."""
+    now = monotonic()
+    key = (modality, use_staged)
+    with _schedule_backups_lock:
+        first_request = _schedule_backups['due'].get(key, (now, now))[0]
+        deadline = min(now + SCHEDULE_BACKUP_DEBOUNCE_SECONDS, first_request + SCHEDULE_BACKUP_MAX_DELAY_SECONDS)
+        _schedule_backups['due'][key] = (first_request, deadline)
+
+    if use_staged:
+        d = staged_modality_data[modality]
+        d['last_modified'] = get_local_berlin_now()
+        d['last_prepped_at'] = d['last_modified'].strftime('%d.%m.%Y %H:%M')
+
+    thread = _schedule_backups['thread']
+    if thread is None or not thread.is_alive():
+        thread = Thread(target=_schedule_backup_loop, name='schedule-backup', daemon=True)
+        _schedule_backups['thread'] = thread
+        thread.start()
+    _schedule_backups['wakeup'].set()
+
+def _take_due_backups(force: bool = False) -> Tuple[List[Tuple[str, bool]], Optional[float]]:
+    """Pop the backups whose deadline has passed; also return the next deadline."""
+    now = monotonic()
+    with _schedule_backups_lock:
+        due = _schedule_backups['due']
+        ready = [key for key, (_, deadline) in due.items() if force or deadline <= now]
+        for key in ready:
+            del due[key]
+        next_deadline = min((deadline for _, deadline in due.values()), default=None)
+    return ready, next_deadline
+
+def _schedule_backup_loop() -> None:
+    wakeup = _schedule_backups['wakeup']
+    while True:
+        ready, next_deadline = _take_due_backups()
+        for modality, use_staged in ready:
+            try:
+                _write_schedule_snapshot(modality, use_staged)
+            except Exception as e:
+                selection_logger.error(f"Failed to back up schedule for {modality}: {str(e)}", exc_info=True)
+        if ready:
+            continue
+        timeout = None if next_deadline is None else max(0.0, next_deadline - monotonic())
+        wakeup.wait(timeout=timeout)
+        wakeup.clear()
+
+def _mark_schedule_persisted(modality: str, use_staged: bool = False) -> None:
+    """Record the current schedule_version as persisted (after restoring it from its snapshot)."""
+    version = _get_schedule_data_dict(modality, use_staged).get('schedule_version', 0)
+    with _schedule_backups_lock:
+        _schedule_backups['persisted'][(modality, use_staged)] = version
+
+def flush_schedule_backups() -> None:
+    """Write all pending schedule backups synchronously (shutdown hook)."""
+    ready, _ = _take_due_backups(force=True)
+    for modality, use_staged in ready:
+        _write_schedule_snapshot(modality, use_staged)
+
+def schedule_backup_status(use_staged: bool = False) -> Dict[str, dict]:
+    """Per modality: current schedule_version, last persisted version and whether a write is pending."""
+    source = staged_modality_data if use_staged else modality_data
+    with _schedule_backups_lock:
+        pending = set(_schedule_backups['due'])
+        persisted = dict(_schedule_backups['persisted'])
+    status = {}
+    for modality, d in source.items():
+        key = (modality, use_staged)
+        version = d.get('schedule_version', 0)
+        persisted_version = persisted.get(key)
+        status[modality] = {
+            'version': version,
+            'persisted_version': persisted_version,
+            'pending': key in pending,
+            'saved': key not in pending and persisted_version == version,
+        }
+    return status
+
+def write_schedule_excel(modality: str, target: Any, use_staged: bool = False) -> bool:
+    """
+    Export the live or staged schedule as Excel (Tabelle1 = schedule with TIME,
+    Tabelle2 = info texts) to ``target`` (path or binary file object).
+
+    Returns False if there is no schedule to export.
+    """
     d = staged_modality_data[modality] if use_staged else modality_data[modality]
-    if d['working_hours_df'] is not None:
-        backup_dir = os.path.join(UPLOAD_FOLDER, "backups")
-        os.makedirs(backup_dir, exist_ok=True)
-        suffix = "_staged" if use_staged else "_live"
-        backup_file = os.path.join(backup_dir, f"Cortex_{modality.upper()}{suffix}.xlsx")
-        try:
-            df_backup = d['working_hours_df'].copy()
-
-            if 'TIME' not in df_backup.columns and {'start_time', 'end_time'}.issubset(df_backup.columns):
-                def _fmt_time(value):
-                    if pd.isna(value):
-                        return ''
-                    return value.strftime(TIME_FORMAT) if hasattr(value, 'strftime') else str(value)
-
-                df_backup['TIME'] = (
-                    df_backup['start_time'].apply(_fmt_time) +
-                    '-' +
-                    df_backup['end_time'].apply(_fmt_time)
-                )
+    if d['working_hours_df'] is None:
+        return False
 
-            cols_to_backup = [
-                col for col in df_backup.columns
-                if col not in ['start_time', 'end_time', 'shift_duration', 'canonical_id']
-            ]
-            df_backup = df_backup[cols_to_backup].copy()
+    df_export = expand_schedule_df(d['working_hours_df'], SKILL_COLUMNS)
 
-            with pd.ExcelWriter(backup_file, engine='openpyxl') as writer:
-                df_backup.to_excel(writer, sheet_name='Tabelle1', index=False)
-                if d.get('info_texts'):
-                    df_info = pd.DataFrame({'Info': d['info_texts']})
-                    df_info.to_excel(writer, sheet_name='Tabelle2', index=False)
+    if 'TIME' not in df_export.columns and {'start_time', 'end_time'}.issubset(df_export.columns):
+        def _fmt_time(value):
+            if pd.isna(value):
+                return ''
+            return value.strftime(TIME_FORMAT) if hasattr(value, 'strftime') else str(value)
 
-            mode_label = "staged" if use_staged else "live"
-            selection_logger.info(f"{mode_label.capitalize()} backup updated for modality {modality} at {backup_file}")
+        df_export['TIME'] = (
+            df_export['start_time'].apply(_fmt_time) +
+            '-' +
+            df_export['end_time'].apply(_fmt_time)
+        )
 
-            if use_staged:
-                d['last_modified'] = get_local_berlin_now()
-                d['last_prepped_at'] = d['last_modified'].strftime('%d.%m.%Y %H:%M')
-        except Exception as e:
-            mode_label = "staged" if use_staged else "live"
-            selection_logger.info(f"Error backing up {mode_label} DataFrame for modality {modality}: {e}")
+    cols_to_export = [
+        col for col in df_export.columns
+        if col not in ['start_time', 'end_time', 'start_min', 'end_min', 'shift_duration', 'canonical_id']
+    ]
+    df_export = df_export[cols_to_export].copy()
+
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
+        df_export.to_excel(writer, sheet_name='Tabelle1', index=False)
+        if d.get('info_texts'):
+            df_info = pd.DataFrame({'Info': d['info_texts']})
+            df_info.to_excel(writer, sheet_name='Tabelle2', index=False)
+    return True
 
 
 def load_staged_dataframe(modality: str) -> bool:
     d = staged_modality_data[modality]
+
+    try:
+        payload = read_schedule_snapshot(modality, use_staged=True)
+    except Exception as e:
+        selection_logger.error(f"Error loading staged snapshot for {modality}: {e}")
+        payload = None
+    if payload is not None:
+        df = payload['df']
+        d['working_hours_df'] = df
+        mark_schedule_changed(modality, use_staged=True)
+        d['total_work_hours'] = _calculate_total_work_hours(df)
+        d['info_texts'] = payload['info_texts']
+        d['last_modified'] = payload['saved_at']
+        _mark_schedule_persisted(modality, use_staged=True)
+        selection_logger.info(f"Loaded staged data for {modality} from snapshot")
+        return True
+
     staged_file = d['staged_file_path']
     scheduled_file = modality_data[modality]['scheduled_file_path']
 
@@ -436,6 +1215,7 @@ def load_staged_dataframe(modality: str) -> bool:
                     df['counts_for_hours'] = True
 
                 d['working_hours_df'] = df
+                mark_schedule_changed(modality, use_staged=True)
                 d['total_work_hours'] = _calculate_total_work_hours(df)
 
                 if 'Tabelle2' in xls.sheet_names:
@@ -455,14 +1235,37 @@ def load_staged_dataframe(modality: str) -> bool:
 # -----------------------------------------------------------
 # Data Loading & Initialization
 # -----------------------------------------------------------
-def initialize_data(file_path: str, modality: str):
+def _reset_live_counters(modality: str) -> None:
     d = modality_data[modality]
     d['draw_counts'] = {}
     d['skill_counts'] = {skill: {} for skill in SKILL_COLUMNS}
-    d['WeightedCounts'] = {}
     global_worker_data['assignments_per_mod'][modality] = {}
 
-    with lock:
+def _install_live_schedule(modality: str, df: pd.DataFrame, info_texts: list) -> None:
+    """Make ``df`` the live schedule and start its counters at zero. Caller holds the state lock."""
+    d = modality_data[modality]
+    d['working_hours_df'] = df
+    mark_schedule_changed(modality)
+    d['worker_modifiers'] = df.groupby('PPL')['Modifier'].first().to_dict()
+    d['total_work_hours'] = _calculate_total_work_hours(df)
+    unique_workers = df['PPL'].unique()
+    d['draw_counts'] = {w: 0 for w in unique_workers}
+
+    d['skill_counts'] = {}
+    for skill in SKILL_COLUMNS:
+        if skill in df.columns:
+            d['skill_counts'][skill] = {w: 0 for w in unique_workers}
+        else:
+            d['skill_counts'][skill] = {}
+
+    d['info_texts'] = info_texts
+
+    if SKILL_ROSTER_AUTO_IMPORT:
+        auto_populate_skill_roster({modality: df})
+
+def initialize_data(file_path: str, modality: str):
+    with state_transaction():
+        _reset_live_counters(modality)
         try:
             excel_file = pd.ExcelFile(file_path)
             if 'Tabelle1' not in excel_file.sheet_names:
@@ -490,7 +1293,6 @@ def initialize_data(file_path: str, modality: str):
             for skill in SKILL_COLUMNS:
                 if skill not in df.columns:
                     df[skill] = 0
-                df[skill] = df[skill].fillna(0).astype(int)
 
             df['shift_duration'] = df.apply(
                 lambda row: calculate_shift_duration_hours(row['start_time'], row['end_time']),
@@ -506,30 +1308,15 @@ def initialize_data(file_path: str, modality: str):
             if 'counts_for_hours' not in df.columns:
                 df['counts_for_hours'] = True
             
-            df = df[[col for col in col_order if col in df.columns]]
-
-            d['working_hours_df'] = df
-            d['worker_modifiers'] = df.groupby('PPL')['Modifier'].first().to_dict()
-            d['total_work_hours'] = _calculate_total_work_hours(df)
-            unique_workers = df['PPL'].unique()
-            d['draw_counts'] = {w: 0 for w in unique_workers}
-
-            d['skill_counts'] = {}
-            for skill in SKILL_COLUMNS:
-                if skill in df.columns:
-                    d['skill_counts'][skill] = {w: 0 for w in unique_workers}
-                else:
-                    d['skill_counts'][skill] = {}
-
-            d['WeightedCounts'] = {w: 0.0 for w in unique_workers}
+            # Typed model: int8 skill levels, 'w' markers in the skill_weighted bitmask
+            df = compact_schedule_df(df[[col for col in col_order if col in df.columns]].copy(), SKILL_COLUMNS)
 
             if 'Tabelle2' in excel_file.sheet_names:
-                d['info_texts'] = pd.read_excel(excel_file, sheet_name='Tabelle2')['Info'].tolist()
+                info_texts = pd.read_excel(excel_file, sheet_name='Tabelle2')['Info'].tolist()
             else:
-                d['info_texts'] = []
+                info_texts = []
 
-            if SKILL_ROSTER_AUTO_IMPORT:
-                auto_populate_skill_roster({modality: df})
+            _install_live_schedule(modality, df, info_texts)
 
         except Exception as e:
             error_message = f"Fehler beim Laden der Excel-Datei für Modality '{modality}': {str(e)}"
@@ -537,6 +1324,21 @@ def initialize_data(file_path: str, modality: str):
             selection_logger.exception("Stack trace:")
             raise ValueError(error_message)
 
+def load_live_snapshot(modality: str) -> bool:
+    """Restore the live schedule from its snapshot (counters start at zero, like initialize_data)."""
+    try:
+        payload = read_schedule_snapshot(modality)
+        if payload is None:
+            return False
+        with state_transaction():
+            _reset_live_counters(modality)
+            _install_live_schedule(modality, payload['df'], payload['info_texts'])
+            _mark_schedule_persisted(modality)
+        return True
+    except Exception as e:
+        selection_logger.error(f"Fehler beim Laden des Live-Snapshots für {modality}: {e}", exc_info=True)
+        return False
+
 def quarantine_excel(file_path: str, reason: str) -> Optional[str]:
     if not file_path or not os.path.exists(file_path):
         return None
@@ -585,6 +1387,82 @@ def _get_schedule_data_dict(modality: str, use_staged: bool) -> dict:
         return staged_modality_data[modality]
     return modality_data[modality]
 
+def mark_schedule_changed(modality: str, use_staged: bool = False, changed_rows: Optional[Iterable[int]] = None) -> int:
+    """
+    Convert the schedule to the typed model, refresh derived shift columns and
+    bump the schedule version.
+
+    Must be called whenever ``working_hours_df`` is replaced or edited in place
+    so that caches keyed on the schedule version (e.g. the balancer's
+    candidate index) are rebuilt. With a shared backend the schedule is also
+    queued for publish_schedule_changes().
+
+    ``changed_rows`` lists the row indices touched by a row-level edit; they
+    are served by schedule_changes_since(). Without it the whole schedule
+    counts as replaced.
+    """
+    data_dict = _get_schedule_data_dict(modality, use_staged)
+    df = data_dict['working_hours_df']
+    compact_schedule_df(df, SKILL_COLUMNS)
+    if changed_rows is not None:
+        changed_rows = [int(row_index) for row_index in changed_rows]
+    _advance_row_versions(data_dict, data_dict.get('schedule_version', 0) + 1, changed_rows)
+    if state_backend.shared:
+        key = _schedule_key(modality, use_staged)
+        dirty = _shared_sync['dirty']
+        if changed_rows is None:
+            dirty[key] = None
+        elif dirty.get(key, set()) is not None:
+            dirty.setdefault(key, set()).update(changed_rows)
+    return data_dict['schedule_version']
+
+def _advance_row_versions(data_dict: dict, version: int, changed_rows: Optional[List[int]], prefix: str = '') -> None:
+    """
+    Set ``<prefix>schedule_version`` and record which rows it touched.
+
+    The local counters use no prefix; ``shared_`` counts in the shared
+    backend's schedule versions (see publish_schedule_changes).
+    """
+    data_dict[f'{prefix}schedule_version'] = version
+    if changed_rows is None:
+        data_dict[f'{prefix}rows_base_version'] = version
+        data_dict[f'{prefix}row_versions'] = {}
+        return
+    df = data_dict.get('working_hours_df')
+    row_count = 0 if df is None else len(df)
+    row_versions = data_dict.setdefault(f'{prefix}row_versions', {})
+    for row_index in changed_rows:
+        if row_index < row_count:
+            row_versions[row_index] = version
+    for row_index in [i for i in row_versions if i >= row_count]:
+        del row_versions[row_index]
+
+def schedule_changes_since(modality: str, use_staged: bool, since_version: Optional[int]) -> Tuple[int, Optional[List[int]]]:
+    """
+    Row indices edited after ``since_version`` as ``(current version, rows)``.
+
+    ``rows`` is None when the client needs the full schedule: no version
+    given, or the schedule was replaced as a whole after it. With a shared
+    backend the versions are the backend's, so they match across workers.
+    """
+    data_dict = _get_schedule_data_dict(modality, use_staged)
+    prefix = 'shared_' if state_backend.shared else ''
+    version = data_dict.get(f'{prefix}schedule_version', 0)
+    if state_backend.shared and _schedule_key(modality, use_staged) in _shared_sync['dirty']:
+        return version, None  # Local edit not published yet
+    if since_version is None or not data_dict.get(f'{prefix}rows_base_version', 0) <= since_version <= version:
+        return version, None
+    rows = sorted(i for i, v in data_dict.get(f'{prefix}row_versions', {}).items() if v > since_version)
+    return version, rows
+
+def schedule_version_epoch() -> str:
+    """Prefix of schedule version tokens: versions are only comparable within one epoch."""
+    return state_backend.epoch
+
+# Row-level schedule edits. Callers hold state_transaction(modality): the
+# mutation and its mark_schedule_changed() bump then happen under the modality
+# lock, so the backup writer (which copies under that lock) and assignment
+# requests never see a half-applied edit.
 def _update_schedule_row(modality: str, row_index: int, updates: dict, use_staged: bool) -> tuple:
     data_dict = _get_schedule_data_dict(modality, use_staged)
     df = data_dict['working_hours_df']
@@ -592,15 +1470,18 @@ def _update_schedule_row(modality: str, row_index: int, updates: dict, use_stage
     if not _validate_row_index(df, row_index):
         return False, 'Invalid row index'
 
+    column_count = len(df.columns)
     try:
         for col, value in updates.items():
             if col in ['start_time', 'end_time']:
                 df.at[row_index, col] = datetime.strptime(value, TIME_FORMAT).time()
             elif col in SKILL_COLUMNS:
-                df.at[row_index, col] = normalize_skill_value(value)
+                set_schedule_skill_value(df, row_index, col, value, SKILL_COLUMNS)
             elif col == 'Modifier':
                 df.at[row_index, col] = float(value)
             elif col == 'PPL':
+                if isinstance(df['PPL'].dtype, pd.CategoricalDtype) and value not in df['PPL'].cat.categories:
+                    df['PPL'] = df['PPL'].cat.add_categories([value])
                 df.at[row_index, col] = value
             elif col == 'tasks':
                 if isinstance(value, list):
@@ -615,6 +1496,8 @@ def _update_schedule_row(modality: str, row_index: int, updates: dict, use_stage
         if use_staged and 'is_manual' in df.columns:
             df.at[row_index, 'is_manual'] = True
 
+        changed_rows = [row_index]
+
         # Recalculate shift_duration if times changed
         if 'start_time' in updates or 'end_time' in updates:
             start = df.at[row_index, 'start_time']
@@ -640,8 +1523,12 @@ def _update_schedule_row(modality: str, row_index: int, updates: dict, use_stage
                         f"{len(df)} -> {len(resolved_df)} rows"
                     )
                 data_dict['working_hours_df'] = resolved_df
+                changed_rows = None  # Rows are regrouped by worker
 
-        backup_dataframe(modality, use_staged=use_staged)
+        if len(data_dict['working_hours_df'].columns) != column_count:
+            changed_rows = None  # A new column changes every row's payload
+        mark_schedule_changed(modality, use_staged, changed_rows=changed_rows)
+        request_schedule_backup(modality, use_staged=use_staged)
         return True, None
 
     except ValueError as e:
@@ -695,7 +1582,10 @@ def _add_worker_to_schedule(modality: str, worker_data: dict, use_staged: bool)
             data_dict['working_hours_df'].at[new_row_idx, 'is_manual'] = True
 
         # Resolve any overlapping shifts for this worker (later shift wins)
+        column_count = 0 if df is None else len(df.columns)
         df = data_dict['working_hours_df']
+        # A new column changes every row's payload
+        changed_rows = [len(df) - 1] if len(df) > 1 and len(df.columns) == column_count else None
         worker_shifts = df[df['PPL'] == ppl_name]
         if len(worker_shifts) > 1:
             resolved_df = resolve_overlapping_shifts_df(df)
@@ -705,8 +1595,10 @@ def _add_worker_to_schedule(modality: str, worker_data: dict, use_staged: bool)
                     f"{len(df)} -> {len(resolved_df)} rows"
                 )
             data_dict['working_hours_df'] = resolved_df
+            changed_rows = None  # Rows are regrouped by worker
 
-        backup_dataframe(modality, use_staged=use_staged)
+        mark_schedule_changed(modality, use_staged, changed_rows=changed_rows)
+        request_schedule_backup(modality, use_staged=use_staged)
         new_idx = len(data_dict['working_hours_df']) - 1
         return True, new_idx, None
 
@@ -736,12 +1628,17 @@ def _delete_worker_from_schedule(modality: str, row_index: int, use_staged: bool
 
         if gap_id and pd.notnull(gap_id):
             # Delete all rows sharing the same gap_id
+            first_removed = int(df.index[df['gap_id'] == gap_id].min())
             data_dict['working_hours_df'] = df[df['gap_id'] != gap_id].reset_index(drop=True)
             selection_logger.info(f"Deleted linked gap rows for ID {gap_id}")
         else:
+            first_removed = row_index_int
             data_dict['working_hours_df'] = df.drop(index=row_index_int).reset_index(drop=True)
-            
-        backup_dataframe(modality, use_staged=use_staged)
+
+        # Rows after the first removed one shift up by reset_index()
+        changed_rows = range(first_removed, len(data_dict['working_hours_df']))
+        mark_schedule_changed(modality, use_staged, changed_rows=changed_rows)
+        request_schedule_backup(modality, use_staged=use_staged)
         return True, worker_name, None
 
     except Exception as e:
@@ -751,13 +1648,17 @@ def _add_gap_to_schedule(modality: str, row_index: int, gap_type: str, gap_start
     data_dict = _get_schedule_data_dict(modality, use_staged)
     df = data_dict['working_hours_df']
 
+    added_columns = False
     if df is not None:
+        column_count = len(df.columns)
         if 'gaps' not in df.columns:
             df['gaps'] = None
         if 'gap_id' not in df.columns:
             df['gap_id'] = None
         if use_staged and 'is_manual' not in df.columns:
             df['is_manual'] = False
+        # New columns change every row's API payload, so such an edit counts as a full change
+        added_columns = len(df.columns) != column_count
 
     if not _validate_row_index(df, row_index):
         return False, None, 'Invalid row index'
@@ -799,11 +1700,9 @@ def _add_gap_to_schedule(modality: str, row_index: int, gap_type: str, gap_start
         shift_start = row['start_time']
         shift_end = row['end_time']
 
-        base_date = datetime.today()
-        shift_start_dt = datetime.combine(base_date, shift_start)
-        shift_end_dt = datetime.combine(base_date, shift_end)
-        gap_start_dt = datetime.combine(base_date, gap_start_time)
-        gap_end_dt = datetime.combine(base_date, gap_end_time)
+        shift_interval = interval_from_times(shift_start, shift_end)
+        # Gap times after midnight belong to the second half of an overnight shift
+        gap_interval = align_to_shift(shift_interval, interval_from_times(gap_start_time, gap_end_time))
 
         gap_entry = {
             'start': gap_start_time.strftime(TIME_FORMAT),
@@ -816,54 +1715,61 @@ def _add_gap_to_schedule(modality: str, row_index: int, gap_type: str, gap_start
         if pd.isna(existing_gap_id):
             existing_gap_id = None
 
-        if gap_end_dt <= shift_start_dt or gap_start_dt >= shift_end_dt:
+        if not overlaps(shift_interval, gap_interval):
             return False, None, 'Gap is outside worker shift times'
 
         log_prefix = "STAGED: " if use_staged else ""
+        remaining = subtract_intervals(shift_interval, [gap_interval])
 
-        if gap_start_dt <= shift_start_dt and gap_end_dt >= shift_end_dt:
+        if not remaining:
             # Case 1: Gap covers entire shift - delete row(s)
             if existing_gap_id:
                 # Delete all rows sharing the same gap_id (linked split shifts)
+                first_removed = int(df.index[df['gap_id'] == existing_gap_id].min())
                 data_dict['working_hours_df'] = df[df['gap_id'] != existing_gap_id].reset_index(drop=True)
             else:
+                first_removed = row_index
                 data_dict['working_hours_df'] = df.drop(index=row_index).reset_index(drop=True)
-            
-            backup_dataframe(modality, use_staged=use_staged)
+
+            changed_rows = range(first_removed, len(data_dict['working_hours_df']))
+            mark_schedule_changed(modality, use_staged, changed_rows=None if added_columns else changed_rows)
+            request_schedule_backup(modality, use_staged=use_staged)
             selection_logger.info(f"{log_prefix}Gap ({gap_type}) covers entire shift for {worker_name} - row(s) deleted")
             return True, 'deleted', None
 
-        elif gap_start_dt <= shift_start_dt < gap_end_dt < shift_end_dt:
+        elif len(remaining) == 1 and remaining[0][1] == shift_interval[1]:
+            new_start, new_end = remaining[0]
             df.at[row_index, 'start_time'] = gap_end_time
             if 'TIME' in df.columns:
                 df.at[row_index, 'TIME'] = f"{gap_end_time.strftime(TIME_FORMAT)}-{shift_end.strftime(TIME_FORMAT)}"
-            new_start_dt = datetime.combine(base_date, gap_end_time)
-            df.at[row_index, 'shift_duration'] = (shift_end_dt - new_start_dt).seconds / 3600
+            df.at[row_index, 'shift_duration'] = (new_end - new_start) / 60
             df.at[row_index, 'gaps'] = json.dumps(merge_gap(parse_gap_list(row.get('gaps')), gap_entry))
-            backup_dataframe(modality, use_staged=use_staged)
+            mark_schedule_changed(modality, use_staged, changed_rows=None if added_columns else [row_index])
+            request_schedule_backup(modality, use_staged=use_staged)
             selection_logger.info(f"{log_prefix}Gap ({gap_type}) at start for {worker_name}: new start {gap_end_time}")
             return True, 'start_adjusted', None
 
-        elif shift_start_dt < gap_start_dt < shift_end_dt and gap_end_dt >= shift_end_dt:
+        elif len(remaining) == 1:
+            new_start, new_end = remaining[0]
             df.at[row_index, 'end_time'] = gap_start_time
             if 'TIME' in df.columns:
                 df.at[row_index, 'TIME'] = f"{shift_start.strftime(TIME_FORMAT)}-{gap_start_time.strftime(TIME_FORMAT)}"
-            new_end_dt = datetime.combine(base_date, gap_start_time)
-            df.at[row_index, 'shift_duration'] = (new_end_dt - shift_start_dt).seconds / 3600
+            df.at[row_index, 'shift_duration'] = (new_end - new_start) / 60
             df.at[row_index, 'gaps'] = json.dumps(merge_gap(parse_gap_list(row.get('gaps')), gap_entry))
-            backup_dataframe(modality, use_staged=use_staged)
+            mark_schedule_changed(modality, use_staged, changed_rows=None if added_columns else [row_index])
+            request_schedule_backup(modality, use_staged=use_staged)
             selection_logger.info(f"{log_prefix}Gap ({gap_type}) at end for {worker_name}: new end {gap_start_time}")
             return True, 'end_adjusted', None
 
         else:
             # Case 4: Gap in middle - SPLIT into two rows
+            (first_start, first_end), (second_start, second_end) = remaining
             new_gap_id = f"gap_{worker_name}_{datetime.now().strftime('%H%M%S')}"
 
             df.at[row_index, 'end_time'] = gap_start_time
             if 'TIME' in df.columns:
                 df.at[row_index, 'TIME'] = f"{shift_start.strftime(TIME_FORMAT)}-{gap_start_time.strftime(TIME_FORMAT)}"
-            new_end_dt = datetime.combine(base_date, gap_start_time)
-            df.at[row_index, 'shift_duration'] = (new_end_dt - shift_start_dt).seconds / 3600
+            df.at[row_index, 'shift_duration'] = (first_end - first_start) / 60
             df.at[row_index, 'gap_id'] = new_gap_id
             if use_staged:
                 df.at[row_index, 'is_manual'] = True
@@ -873,8 +1779,7 @@ def _add_gap_to_schedule(modality: str, row_index: int, gap_type: str, gap_start
             new_row['end_time'] = shift_end
             if 'TIME' in df.columns:
                 new_row['TIME'] = f"{gap_end_time.strftime(TIME_FORMAT)}-{shift_end.strftime(TIME_FORMAT)}"
-            new_start_dt = datetime.combine(base_date, gap_end_time)
-            new_row['shift_duration'] = (shift_end_dt - new_start_dt).seconds / 3600
+            new_row['shift_duration'] = (second_end - second_start) / 60
             new_row['gap_id'] = new_gap_id
             if use_staged:
                 new_row['is_manual'] = True
@@ -884,7 +1789,9 @@ def _add_gap_to_schedule(modality: str, row_index: int, gap_type: str, gap_start
             new_row['gaps'] = serialized_gaps
 
             data_dict['working_hours_df'] = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            backup_dataframe(modality, use_staged=use_staged)
+            changed_rows = [row_index, len(data_dict['working_hours_df']) - 1]
+            mark_schedule_changed(modality, use_staged, changed_rows=None if added_columns else changed_rows)
+            request_schedule_backup(modality, use_staged=use_staged)
             selection_logger.info(f"{log_prefix}Gap ({gap_type}) in middle for {worker_name}: split into two shifts with ID {new_gap_id}")
             return True, 'split', None
 
@@ -905,6 +1812,22 @@ def check_and_perform_daily_reset():
     except Exception:
         reset_time = time(7, 30)
 
+    global_reset_due = (
+        global_worker_data['last_reset_date'] != today
+        and now.time() >= reset_time
+        and any(os.path.exists(modality_data[mod]['scheduled_file_path']) for mod in allowed_modalities)
+    )
+    modality_reset_due = now.time() >= time(7, 30) and any(
+        d['last_reset_date'] != today for d in modality_data.values()
+    )
+    if not (global_reset_due or modality_reset_due):
+        return
+
+    # Re-checked inside the transaction: another worker process may have reset already
+    with state_transaction():
+        _perform_daily_reset(now, today, reset_time)
+
+def _perform_daily_reset(now: datetime, today: date, reset_time: time) -> None:
     if global_worker_data['last_reset_date'] != today and now.time() >= reset_time:
         should_reset_global = any(
             os.path.exists(modality_data[mod]['scheduled_file_path']) 
@@ -913,8 +1836,10 @@ def check_and_perform_daily_reset():
         if should_reset_global:
             global_worker_data['last_reset_date'] = today
             # Reset global weighted counts on daily reset
-            global_worker_data['weighted_counts'] = {}
-            save_state()
+            global_worker_data['weighted_counts'] = new_weighted_counts()
+            save_state(wait=True)
+            compact_worker_registry()
+            compact_worker_index()
             selection_logger.info("Performed global reset based on modality scheduled uploads.")
         
     for mod, d in modality_data.items():
@@ -924,7 +1849,6 @@ def check_and_perform_daily_reset():
             if os.path.exists(d['scheduled_file_path']):
                 d['draw_counts'] = {}
                 d['skill_counts'] = {skill: {} for skill in SKILL_COLUMNS}
-                d['WeightedCounts'] = {}
 
                 context = f"daily reset {mod.upper()}"
                 success = attempt_initialize_data(
@@ -952,20 +1876,328 @@ def check_and_perform_daily_reset():
                 selection_logger.info(f"No scheduled file found for modality {mod}. Keeping old data.")
             d['last_reset_date'] = today
             global_worker_data['assignments_per_mod'][mod] = {}
-            save_state()
+            save_state(wait=True)
+
+# -----------------------------------------------------------
+# Medweb CSV Ingestion
+# -----------------------------------------------------------
+# The master CSV covers weeks or months; a load only needs one day. The file is
+# streamed in chunks, each distinct date string is parsed once, and only rows
+# of the requested dates are kept, so memory is bounded by the day's rows.
+MEDWEB_CSV_CHUNK_ROWS = 20000
+MEDWEB_DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y')
+_CSV_SNIFF_BYTES = 64 * 1024
+
+def sniff_csv_format(csv_path: str) -> Tuple[str, str]:
+    """Detect (separator, encoding) of a medweb CSV from its first bytes."""
+    with open(csv_path, 'rb') as f:
+        sample = f.read(_CSV_SNIFF_BYTES)
+
+    encoding = 'utf-8-sig'
+    try:
+        text = sample.decode(encoding)
+    except UnicodeDecodeError as e:
+        if len(sample) == _CSV_SNIFF_BYTES and e.start >= len(sample) - 3:
+            # Multi-byte character cut off at the end of the sample
+            text = sample[:e.start].decode(encoding)
+        else:
+            encoding = 'latin1'
+            text = sample.decode(encoding)
+
+    header = text.splitlines()[0] if text else ''
+    separator = ';' if header.count(';') > header.count(',') else ','
+    return separator, encoding
+
+def parse_medweb_dates(values: pd.Series, cache: Optional[Dict[Any, Optional[date]]] = None) -> pd.Series:
+    """
+    Parse a medweb date column to ``datetime.date`` (None if unparseable).
+
+    Accepts German (dd.mm.yyyy), ISO and dd/mm/yyyy dates; anything else goes
+    through pandas' day-first parser. Each distinct string is parsed once;
+    ``cache`` carries the results across chunks of the same file.
+    """
+    if cache is None:
+        cache = {}
+    new_values = [v for v in values.dropna().unique() if v not in cache]
+    if new_values:
+        text = pd.Series(new_values, dtype=object).astype(str).str.strip()
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+        for fmt in MEDWEB_DATE_FORMATS:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+        for pos, raw in enumerate(new_values):
+            value = parsed.iloc[pos]
+            if pd.isna(value):
+                try:
+                    cache[raw] = pd.to_datetime(text.iloc[pos], dayfirst=True).date()
+                except Exception:
+                    cache[raw] = None
+            else:
+                cache[raw] = value.date()
+    return values.map(cache).astype(object).where(values.notna(), None)
+
+def read_medweb_csv(
+    csv_path: str,
+    date_column: str,
+    target_dates: Optional[set] = None
+) -> Tuple[pd.DataFrame, List[date]]:
+    """
+    Read the rows of ``target_dates`` (all rows if None) from a medweb CSV.
+
+    Returns (rows with an added ``Datum_parsed`` column, all dates found in the
+    file). Values are read as strings.
+    """
+    try:
+        separator, encoding = sniff_csv_format(csv_path)
+    except OSError as e:
+        raise ValueError(f"Fehler beim Laden der CSV: {e}")
+
+    def _read(enc: str) -> Tuple[pd.DataFrame, List[date]]:
+        date_cache: Dict[Any, Optional[date]] = {}
+        parts = []
+        columns = None
+        with pd.read_csv(csv_path, sep=separator, encoding=enc, dtype=str, chunksize=MEDWEB_CSV_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                columns = chunk.columns
+                if date_column not in chunk.columns:
+                    raise ValueError(f"Spalte '{date_column}' nicht in CSV gefunden")
+                chunk_dates = parse_medweb_dates(chunk[date_column], date_cache)
+                if target_dates is not None:
+                    keep = chunk_dates.isin(target_dates).to_numpy()
+                    if not keep.any():
+                        continue
+                    chunk = chunk[keep]
+                    chunk_dates = chunk_dates[keep]
+                parts.append(chunk.assign(Datum_parsed=chunk_dates))
+        if parts:
+            rows = pd.concat(parts, ignore_index=True)
+        else:
+            rows = pd.DataFrame(columns=list(columns if columns is not None else []) + ['Datum_parsed'])
+        available = [d for d in dict.fromkeys(date_cache.values()) if d is not None]
+        return rows, available
+
+    try:
+        try:
+            return _read(encoding)
+        except UnicodeDecodeError:
+            # Non-UTF-8 bytes after the sniffed sample
+            return _read('latin1')
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Fehler beim Laden der CSV: {e}")
+
+# Parsed master CSV rows by date, keyed on the file fingerprint (path, mtime,
+# size). A cache miss reads only the requested days through read_medweb_csv()'s
+# chunked date filter (which still lists every date in the file) and adds them
+# to the entry, so load-today, preload and the auto-preload job never hold the
+# whole file; only a load without target dates (diagnostics) reads all rows.
+# Other worker processes pick the rows up from a Parquet sidecar in
+# MEDWEB_CACHE_DIR whose JSON header (<sidecar>.json) carries the fingerprint
+# and the days it holds.
+MEDWEB_CACHE_FORMAT = 3
+MEDWEB_CACHE_DIR = UPLOAD_FOLDER
+_medweb_csv_cache: Dict[str, Any] = {'entry': None}
+_medweb_csv_cache_lock = Lock()
+
+def _medweb_csv_key(csv_path: str, date_column: str) -> tuple:
+    stat = os.stat(csv_path)
+    return (os.path.abspath(csv_path), stat.st_mtime_ns, stat.st_size, date_column)
+
+def _medweb_sidecar_path(csv_path: str) -> str:
+    return os.path.join(MEDWEB_CACHE_DIR, f"{os.path.basename(csv_path)}.parsed.parquet")
+
+def _medweb_cache_entry(key: tuple, rows: pd.DataFrame, dates: List[date], loaded: Optional[set]) -> dict:
+    return {
+        'key': key,
+        'rows_by_date': {
+            day: group.reset_index(drop=True)
+            for day, group in rows.groupby('Datum_parsed', sort=False)
+        },
+        'dates': dates,
+        'columns': list(rows.columns),
+        'loaded': loaded,  # Days held in rows_by_date (None: every day of the file)
+    }
+
+def _medweb_entry_covers(entry: dict, wanted: Optional[set]) -> bool:
+    if entry['loaded'] is None:
+        return True
+    return wanted is not None and wanted <= entry['loaded']
+
+def _medweb_entry_rows(entry: dict) -> pd.DataFrame:
+    parts = list(entry['rows_by_date'].values())
+    if not parts:
+        return pd.DataFrame(columns=entry['columns'])
+    return pd.concat(parts, ignore_index=True)
+
+def _read_medweb_sidecar(csv_path: str, key: tuple) -> Optional[dict]:
+    sidecar = _medweb_sidecar_path(csv_path)
+    header_file = f"{sidecar}.json"
+    if not os.path.exists(sidecar) or not os.path.exists(header_file):
+        return None
+    try:
+        with open(header_file, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('format') != MEDWEB_CACHE_FORMAT or tuple(header.get('key') or ()) != key:
+            return None
+        rows = pd.read_parquet(sidecar)
+        dates = [date.fromisoformat(d) for d in header['dates']]
+        loaded = header.get('loaded')
+        loaded = None if loaded is None else {date.fromisoformat(d) for d in loaded}
+    except Exception as e:
+        selection_logger.warning(f"Ignoring unreadable CSV cache {sidecar}: {e}")
+        return None
+    return _medweb_cache_entry(key, rows, dates, loaded)
+
+def _write_medweb_sidecar(csv_path: str, entry: dict) -> None:
+    sidecar = _medweb_sidecar_path(csv_path)
+    loaded = entry['loaded']
+    header = {
+        'format': MEDWEB_CACHE_FORMAT,
+        'key': list(entry['key']),
+        'dates': [d.isoformat() for d in entry['dates']],
+        'loaded': None if loaded is None else sorted(d.isoformat() for d in loaded),
+    }
+    rows = _medweb_entry_rows(entry)
+
+    def write_header(path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False)
+    try:
+        os.makedirs(MEDWEB_CACHE_DIR, exist_ok=True)
+        # Data first: a header always describes a complete Parquet file
+        _replace_file(sidecar, lambda path: rows.to_parquet(path))
+        _replace_file(f"{sidecar}.json", write_header)
+    except Exception as e:
+        selection_logger.warning(f"Could not write CSV cache {sidecar}: {e}")
+
+def load_medweb_csv(csv_path: str, date_column: str, target_dates: Optional[Iterable[date]] = None) -> dict:
+    """
+    Parsed medweb CSV rows by date, cached per file fingerprint.
+
+    Only ``target_dates`` are guaranteed in 'rows_by_date' (every day if None);
+    'dates' always lists all dates in the file. Returns {'key', 'rows_by_date':
+    {date: DataFrame}, 'dates': [...], 'columns': [...], 'loaded': set or None}.
+    Rows with unparseable dates are dropped.
+    """
+    try:
+        key = _medweb_csv_key(csv_path, date_column)
+    except OSError as e:
+        raise ValueError(f"Fehler beim Laden der CSV: {e}")
+    wanted = None if target_dates is None else set(target_dates)
+
+    with _medweb_csv_cache_lock:
+        entry = _medweb_csv_cache['entry']
+        if entry is None or entry['key'] != key:
+            entry = _read_medweb_sidecar(csv_path, key)
+        if entry is not None and _medweb_entry_covers(entry, wanted):
+            _medweb_csv_cache['entry'] = entry
+            return entry
+
+        missing = None if wanted is None else wanted - (entry['loaded'] if entry is not None else set())
+        rows, dates = read_medweb_csv(csv_path, date_column, missing)
+        added = _medweb_cache_entry(key, rows, dates, missing)
+        if entry is not None and missing is not None:
+            added['rows_by_date'] = {**entry['rows_by_date'], **added['rows_by_date']}
+            added['loaded'] = entry['loaded'] | missing
+        entry = added
+        _write_medweb_sidecar(csv_path, entry)
+        selection_logger.info(
+            f"Parsed master CSV {csv_path}: {len(rows)} rows for "
+            f"{'all dates' if missing is None else len(missing)} of {len(dates)} dates"
+        )
+
+        _medweb_csv_cache['entry'] = entry
+        return entry
 
 # -----------------------------------------------------------
 # Complex CSV Loading Logic (from medweb)
 # -----------------------------------------------------------
+# Compiled matcher for medweb_mapping rules: an Aho-Corasick automaton over all
+# lowercased 'match' substrings, built once per rules list. Every state knows
+# the lowest rule index among the patterns ending there (directly or via its
+# failure link), so one pass over the activity text finds the first matching
+# rule regardless of the number of rules. Results are memoized per activity.
+_ACTIVITY_MEMO_LIMIT = 10000
+_activity_matcher: Dict[str, Any] = {'rules': None}
+
+def _build_activity_automaton(patterns: List[str]) -> Tuple[List[dict], List[int], List[Optional[int]]]:
+    goto: List[Dict[str, int]] = [{}]
+    best: List[Optional[int]] = [None]
+    for idx, pattern in enumerate(patterns):
+        state = 0
+        for ch in pattern:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                best.append(None)
+            state = nxt
+        if best[state] is None:
+            best[state] = idx
+
+    # Breadth-first: failure links and inherited best rule index
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    for state in queue:
+        for ch, nxt in goto[state].items():
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            queue.append(nxt)
+        inherited = best[fail[state]]
+        if inherited is not None and (best[state] is None or inherited < best[state]):
+            best[state] = inherited
+    return goto, fail, best
+
+def _get_activity_matcher(rules: list) -> dict:
+    matcher = _activity_matcher
+    if matcher['rules'] is rules and matcher['rule_count'] == len(rules):
+        return matcher
+
+    patterns = [str(rule.get('match', '')).lower() for rule in rules]
+    goto, fail, best = _build_activity_automaton(patterns)
+    matcher.update({
+        'rules': rules,
+        'rule_count': len(rules),
+        'goto': goto,
+        'fail': fail,
+        'best': best,
+        'memo': {},
+    })
+    return matcher
+
 def match_mapping_rule(activity_desc: str, rules: list) -> Optional[dict]:
+    """First rule whose 'match' is a case-insensitive substring of ``activity_desc``."""
     if not activity_desc:
         return None
-    activity_lower = activity_desc.lower()
-    for rule in rules:
-        match_str = rule.get('match', '')
-        if match_str.lower() in activity_lower:
-            return rule
-    return None
+    matcher = _get_activity_matcher(rules)
+    memo = matcher['memo']
+    if activity_desc in memo:
+        idx = memo[activity_desc]
+        return rules[idx] if idx is not None else None
+
+    goto, fail, best = matcher['goto'], matcher['fail'], matcher['best']
+    found = best[0]
+    state = 0
+    for ch in activity_desc.lower():
+        if found == 0:
+            break
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        idx = best[state]
+        if idx is not None and (found is None or idx < found):
+            found = idx
+
+    if len(memo) >= _ACTIVITY_MEMO_LIMIT:
+        memo.clear()
+    memo[activity_desc] = found
+    return rules[found] if found is not None else None
 
 def get_worker_skill_mod_combinations(canonical_id: str, worker_roster: dict) -> dict:
     """
@@ -1061,10 +2293,11 @@ def apply_skill_overrides(roster_combinations: dict, rule_overrides: dict) -> di
     Returns:
         Final skill×modality combinations
     """
-    final = roster_combinations.copy()
-
     # Expand shortcuts first
-    expanded_overrides = expand_skill_overrides(rule_overrides)
+    return _apply_expanded_overrides(roster_combinations, expand_skill_overrides(rule_overrides))
+
+def _apply_expanded_overrides(roster_combinations: dict, expanded_overrides: dict) -> dict:
+    final = roster_combinations.copy()
 
     for key, override_value in expanded_overrides.items():
         if key in final:
@@ -1077,6 +2310,52 @@ def apply_skill_overrides(roster_combinations: dict, rule_overrides: dict) -> di
 
     return final
 
+def _new_skill_cache() -> dict:
+    return {'rules': {}, 'roster': {}, 'skills': {}}
+
+def _rule_skill_plan(rule: dict, skill_cache: dict) -> dict:
+    """Target modalities and expanded skill_overrides of a shift rule (cached per rule)."""
+    plan = skill_cache['rules'].get(id(rule))
+    if plan is None:
+        skill_overrides = rule.get('skill_overrides', {})
+        plan = {
+            'rule': rule,  # keeps id(rule) valid for the lifetime of the cache
+            'modalities': [
+                m for m in extract_modalities_from_skill_overrides(skill_overrides)
+                if m in allowed_modalities
+            ],
+            'expanded': expand_skill_overrides(skill_overrides),
+        }
+        skill_cache['rules'][id(rule)] = plan
+    return plan
+
+def _worker_rule_skills(canonical_id: str, rule: dict, worker_roster: dict, skill_cache: dict) -> Dict[str, dict]:
+    """
+    Skill values per target modality for a worker under a shift rule.
+
+    Roster combinations are built once per worker and combined once per
+    (worker, rule) pair, so mapping a CSV row is a dict lookup.
+    """
+    key = (canonical_id, id(rule))
+    skills_by_modality = skill_cache['skills'].get(key)
+    if skills_by_modality is not None:
+        return skills_by_modality
+
+    roster_combinations = skill_cache['roster'].get(canonical_id)
+    if roster_combinations is None:
+        roster_combinations = get_worker_skill_mod_combinations(canonical_id, worker_roster)
+        skill_cache['roster'][canonical_id] = roster_combinations
+
+    plan = _rule_skill_plan(rule, skill_cache)
+    # Roster -1 always wins, shortcuts are expanded
+    final_combinations = _apply_expanded_overrides(roster_combinations, plan['expanded'])
+    skills_by_modality = {
+        modality: {skill: final_combinations.get(f"{skill}_{modality}", 0) for skill in SKILL_COLUMNS}
+        for modality in plan['modalities']
+    }
+    skill_cache['skills'][key] = skills_by_modality
+    return skills_by_modality
+
 def compute_time_ranges(row: pd.Series, rule: dict, target_date: datetime, config: dict) -> List[Tuple[time, time]]:
     """
     Compute time ranges from rule's inline 'times' field.
@@ -1191,65 +2470,24 @@ def apply_exclusions_to_shifts(work_shifts: List[dict], exclusions: List[dict],
     if not exclusions:
         return work_shifts
 
+    excl_intervals = [interval_from_times(e['start_time'], e['end_time']) for e in exclusions]
     result_shifts = []
 
     for shift in work_shifts:
-        shift_start = shift['start_time']
-        shift_end = shift['end_time']
-
-        shift_start_dt = datetime.combine(target_date, shift_start)
-        shift_end_dt = datetime.combine(target_date, shift_end)
-        if shift_end_dt < shift_start_dt:
-            shift_end_dt += timedelta(days=1)
+        shift_interval = interval_from_times(shift['start_time'], shift['end_time'])
+        pieces = subtract_intervals(shift_interval, excl_intervals, min_length=6)
 
-        overlapping_exclusions = []
-        for excl in exclusions:
-            excl_start = excl['start_time']
-            excl_end = excl['end_time']
-
-            excl_start_dt = datetime.combine(target_date, excl_start)
-            excl_end_dt = datetime.combine(target_date, excl_end)
-            if excl_end_dt < excl_start_dt:
-                excl_end_dt += timedelta(days=1)
-
-            if excl_start_dt < shift_end_dt and excl_end_dt > shift_start_dt:
-                overlapping_exclusions.append((excl_start_dt, excl_end_dt))
-
-        if not overlapping_exclusions:
+        if pieces == [shift_interval]:
             result_shifts.append(shift)
             continue
 
-        overlapping_exclusions.sort(key=lambda x: x[0])
-
-        current_start = shift_start_dt
-        for excl_start_dt, excl_end_dt in overlapping_exclusions:
-            if current_start < excl_start_dt:
-                segment_start = current_start.time()
-                segment_end = excl_start_dt.time()
-                segment_timedelta = excl_start_dt - current_start
-
-                if segment_timedelta >= timedelta(minutes=6):
-                    result_shifts.append({
-                        **shift,
-                        'start_time': segment_start,
-                        'end_time': segment_end,
-                        'shift_duration': segment_timedelta.total_seconds() / 3600
-                    })
-
-            current_start = max(current_start, excl_end_dt)
-
-        if current_start < shift_end_dt:
-            segment_start = current_start.time()
-            segment_end = shift_end_dt.time()
-            segment_timedelta = shift_end_dt - current_start
-
-            if segment_timedelta >= timedelta(minutes=6):
-                result_shifts.append({
-                    **shift,
-                    'start_time': segment_start,
-                    'end_time': segment_end,
-                    'shift_duration': segment_timedelta.total_seconds() / 3600
-                })
+        for piece_start, piece_end in pieces:
+            result_shifts.append({
+                **shift,
+                'start_time': minutes_to_time(piece_start),
+                'end_time': minutes_to_time(piece_end),
+                'shift_duration': (piece_end - piece_start) / 60
+            })
 
     return result_shifts
 
@@ -1276,10 +2514,7 @@ def resolve_overlapping_shifts(shifts: List[dict], target_date: date) -> List[di
     # Group shifts by worker
     shifts_by_worker: Dict[str, List[dict]] = {}
     for shift in shifts:
-        worker = shift.get('PPL', '')
-        if worker not in shifts_by_worker:
-            shifts_by_worker[worker] = []
-        shifts_by_worker[worker].append(shift)
+        shifts_by_worker.setdefault(shift.get('PPL', ''), []).append(shift)
 
     result_shifts = []
 
@@ -1288,62 +2523,38 @@ def resolve_overlapping_shifts(shifts: List[dict], target_date: date) -> List[di
             result_shifts.extend(worker_shifts)
             continue
 
-        # Sort by start time (earlier first)
-        sorted_shifts = sorted(
-            worker_shifts,
-            key=lambda s: datetime.combine(target_date, s['start_time'])
-        )
+        intervals = [interval_from_times(s['start_time'], s['end_time']) for s in worker_shifts]
+        order, ends = resolve_later_wins(intervals)
+
+        for pos, end_min in zip(order, ends):
+            current_shift = worker_shifts[pos]
+            start_min = intervals[pos][0]
+
+            # Only keep shifts with a meaningful duration (at least 6 minutes)
+            if end_min is None or end_min - start_min < 6:
+                selection_logger.info(
+                    f"Removed zero-duration shift for {worker} "
+                    f"(was {current_shift['start_time'].strftime('%H:%M')}-{current_shift['end_time'].strftime('%H:%M')})"
+                )
+                continue
 
-        resolved = []
-        for i, current_shift in enumerate(sorted_shifts):
             current_start = current_shift['start_time']
-            current_end = current_shift['end_time']
-
-            current_start_dt = datetime.combine(target_date, current_start)
-            current_end_dt = datetime.combine(target_date, current_end)
-            if current_end_dt < current_start_dt:
-                current_end_dt += timedelta(days=1)
-
-            # Check all later shifts to see if they overlap
-            for j in range(i + 1, len(sorted_shifts)):
-                later_shift = sorted_shifts[j]
-                later_start = later_shift['start_time']
-
-                later_start_dt = datetime.combine(target_date, later_start)
-                if later_start_dt < current_start_dt:
-                    later_start_dt += timedelta(days=1)
-
-                # If later shift starts before current ends, crop current end
-                if later_start_dt < current_end_dt:
-                    current_end_dt = later_start_dt
-                    current_end = later_start
-
-            # If shift still has positive duration, add it
-            if current_end_dt > current_start_dt:
-                duration_hours = (current_end_dt - current_start_dt).total_seconds() / 3600
-
-                # Only add if duration is meaningful (at least 6 minutes)
-                if duration_hours >= 0.1:
-                    resolved_shift = current_shift.copy()
-                    resolved_shift['end_time'] = current_end
-                    resolved_shift['shift_duration'] = duration_hours
-
-                    # Update TIME field only if it was present in original shift
-                    if 'TIME' in current_shift:
-                        resolved_shift['TIME'] = f"{current_start.strftime('%H:%M')}-{current_end.strftime('%H:%M')}"
-
-                    resolved.append(resolved_shift)
-                    selection_logger.debug(
-                        f"Shift for {worker}: {current_start.strftime('%H:%M')}-{current_end.strftime('%H:%M')} "
-                        f"(duration: {duration_hours:.2f}h)"
-                    )
-                else:
-                    selection_logger.info(
-                        f"Removed zero-duration shift for {worker} "
-                        f"(was {current_shift['start_time'].strftime('%H:%M')}-{current_shift['end_time'].strftime('%H:%M')})"
-                    )
+            current_end = minutes_to_time(end_min)
+            duration_hours = (end_min - start_min) / 60
+
+            resolved_shift = current_shift.copy()
+            resolved_shift['end_time'] = current_end
+            resolved_shift['shift_duration'] = duration_hours
 
-        result_shifts.extend(resolved)
+            # Update TIME field only if it was present in original shift
+            if 'TIME' in current_shift:
+                resolved_shift['TIME'] = f"{current_start.strftime('%H:%M')}-{current_end.strftime('%H:%M')}"
+
+            result_shifts.append(resolved_shift)
+            selection_logger.debug(
+                f"Shift for {worker}: {current_start.strftime('%H:%M')}-{current_end.strftime('%H:%M')} "
+                f"(duration: {duration_hours:.2f}h)"
+            )
 
     return result_shifts
 
@@ -1391,13 +2602,87 @@ def resolve_overlapping_shifts_df(df: pd.DataFrame) -> pd.DataFrame:
     return result_df
 
 
+def _medweb_columns(config: dict) -> dict:
+    return config.get('medweb_mapping', {}).get('columns', {
+        'date': 'Datum',
+        'activity': 'Beschreibung der Aktivität',
+        'employee_name': 'Name des Mitarbeiters',
+        'employee_code': 'Code des Mitarbeiters'
+    })
+
+def build_working_hours_for_dates(
+    csv_path: str,
+    target_dates: List[date],
+    config: dict,
+    max_workers: Optional[int] = None
+) -> Dict[date, Dict[str, pd.DataFrame]]:
+    """
+    Build working hours DataFrames for several days in one pass.
+
+    The days' CSV rows are read (or taken from the cache) once and grouped by date;
+    mapping rules and the worker roster are resolved once for all days.
+    With ``max_workers`` > 1 the days are built in a process pool.
+
+    Returns {date: {modality: DataFrame}}; days without rows map to {}.
+    """
+    cols = _medweb_columns(config)
+    days = list(dict.fromkeys(d.date() if isinstance(d, datetime) else d for d in target_dates))
+    entry = load_medweb_csv(csv_path, cols.get('date', 'Datum'), days)
+    parsed_dates = entry['dates']
+
+    selection_logger.debug(f"CSV dates parsed: {parsed_dates}, targets: {days}")
+
+    result: Dict[date, Dict[str, pd.DataFrame]] = {}
+    jobs = []
+    for day in days:
+        day_df = entry['rows_by_date'].get(day)
+        if day_df is None or day_df.empty:
+            selection_logger.warning(f"No rows found for date {day}. Available: {parsed_dates}")
+            result[day] = {}
+        else:
+            jobs.append((day, day_df))
+    if not jobs:
+        return result
+
+    mapping_rules = config.get('medweb_mapping', {}).get('rules', [])
+    worker_roster = get_merged_worker_roster(config)
+
+    if max_workers and max_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            futures = {
+                day: pool.submit(_build_day_schedules, day_df, day, config, mapping_rules, worker_roster)
+                for day, day_df in jobs
+            }
+            for day, future in futures.items():
+                result[day] = future.result()
+    else:
+        skill_cache = _new_skill_cache()
+        for day, day_df in jobs:
+            result[day] = _build_day_schedules(day_df, day, config, mapping_rules, worker_roster, skill_cache)
+    return result
+
 def build_working_hours_from_medweb(
     csv_path: str,
     target_date: datetime,
     config: dict
+) -> Dict[str, pd.DataFrame]:
+    """Build working hours DataFrames for one day from medweb CSV (see _build_day_schedules)."""
+    target_date_obj = target_date.date() if isinstance(target_date, datetime) else target_date
+    return build_working_hours_for_dates(csv_path, [target_date_obj], config)[target_date_obj]
+
+def _build_day_schedules(
+    day_df: pd.DataFrame,
+    target_date_obj: date,
+    config: dict,
+    mapping_rules: list,
+    worker_roster: dict,
+    skill_cache: Optional[dict] = None
 ) -> Dict[str, pd.DataFrame]:
     """
-    Build working hours DataFrames from medweb CSV.
+    Build one day's working hours DataFrames from that day's medweb rows.
+
+    ``skill_cache`` (see _worker_rule_skills) can be shared across the days
+    of one build.
 
     New unified structure:
     - Shifts have 'times' (day-specific) and 'skill_overrides' (REQUIRED)
@@ -1407,56 +2692,9 @@ def build_working_hours_from_medweb(
     - Day plan building: later shift ends prior, gaps always win
     - Standalone gaps with no shift create "unavailable" entries
     """
-    try:
-        try:
-            medweb_df = pd.read_csv(csv_path, sep=',', encoding='utf-8')
-        except UnicodeDecodeError:
-            medweb_df = pd.read_csv(csv_path, sep=',', encoding='latin1')
-    except Exception:
-        try:
-            try:
-                medweb_df = pd.read_csv(csv_path, sep=';', encoding='utf-8')
-            except UnicodeDecodeError:
-                medweb_df = pd.read_csv(csv_path, sep=';', encoding='latin1')
-        except Exception as e:
-            raise ValueError(f"Fehler beim Laden der CSV: {e}")
-
-    def parse_german_date(date_val):
-        if pd.isna(date_val):
-            return None
-        date_str = str(date_val).strip()
-        for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y']:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-        try:
-            return pd.to_datetime(date_str, dayfirst=True).date()
-        except Exception:
-            return None
-
-    vendor_mapping = config.get('medweb_mapping', {})
-    cols = vendor_mapping.get('columns', {
-        'date': 'Datum',
-        'activity': 'Beschreibung der Aktivität',
-        'employee_name': 'Name des Mitarbeiters',
-        'employee_code': 'Code des Mitarbeiters'
-    })
-
-    medweb_df['Datum_parsed'] = medweb_df[cols.get('date', 'Datum')].apply(parse_german_date)
-    target_date_obj = target_date.date() if hasattr(target_date, 'date') else target_date
-
-    parsed_dates = medweb_df['Datum_parsed'].dropna().unique().tolist()
-    selection_logger.debug(f"CSV dates parsed: {parsed_dates}, target: {target_date_obj}, type: {type(target_date_obj)}")
-
-    day_df = medweb_df[medweb_df['Datum_parsed'] == target_date_obj]
-
-    if day_df.empty:
-        selection_logger.warning(f"No rows found for date {target_date_obj}. Available: {parsed_dates}")
-        return {}
-
-    mapping_rules = vendor_mapping.get('rules', [])
-    worker_roster = get_merged_worker_roster(config)
+    cols = _medweb_columns(config)
+    if skill_cache is None:
+        skill_cache = _new_skill_cache()
 
     selection_logger.debug(f"Found {len(day_df)} rows for target date, {len(mapping_rules)} mapping rules")
 
@@ -1519,8 +2757,7 @@ def build_working_hours_from_medweb(
             continue
 
         # Derive modalities from skill_overrides keys (e.g., MSK_ct → ct)
-        target_modalities = extract_modalities_from_skill_overrides(skill_overrides)
-        target_modalities = [m for m in target_modalities if m in allowed_modalities]
+        target_modalities = _rule_skill_plan(rule, skill_cache)['modalities']
 
         if not target_modalities:
             selection_logger.warning(
@@ -1530,13 +2767,10 @@ def build_working_hours_from_medweb(
 
         workers_with_shifts.add(canonical_id)
 
-        # Get worker's Skill×Modality combinations from roster (all combinations)
-        roster_combinations = get_worker_skill_mod_combinations(canonical_id, worker_roster)
-
-        # Apply skill_overrides (roster -1 always wins, shortcuts are expanded)
-        final_combinations = apply_skill_overrides(roster_combinations, skill_overrides)
+        # Worker's roster Skill×Modality combinations with the rule's skill_overrides applied
+        skills_by_modality = _worker_rule_skills(canonical_id, rule, worker_roster, skill_cache)
 
-        time_ranges = compute_time_ranges(row, rule, target_date, config)
+        time_ranges = compute_time_ranges(row, rule, target_date_obj, config)
 
         # Handle embedded gaps in shift rule (team-specific gaps)
         embedded_gaps = rule.get('gaps', {})
@@ -1559,11 +2793,7 @@ def build_working_hours_from_medweb(
                 )
 
         for modality in target_modalities:
-            # Extract skills for THIS modality from combinations
-            modality_skills = {}
-            for skill in SKILL_COLUMNS:
-                combo_key = f"{skill}_{modality}"
-                modality_skills[skill] = final_combinations.get(combo_key, 0)
+            modality_skills = skills_by_modality[modality]
 
             for start_time, end_time in time_ranges:
                 start_dt = datetime.combine(target_date_obj, start_time)
@@ -1697,7 +2927,7 @@ def build_working_hours_from_medweb(
         df = pd.DataFrame(rows)
         if 'canonical_id' in df.columns:
             df = df.drop(columns=['canonical_id'])
-        result[modality] = df
+        result[modality] = compact_schedule_df(df, SKILL_COLUMNS)
 
     selection_logger.info(f"Loaded {sum(len(df) for df in result.values())} workers across {list(result.keys())}")
     return result
@@ -1726,6 +2956,7 @@ def clear_staged_data(modality: Optional[str] = None) -> Dict[str, Any]:
             staged_modality_data[mod]['total_work_hours'] = {}
             staged_modality_data[mod]['worker_modifiers'] = {}
             staged_modality_data[mod]['last_modified'] = None
+            mark_schedule_changed(mod, use_staged=True)
 
             if row_count > 0:
                 cleared.append({'modality': mod, 'rows_cleared': row_count})
@@ -1760,7 +2991,7 @@ def preload_next_workday(csv_path: str, config: dict) -> dict:
             target_path = d['scheduled_file_path']
 
             try:
-                export_df = df.copy()
+                export_df = expand_schedule_df(df, SKILL_COLUMNS)
                 export_df['TIME'] = export_df['start_time'].apply(lambda x: x.strftime(TIME_FORMAT)) + '-' + \
                                     export_df['end_time'].apply(lambda x: x.strftime(TIME_FORMAT))
 
@@ -1,14 +1,20 @@
 
 import multiprocessing
 import logging
+import os
 from logging.handlers import RotatingFileHandler
 import sys
 # Basic configuration
 bind = "0.0.0.0:5019"
-workers = 1
-worker_class = "gevent"
+# More than one worker requires `state_backend: {type: sqlite}` in config.yaml;
+# with the default local backend every worker would keep its own counters.
+workers = int(os.environ.get('CORTEX_GUNICORN_WORKERS', 1))
+# The sqlite state backend refuses to start under gevent (its lock waits would
+# block the whole worker); run it with CORTEX_GUNICORN_WORKER_CLASS=gthread.
+# Under gevent, balancer.precompute_next_assignee stays off as well.
+worker_class = os.environ.get('CORTEX_GUNICORN_WORKER_CLASS', "gevent")
 worker_connections = 1000
-threads = 1 
+threads = int(os.environ.get('CORTEX_GUNICORN_THREADS', 4 if worker_class == "gthread" else 1))
 timeout = 60
 keepalive = 5
 preload_app = False
@@ -0,0 +1,98 @@
+"""
+Interval algebra on integer minutes for shift and gap handling.
+
+Shifts, exclusions and gaps are represented as half-open ``(start, end)``
+tuples of minutes since midnight of the schedule day. An end earlier than its
+start denotes an overnight interval and is moved to the next day (``+1440``),
+so every interval satisfies ``start <= end`` and plain integer comparisons
+replace ``datetime.combine`` arithmetic.
+
+- ``align_to_shift``: move an interval given in clock times into the
+  after-midnight part of an overnight shift.
+- ``subtract_intervals``: sweep-line subtraction of cut intervals (exclusions,
+  gaps) from one base interval.
+- ``resolve_later_wins``: crop each interval of one worker at the start of the
+  next one ("the later shift wins").
+"""
+
+from datetime import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+Interval = Tuple[int, int]
+
+
+def interval_from_times(start: time, end: time) -> Interval:
+    """Return ``(start, end)`` minutes for a time pair; ``end < start`` is overnight."""
+    start_min = start.hour * 60 + start.minute
+    end_min = end.hour * 60 + end.minute
+    if end_min < start_min:
+        end_min += MINUTES_PER_DAY
+    return start_min, end_min
+
+
+def minutes_to_time(minutes: int) -> time:
+    """Inverse of :func:`interval_from_times` for a single boundary (wraps past midnight)."""
+    minutes %= MINUTES_PER_DAY
+    return time(minutes // 60, minutes % 60)
+
+
+def overlaps(a: Interval, b: Interval) -> bool:
+    """True if two half-open intervals share at least one minute."""
+    return a[0] < b[1] and b[0] < a[1]
+
+
+def align_to_shift(shift: Interval, interval: Interval) -> Interval:
+    """Place ``interval`` on the day of ``shift``'s minutes.
+
+    For a shift crossing midnight, an interval that ends before the shift
+    starts lies in its after-midnight part and is moved by one day, e.g. a
+    02:00-03:00 gap in a 22:00-06:00 shift becomes ``(1560, 1620)``.
+    Otherwise ``interval`` is returned unchanged.
+    """
+    if shift[1] > MINUTES_PER_DAY and interval[1] <= shift[0]:
+        return interval[0] + MINUTES_PER_DAY, interval[1] + MINUTES_PER_DAY
+    return interval
+
+
+def subtract_intervals(base: Interval, cuts: Iterable[Interval], min_length: int = 1) -> List[Interval]:
+    """Remove ``cuts`` from ``base`` and return the remaining pieces in order.
+
+    Cuts are sorted by start and swept once (O(k log k) for k overlapping
+    cuts). Remaining pieces shorter than ``min_length`` minutes are dropped.
+    """
+    start, end = base
+    relevant = sorted(c for c in cuts if c[0] < end and c[1] > start)
+    if not relevant:
+        return [base]
+
+    pieces: List[Interval] = []
+    cursor = start
+    for cut_start, cut_end in relevant:
+        if cursor < cut_start and cut_start - cursor >= min_length:
+            pieces.append((cursor, cut_start))
+        if cut_end > cursor:
+            cursor = cut_end
+    if cursor < end and end - cursor >= min_length:
+        pieces.append((cursor, end))
+    return pieces
+
+
+def resolve_later_wins(intervals: Sequence[Interval]) -> Tuple[List[int], List[Optional[int]]]:
+    """Resolve overlaps among one worker's intervals; the later one wins.
+
+    Returns ``(order, ends)``: ``order`` lists the input positions sorted by
+    start (stable for equal starts) and ``ends[k]`` is the cropped end of
+    ``intervals[order[k]]``, or ``None`` if it is fully covered by the next
+    one. Because starts are sorted, only the immediate successor can crop an
+    interval, which makes this a single O(n log n) sort plus a linear pass.
+    """
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    ends: List[Optional[int]] = []
+    for k, pos in enumerate(order):
+        start, end = intervals[pos]
+        if k + 1 < len(order):
+            end = min(end, intervals[order[k + 1]][0])
+        ends.append(end if end > start else None)
+    return order, ends
@@ -0,0 +1,256 @@
+"""
+Pluggable storage backends for the balancer's shared state.
+
+The in-memory dicts in ``data_manager`` stay the working copy; a backend only
+decides where fairness counters and schedule DataFrames live between requests.
+
+- ``LocalStateBackend``: process-local (default). Nothing is shared; state is
+  persisted by the fairness journal/snapshot files in ``data_manager``.
+- ``SQLiteStateBackend``: one SQLite database in WAL mode shared by all
+  gunicorn worker processes. Assignments are stored as an append-only event
+  log, periodically compacted into a full state snapshot; schedules are stored
+  versioned per modality (live and staged) as Parquet bytes of the DataFrame
+  plus a JSON document with the remaining fields. Nothing is unpickled.
+
+Cross-process atomicity comes from ``transaction()``: on SQLite it opens a
+``BEGIN IMMEDIATE`` transaction, which holds the database write lock until
+commit, so a sync -> select -> record sequence inside it cannot interleave
+with another worker's. Waiting for that lock blocks inside sqlite3 without
+yielding, so the SQLite backend refuses to start under gevent (where it would
+stall every request of the worker); run it with gthread or sync workers.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from lib.utils import threads_are_greenlets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = os.path.join('uploads', 'cortex_state.sqlite')
+DEFAULT_SQLITE_TIMEOUT_SECONDS = 30.0
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    seq   INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts    TEXT NOT NULL,
+    mod   TEXT NOT NULL,
+    ppl   TEXT NOT NULL,
+    id    TEXT NOT NULL,
+    skill TEXT,
+    w     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state_snapshot (
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL,
+    seq        INTEGER NOT NULL,
+    payload    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backend_info (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    epoch TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule_frames (
+    key     TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    frame   BLOB,
+    meta    TEXT NOT NULL
+);
+"""
+
+
+class LocalStateBackend:
+    """Process-local state: nothing to share, every operation is a no-op."""
+
+    shared = False
+
+    def __init__(self):
+        # Versions are counted per process; a restart starts a new epoch
+        self.epoch = uuid.uuid4().hex[:8]
+
+    @contextmanager
+    def transaction(self, exclusive: bool = True) -> Iterator[None]:
+        yield None
+
+
+class SQLiteStateBackend:
+    """
+    State shared between worker processes through a SQLite database (WAL mode).
+
+    Connections are per thread. ``transaction()`` is re-entrant within a
+    thread; the methods below join the caller's transaction when one is open
+    and otherwise run in their own short one.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, timeout: float = DEFAULT_SQLITE_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SQLITE_SCHEMA)
+        # Shared by every process using this database; a new database starts a new epoch
+        conn.execute('INSERT OR IGNORE INTO backend_info (id, epoch) VALUES (1, ?)', (uuid.uuid4().hex[:8],))
+        self.epoch = conn.execute('SELECT epoch FROM backend_info WHERE id = 1').fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: transactions are managed explicitly below
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self, exclusive: bool = True) -> Iterator[sqlite3.Connection]:
+        """
+        Hold the database write lock (re-entrant within the calling thread).
+
+        ``exclusive=False`` opens a deferred read transaction instead: a
+        consistent view that does not block other workers.
+        """
+        conn = self._connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute('BEGIN IMMEDIATE' if exclusive else 'BEGIN')
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth = 0
+            conn.execute('ROLLBACK')
+            raise
+        self._local.depth = 0
+        conn.execute('COMMIT')
+
+    # --- Assignment events -------------------------------------------------
+
+    def append_assignment(self, record: Dict[str, Any]) -> int:
+        """Append one assignment event; returns its sequence number."""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO assignments (ts, mod, ppl, id, skill, w) VALUES (?, ?, ?, ?, ?, ?)',
+                (record['ts'], record['mod'], record['ppl'], record['id'], record['skill'], record['w'])
+            )
+            return cursor.lastrowid
+
+    def assignments_since(self, seq: int) -> List[Dict[str, Any]]:
+        """Assignment events newer than ``seq``, oldest first."""
+        rows = self._connection().execute(
+            'SELECT seq, ts, mod, ppl, id, skill, w FROM assignments WHERE seq > ? ORDER BY seq',
+            (seq,)
+        ).fetchall()
+        return [
+            {'seq': row[0], 'ts': row[1], 'mod': row[2], 'ppl': row[3], 'id': row[4], 'skill': row[5], 'w': row[6]}
+            for row in rows
+        ]
+
+    def sync_markers(self) -> Tuple[int, int, Dict[str, int]]:
+        """
+        (snapshot generation, newest assignment seq, schedule versions): enough
+        to tell whether a worker's copy is stale without reading any state.
+        """
+        with self.transaction(exclusive=False) as conn:
+            generation = conn.execute('SELECT generation FROM state_snapshot WHERE id = 1').fetchone()
+            seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM assignments').fetchone()[0]
+            versions = dict(conn.execute('SELECT key, version FROM schedule_frames').fetchall())
+        return (generation[0] if generation else 0), seq, versions
+
+    def has_assignments(self) -> bool:
+        return self._connection().execute('SELECT 1 FROM assignments LIMIT 1').fetchone() is not None
+
+    # --- State snapshot ----------------------------------------------------
+
+    def snapshot_generation(self) -> int:
+        """Counter bumped on every snapshot write (0 = no snapshot yet)."""
+        row = self._connection().execute('SELECT generation FROM state_snapshot WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+    def read_snapshot(self) -> Optional[Tuple[int, int, str]]:
+        """Returns (generation, seq, payload) or None."""
+        row = self._connection().execute(
+            'SELECT generation, seq, payload FROM state_snapshot WHERE id = 1'
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def write_snapshot(self, payload: str, seq: int) -> int:
+        """
+        Store a full state snapshot covering events up to ``seq`` and drop
+        those events (compaction). Returns the new snapshot generation.
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO state_snapshot (id, generation, seq, payload) VALUES (1, 1, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET generation = generation + 1, seq = excluded.seq, payload = excluded.payload',
+                (seq, payload)
+            )
+            conn.execute('DELETE FROM assignments WHERE seq <= ?', (seq,))
+            return conn.execute('SELECT generation FROM state_snapshot WHERE id = 1').fetchone()[0]
+
+    # --- Schedules ---------------------------------------------------------
+
+    def schedule_versions(self) -> Dict[str, int]:
+        rows = self._connection().execute('SELECT key, version FROM schedule_frames').fetchall()
+        return {key: version for key, version in rows}
+
+    def read_schedule(self, key: str) -> Optional[Tuple[int, Optional[bytes], str]]:
+        """Returns (version, Parquet bytes or None, JSON meta) or None."""
+        row = self._connection().execute(
+            'SELECT version, frame, meta FROM schedule_frames WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], (bytes(row[1]) if row[1] is not None else None), row[2]
+
+    def publish_schedule(self, key: str, frame: Optional[bytes], meta: str) -> int:
+        """Store a schedule (Parquet bytes, None without DataFrame) and its JSON meta; returns its new version."""
+        blob = sqlite3.Binary(frame) if frame is not None else None
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO schedule_frames (key, version, frame, meta) VALUES (?, 1, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET version = version + 1, frame = excluded.frame, meta = excluded.meta',
+                (key, blob, meta)
+            )
+            return conn.execute('SELECT version FROM schedule_frames WHERE key = ?', (key,)).fetchone()[0]
+
+
+def create_state_backend(settings: Optional[Dict[str, Any]] = None):
+    """
+    Build the backend configured under ``state_backend`` in config.yaml.
+
+    Unknown types fall back to the local backend with a warning; ``sqlite``
+    raises RuntimeError under gevent.
+    """
+    settings = settings or {}
+    backend_type = str(settings.get('type', 'local')).strip().lower()
+    if backend_type == 'sqlite':
+        if threads_are_greenlets():
+            raise RuntimeError(
+                "state_backend 'sqlite' cannot run under gevent: waiting for the database lock "
+                "would block the whole worker. Start gunicorn with CORTEX_GUNICORN_WORKER_CLASS=gthread."
+            )
+        path = settings.get('path') or DEFAULT_SQLITE_PATH
+        timeout = float(settings.get('timeout_seconds', DEFAULT_SQLITE_TIMEOUT_SECONDS))
+        logger.info(f"Using shared SQLite state backend at {path}")
+        return SQLiteStateBackend(path, timeout=timeout)
+    if backend_type != 'local':
+        logger.warning(f"Unknown state_backend type '{backend_type}', using local state")
+    return LocalStateBackend()
@@ -1,8 +1,10 @@
 # Standard library imports
 import logging
+import sys
 from datetime import datetime, time, timedelta, date
 from typing import Any, List, Optional, Tuple, Dict
 import pytz
+import numpy as np
 import pandas as pd
 
 # -----------------------------------------------------------
@@ -26,6 +28,18 @@ def coerce_int(value: Any, default: int = 0) -> int:
     except (TypeError, ValueError):
         return default
 
+# -----------------------------------------------------------
+# Runtime Detection
+# -----------------------------------------------------------
+def threads_are_greenlets() -> bool:
+    """
+    True under gevent monkey-patching (gunicorn ``worker_class = "gevent"``):
+    threads are greenlets on the worker's request loop and blocking calls in C
+    code (sqlite3 lock waits, numpy) stall every request of the worker.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
 # -----------------------------------------------------------
 # Helper for Config Normalization
 # -----------------------------------------------------------
@@ -112,6 +126,57 @@ def compute_shift_window(
     end_dt = start_dt + timedelta(minutes=end_minutes - start_minutes)
     return start_dt, end_dt
 
+def time_to_minutes(value: time) -> int:
+    """Return minutes since midnight for a ``datetime.time``."""
+    return value.hour * 60 + value.minute
+
+def add_shift_minute_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Store shift start/end as integer minutes-of-day (``start_min``/``end_min``).
+
+    The balancer reads these columns to evaluate shift windows with array
+    operations instead of building datetimes row by row. Call again after
+    editing ``start_time``/``end_time`` so the columns stay in sync.
+    """
+    if df is None or df.empty:
+        return df
+    if not {'start_time', 'end_time'}.issubset(df.columns):
+        return df
+    df['start_min'] = np.fromiter(
+        (time_to_minutes(v) for v in df['start_time']), dtype=np.int16, count=len(df)
+    )
+    df['end_min'] = np.fromiter(
+        (time_to_minutes(v) for v in df['end_time']), dtype=np.int16, count=len(df)
+    )
+    return df
+
+def compute_shift_offsets(
+    start_min: np.ndarray, end_min: np.ndarray, reference_dt: datetime
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized counterpart of :func:`compute_shift_window`.
+
+    Returns ``(minutes_since_start, minutes_until_end, duration_minutes)`` for
+    every shift relative to ``reference_dt``. Overnight shifts (end <= start)
+    are resolved arithmetically: in the early-morning portion the shift is
+    treated as having started the previous day.
+    """
+    start_min = np.asarray(start_min, dtype=np.int64)
+    end_min = np.asarray(end_min, dtype=np.int64)
+    ref_minutes = reference_dt.hour * 60 + reference_dt.minute
+    now_minutes = (
+        ref_minutes
+        + reference_dt.second / 60.0
+        + reference_dt.microsecond / 60_000_000.0
+    )
+
+    overnight = end_min <= start_min
+    duration = np.where(overnight, end_min + 24 * 60 - start_min, end_min - start_min)
+    started_yesterday = overnight & (ref_minutes < end_min)
+    start_abs = np.where(started_yesterday, start_min - 24 * 60, start_min)
+
+    since_start = now_minutes - start_abs
+    until_end = (start_abs + duration) - now_minutes
+    return since_start, until_end, duration
+
 def is_now_in_shift(start_time: time, end_time: time, current_dt: datetime) -> bool:
     """Check whether ``current_dt`` falls inside the given shift window."""
     start_dt, end_dt = compute_shift_window(start_time, end_time, current_dt)
@@ -235,3 +300,115 @@ def skill_value_to_numeric(value: Any) -> int:
 def is_weighted_skill(value: Any) -> bool:
     """Check whether a skill value represents a weighted/assisted assignment."""
     return value == WEIGHTED_SKILL_MARKER
+
+# -----------------------------------------------------------
+# Typed Schedule Model
+# -----------------------------------------------------------
+# In memory, skill columns hold int8 levels (-1/0/1) and the 'w' marker lives in
+# one bitmask column (bit i = skill_columns[i] is weighted), so the balancer can
+# compare levels as arrays. The Excel/JSON edges keep the -1/0/1/'w' notation.
+SKILL_WEIGHTED_COLUMN = 'skill_weighted'
+
+def _skill_bit(skill: str, skill_columns: List[str]) -> int:
+    return 1 << skill_columns.index(skill)
+
+def compact_schedule_df(df: pd.DataFrame, skill_columns: List[str]) -> pd.DataFrame:
+    """Convert a schedule to the typed in-memory model (in place, idempotent).
+
+    - ``start_min``/``end_min``: int16 minutes of day
+    - skill columns: int8 levels; ``'w'`` becomes level 1 plus its bit in
+      ``skill_weighted``
+    - ``PPL``: categorical
+
+    Columns that are already typed are left alone, so rows appended with raw
+    values (e.g. after ``pd.concat``) are converted without touching the
+    weighted bits of existing rows.
+    """
+    if df is None or df.empty:
+        return df
+
+    add_shift_minute_columns(df)
+
+    if SKILL_WEIGHTED_COLUMN in df.columns:
+        weighted = df[SKILL_WEIGHTED_COLUMN].fillna(0).to_numpy(dtype=np.int64, copy=True)
+    else:
+        weighted = np.zeros(len(df), dtype=np.int64)
+
+    for skill in skill_columns:
+        if skill not in df.columns or df[skill].dtype == np.int8:
+            continue
+        values = [normalize_skill_value(v) for v in df[skill].tolist()]
+        levels = np.fromiter((skill_value_to_numeric(v) for v in values), dtype=np.int8, count=len(values))
+        is_weighted = np.fromiter((is_weighted_skill(v) for v in values), dtype=bool, count=len(values))
+        weighted |= np.where(is_weighted, _skill_bit(skill, skill_columns), 0)
+        df[skill] = levels
+
+    df[SKILL_WEIGHTED_COLUMN] = weighted
+    if 'PPL' in df.columns and not isinstance(df['PPL'].dtype, pd.CategoricalDtype):
+        df['PPL'] = df['PPL'].astype('category')
+    return df
+
+def schedule_skill_arrays(df: pd.DataFrame, skill: str, skill_columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (int8 levels, weighted bool mask) of one skill column, typed or raw."""
+    if df[skill].dtype == np.int8:
+        levels = df[skill].to_numpy()
+        if SKILL_WEIGHTED_COLUMN in df.columns:
+            weighted = (df[SKILL_WEIGHTED_COLUMN].to_numpy(dtype=np.int64) & _skill_bit(skill, skill_columns)) != 0
+        else:
+            weighted = np.zeros(len(df), dtype=bool)
+        return levels, weighted
+
+    values = [normalize_skill_value(v) for v in df[skill].tolist()]
+    levels = np.fromiter((skill_value_to_numeric(v) for v in values), dtype=np.int8, count=len(values))
+    weighted = np.fromiter((is_weighted_skill(v) for v in values), dtype=bool, count=len(values))
+    return levels, weighted
+
+def get_schedule_skill_value(row: pd.Series, skill: str, skill_columns: List[str]) -> Any:
+    """Skill value of one schedule row in edge notation (-1/0/1/'w')."""
+    value = row.get(skill, 0)
+    if pd.isnull(value):
+        return 0
+    weighted = row.get(SKILL_WEIGHTED_COLUMN)
+    if weighted is not None and pd.notnull(weighted) and int(weighted) & _skill_bit(skill, skill_columns):
+        return WEIGHTED_SKILL_MARKER
+    return normalize_skill_value(value)
+
+def set_schedule_skill_value(df: pd.DataFrame, row_index: Any, skill: str, value: Any, skill_columns: List[str]) -> None:
+    """Write an edge-notation skill value into a (typed or raw) schedule row."""
+    value = normalize_skill_value(value)
+    if df[skill].dtype != np.int8:
+        df.at[row_index, skill] = value
+        return
+
+    df.at[row_index, skill] = skill_value_to_numeric(value)
+    if SKILL_WEIGHTED_COLUMN not in df.columns:
+        df[SKILL_WEIGHTED_COLUMN] = 0
+    bit = _skill_bit(skill, skill_columns)
+    mask = int(df.at[row_index, SKILL_WEIGHTED_COLUMN])
+    df.at[row_index, SKILL_WEIGHTED_COLUMN] = (mask | bit) if is_weighted_skill(value) else (mask & ~bit)
+
+def expand_schedule_df(df: pd.DataFrame, skill_columns: List[str]) -> pd.DataFrame:
+    """Copy of a typed schedule in edge notation for Excel/JSON export.
+
+    Skill columns get their ``'w'`` markers back, PPL becomes plain strings and
+    the internal ``skill_weighted``/``start_min``/``end_min`` columns are dropped.
+    """
+    out = df.drop(columns=[SKILL_WEIGHTED_COLUMN, 'start_min', 'end_min'], errors='ignore')
+    if df.empty:
+        return out
+
+    for skill in skill_columns:
+        if skill not in df.columns or df[skill].dtype != np.int8:
+            continue
+        levels, weighted = schedule_skill_arrays(df, skill, skill_columns)
+        if weighted.any():
+            out[skill] = pd.Series(
+                np.where(weighted, WEIGHTED_SKILL_MARKER, levels.astype(object)),
+                index=df.index,
+                dtype=object,
+            )
+        else:
+            out[skill] = levels.astype(np.int64)
+    if 'PPL' in out.columns and isinstance(out['PPL'].dtype, pd.CategoricalDtype):
+        out['PPL'] = out['PPL'].astype(object)
+    return out
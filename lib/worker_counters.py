@@ -0,0 +1,318 @@
+"""
+Array-backed fairness counters keyed by interned worker IDs.
+
+Canonical worker IDs are interned once into dense integer codes
+(``WorkerIndex``, append-only between compactions), and the cross-modality
+counters are NumPy arrays indexed by those codes:
+
+- ``WeightedCounts``: weighted assignments per worker, shape (workers,).
+- ``AssignmentCounts``: assignments per worker, modality and skill plus a
+  ``total`` column, shape (workers, modalities, skills + 1).
+
+Both keep the dict-shaped API of the nested dicts they replace
+(``weighted[canonical_id]``, ``assignments[modality][canonical_id][skill]``)
+for templates and journal replay; ``to_dict()`` returns the JSON form used by
+state snapshots. Workers that were never counted are missing keys, not zero
+rows, exactly as before. ``values_for()`` gathers many workers at once.
+"""
+
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+_INITIAL_CAPACITY = 64
+
+
+class WorkerIndex:
+    """
+    Canonical worker ID <-> dense integer code.
+
+    ``generation`` changes whenever compact() renumbers the codes; arrays and
+    caches indexed by codes are only valid for the generation they were built in.
+    """
+
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def code(self, canonical_id: str) -> int:
+        """Code of ``canonical_id``, interning it on first use."""
+        code = self.codes.get(canonical_id)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self.codes.get(canonical_id)
+            if code is None:
+                code = len(self.ids)
+                self.ids.append(canonical_id)
+                self.codes[canonical_id] = code
+            return code
+
+    def codes_for(self, canonical_ids: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.code(c) for c in canonical_ids), dtype=np.int64, count=len(canonical_ids))
+
+    def compact(self, keep: Iterable[str]) -> int:
+        """
+        Drop every ID not in ``keep`` and renumber the rest densely (in their
+        previous order). Returns the number of dropped IDs; if any, the
+        generation changes and counters built on this index must be rebuilt
+        (e.g. from their to_dict()).
+        """
+        keep = set(keep)
+        with self._lock:
+            kept = [canonical_id for canonical_id in self.ids if canonical_id in keep]
+            dropped = len(self.ids) - len(kept)
+            if dropped:
+                self.ids = kept
+                self.codes = {canonical_id: code for code, canonical_id in enumerate(kept)}
+                self.generation += 1
+            return dropped
+
+
+def _grown(array: np.ndarray, rows: int) -> np.ndarray:
+    capacity = max(_INITIAL_CAPACITY, len(array))
+    while capacity < rows:
+        capacity *= 2
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class WeightedCounts(MutableMapping):
+    """Weighted assignment count per canonical worker ID (float64 array)."""
+
+    def __init__(self, index: WorkerIndex, data: Optional[Mapping[str, float]] = None) -> None:
+        self.index = index
+        self._values = np.zeros(0, dtype=np.float64)
+        self._present = np.zeros(0, dtype=bool)
+        self._lock = threading.Lock()  # Growth and writes
+        for canonical_id, value in (data or {}).items():
+            self[canonical_id] = value
+
+    def _slot(self, canonical_id: str) -> int:
+        # Caller holds self._lock
+        code = self.index.code(canonical_id)
+        if code >= len(self._values):
+            self._values = _grown(self._values, code + 1)
+            self._present = _grown(self._present, code + 1)
+        return code
+
+    def add(self, canonical_id: str, amount: float) -> None:
+        with self._lock:
+            code = self._slot(canonical_id)
+            self._values[code] += amount
+            self._present[code] = True
+
+    def get(self, canonical_id: str, default: Any = None) -> Any:
+        code = self.index.codes.get(canonical_id)
+        present = self._present
+        if code is None or code >= len(present) or not present[code]:
+            return default
+        return float(self._values[code])
+
+    def values_for(self, codes: np.ndarray) -> np.ndarray:
+        """Counts for an array of worker codes (0.0 for workers never counted)."""
+        values = self._values
+        codes = np.asarray(codes, dtype=np.int64)
+        result = np.zeros(len(codes), dtype=np.float64)
+        known = codes < len(values)
+        result[known] = values[codes[known]]
+        return result
+
+    def __getitem__(self, canonical_id: str) -> float:
+        value = self.get(canonical_id)
+        if value is None:
+            raise KeyError(canonical_id)
+        return value
+
+    def __setitem__(self, canonical_id: str, value: float) -> None:
+        with self._lock:
+            code = self._slot(canonical_id)
+            self._values[code] = float(value)
+            self._present[code] = True
+
+    def __delitem__(self, canonical_id: str) -> None:
+        if self.get(canonical_id) is None:
+            raise KeyError(canonical_id)
+        with self._lock:
+            code = self.index.codes[canonical_id]
+            self._values[code] = 0.0
+            self._present[code] = False
+
+    def __iter__(self) -> Iterator[str]:
+        ids = self.index.ids
+        return iter([ids[code] for code in np.flatnonzero(self._present)])
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._present))
+
+    def to_dict(self) -> Dict[str, float]:
+        ids = self.index.ids
+        return {ids[code]: float(self._values[code]) for code in np.flatnonzero(self._present)}
+
+
+class AssignmentCounts(MutableMapping):
+    """
+    Assignment counts per modality, canonical worker ID and skill (int32 array).
+
+    ``counts[modality]`` is a mapping of canonical IDs to ``{skill: n, ..., 'total': n}``.
+    """
+
+    def __init__(self, index: WorkerIndex, modalities: Sequence[str], skills: Sequence[str],
+                 data: Optional[Mapping[str, Mapping[str, Mapping[str, int]]]] = None) -> None:
+        self.index = index
+        self.modalities = list(modalities)
+        self.columns = list(skills) + ['total']
+        self._modality_pos = {mod: pos for pos, mod in enumerate(self.modalities)}
+        self._column_pos = {column: pos for pos, column in enumerate(self.columns)}
+        self._counts = np.zeros((0, len(self.modalities), len(self.columns)), dtype=np.int32)
+        self._present = np.zeros((0, len(self.modalities)), dtype=bool)
+        self._lock = threading.Lock()  # Growth and writes; modalities are updated in parallel
+        for modality, workers in (data or {}).items():
+            if modality in self._modality_pos:
+                self[modality] = workers
+
+    def _slot(self, canonical_id: str) -> int:
+        # Caller holds self._lock
+        code = self.index.code(canonical_id)
+        if code >= len(self._counts):
+            self._counts = _grown(self._counts, code + 1)
+            self._present = _grown(self._present, code + 1)
+        return code
+
+    def add(self, modality: str, canonical_id: str, skill: Optional[str], amount: int = 1) -> None:
+        """Count one assignment for ``skill`` (if it is a known skill) and for the total."""
+        m = self._modality_pos[modality]
+        with self._lock:
+            code = self._slot(canonical_id)
+            column = self._column_pos.get(skill)
+            if column is not None and skill != 'total':
+                self._counts[code, m, column] += amount
+            self._counts[code, m, -1] += amount
+            self._present[code, m] = True
+
+    def worker_totals(self, canonical_id: str) -> Dict[str, int]:
+        """Counts of one worker summed over all modalities (zeros if never counted)."""
+        code = self.index.codes.get(canonical_id)
+        counts = self._counts
+        if code is None or code >= len(counts):
+            return {column: 0 for column in self.columns}
+        summed = counts[code].sum(axis=0)
+        return {column: int(summed[pos]) for pos, column in enumerate(self.columns)}
+
+    def _row(self, code: int, m: int) -> Optional[np.ndarray]:
+        if code >= len(self._present) or not self._present[code, m]:
+            return None
+        return self._counts[code, m]
+
+    def _set_row(self, m: int, canonical_id: str, values: Mapping[str, int]) -> None:
+        with self._lock:
+            code = self._slot(canonical_id)
+            row = np.zeros(len(self.columns), dtype=np.int32)
+            for column, value in values.items():
+                pos = self._column_pos.get(column)
+                if pos is not None:
+                    row[pos] = int(value)
+            self._counts[code, m] = row
+            self._present[code, m] = True
+
+    def _clear_modality(self, m: int) -> None:
+        with self._lock:
+            self._counts[:, m] = 0
+            self._present[:, m] = False
+
+    def __getitem__(self, modality: str) -> '_ModalityAssignments':
+        if modality not in self._modality_pos:
+            raise KeyError(modality)
+        return _ModalityAssignments(self, self._modality_pos[modality])
+
+    def __setitem__(self, modality: str, workers: Mapping[str, Mapping[str, int]]) -> None:
+        m = self._modality_pos[modality]
+        self._clear_modality(m)
+        for canonical_id, values in workers.items():
+            self._set_row(m, canonical_id, values)
+
+    def __delitem__(self, modality: str) -> None:
+        raise TypeError("Modalities are fixed; assign {} to clear one")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.modalities)
+
+    def __len__(self) -> int:
+        return len(self.modalities)
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        return {modality: self[modality].to_dict() for modality in self.modalities}
+
+
+class _ModalityAssignments(MutableMapping):
+    """``{canonical_id: {skill: n, 'total': n}}`` view of one modality."""
+
+    def __init__(self, counts: AssignmentCounts, m: int) -> None:
+        self._parent = counts
+        self._m = m
+
+    def __getitem__(self, canonical_id: str) -> '_WorkerAssignments':
+        code = self._parent.index.codes.get(canonical_id)
+        if code is None or self._parent._row(code, self._m) is None:
+            raise KeyError(canonical_id)
+        return _WorkerAssignments(self._parent, code, self._m)
+
+    def __setitem__(self, canonical_id: str, values: Mapping[str, int]) -> None:
+        self._parent._set_row(self._m, canonical_id, values)
+
+    def __delitem__(self, canonical_id: str) -> None:
+        code = self._parent.index.codes.get(canonical_id)
+        if code is None or self._parent._row(code, self._m) is None:
+            raise KeyError(canonical_id)
+        with self._parent._lock:
+            self._parent._counts[code, self._m] = 0
+            self._parent._present[code, self._m] = False
+
+    def __iter__(self) -> Iterator[str]:
+        ids = self._parent.index.ids
+        return iter([ids[code] for code in np.flatnonzero(self._parent._present[:, self._m])])
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._parent._present[:, self._m]))
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {canonical_id: dict(self[canonical_id]) for canonical_id in self}
+
+
+class _WorkerAssignments(MutableMapping):
+    """``{skill: n, 'total': n}`` view of one worker in one modality."""
+
+    def __init__(self, counts: AssignmentCounts, code: int, m: int) -> None:
+        self._parent = counts
+        self._code = code
+        self._m = m
+
+    def __getitem__(self, column: str) -> int:
+        pos = self._parent._column_pos.get(column)
+        if pos is None:
+            raise KeyError(column)
+        return int(self._parent._counts[self._code, self._m, pos])
+
+    def __setitem__(self, column: str, value: int) -> None:
+        pos = self._parent._column_pos.get(column)
+        if pos is None:
+            raise KeyError(column)
+        with self._parent._lock:
+            self._parent._counts[self._code, self._m, pos] = int(value)
+
+    def __delitem__(self, column: str) -> None:
+        self[column] = 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parent.columns)
+
+    def __len__(self) -> int:
+        return len(self._parent.columns)
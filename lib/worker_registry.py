@@ -0,0 +1,155 @@
+"""
+Bounded registry of worker name variants and their canonical IDs.
+
+Schedules name workers like ``"Dr. Anna Müller (AM)"``; the abbreviation in
+parentheses is the canonical ID shared by every variant of that name
+(``parse_canonical_id``). The registry caches that mapping in both
+directions (variant -> canonical ID, canonical ID -> variants) and records
+the epoch (one per daily reset) in which each variant was last looked up.
+``compact()`` evicts variants that have not been seen for a number of epochs
+and enforces a hard size limit, so the cache stays bounded by the staff on
+recent schedules instead of every string ever seen.
+
+Lookups of known variants are lock-free; inserts and compaction take the
+registry lock.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+
+def parse_canonical_id(worker_name: str) -> str:
+    """``"Name (ABK)"`` -> ``"ABK"``; names without an abbreviation are their own ID."""
+    canonical_id = worker_name
+    parts = worker_name.split('(')
+    if len(parts) > 1 and ')' in parts[1]:
+        abbreviation = parts[1].split(')')[0].strip()
+        if abbreviation:
+            canonical_id = abbreviation
+    return canonical_id or worker_name
+
+
+class WorkerNameRegistry:
+    """Name variant <-> canonical worker ID, with per-variant last-seen epochs."""
+
+    def __init__(self, max_variants: int = 5000) -> None:
+        self.max_variants = max_variants
+        self.epoch = 0
+        self._canonical: Dict[str, str] = {}              # variant -> canonical ID
+        self._variants: Dict[str, Dict[str, None]] = {}   # canonical ID -> variants (ordered set)
+        self._last_seen: Dict[str, int] = {}              # variant -> epoch of the last lookup
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def canonical_id(self, worker_name: Any) -> str:
+        """Canonical ID of ``worker_name``, registering the variant on first use."""
+        key = '' if worker_name is None else str(worker_name).strip()
+        canonical_id = self._canonical.get(key)
+        if canonical_id is None:
+            return self.register(key, parse_canonical_id(key))
+        self._last_seen[key] = self.epoch
+        return canonical_id
+
+    def register(self, worker_name: str, canonical_id: str) -> str:
+        """Record ``worker_name`` as a variant of ``canonical_id`` unless it is already known."""
+        with self._lock:
+            known = self._canonical.get(worker_name)
+            if known is not None:
+                canonical_id = known
+            else:
+                self._canonical[worker_name] = canonical_id
+                self._variants.setdefault(canonical_id, {})[worker_name] = None
+            self._last_seen[worker_name] = self.epoch
+            return canonical_id
+
+    def variants(self, canonical_id: str) -> List[str]:
+        return list(self._variants.get(canonical_id, ()))
+
+    def by_canonical_id(self) -> Dict[str, List[str]]:
+        """{canonical ID: [variants]} for every registered worker."""
+        with self._lock:
+            return {canonical_id: list(names) for canonical_id, names in self._variants.items()}
+
+    def _evict(self, worker_name: str) -> None:
+        # Caller holds self._lock
+        canonical_id = self._canonical.pop(worker_name, None)
+        self._last_seen.pop(worker_name, None)
+        if canonical_id is None:
+            return
+        names = self._variants.get(canonical_id)
+        if names is not None:
+            names.pop(worker_name, None)
+            if not names:
+                del self._variants[canonical_id]
+
+    def compact(self, keep: Iterable[str] = (), max_idle_epochs: int = 30) -> int:
+        """
+        Start a new epoch and evict variants not looked up in the last
+        ``max_idle_epochs`` epochs, then the least recently seen ones beyond
+        ``max_variants``. Names in ``keep`` (current schedules) always stay.
+        Returns the number of evicted variants.
+        """
+        keep = {str(name).strip() for name in keep}
+        with self._lock:
+            self.epoch += 1
+            oldest_kept = self.epoch - max_idle_epochs
+            # Lookups racing an eviction may leave a last-seen entry without a variant
+            for name in list(self._last_seen):
+                if name not in self._canonical:
+                    self._last_seen.pop(name, None)
+
+            evicted = 0
+            for name in list(self._canonical):
+                if name not in keep and self._last_seen.get(name, -1) < oldest_kept:
+                    self._evict(name)
+                    evicted += 1
+
+            overflow = len(self._canonical) - self.max_variants
+            if overflow > 0:
+                candidates = sorted(
+                    (name for name in self._canonical if name not in keep),
+                    key=lambda name: self._last_seen.get(name, -1),
+                )
+                for name in candidates[:overflow]:
+                    self._evict(name)
+                    evicted += 1
+            return evicted
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'variants': {
+                    name: [canonical_id, self._last_seen.get(name, self.epoch)]
+                    for name, canonical_id in self._canonical.items()
+                },
+            }
+
+    def load(self, data: Optional[Mapping[str, Any]]) -> None:
+        """
+        Merge a ``to_dict()`` payload into the registry; known variants win.
+        Also accepts the legacy flat ``{variant: canonical ID}`` map.
+        """
+        if not data:
+            return
+        if isinstance(data.get('variants'), Mapping):
+            entries = data['variants']
+            epoch = int(data.get('epoch', 0) or 0)
+        else:
+            entries, epoch = data, 0
+        with self._lock:
+            self.epoch = max(self.epoch, epoch)
+            for name, entry in entries.items():
+                name = str(name).strip()
+                if name in self._canonical:
+                    continue
+                if isinstance(entry, (list, tuple)) and entry:
+                    canonical_id = str(entry[0])
+                    last_seen = int(entry[1]) if len(entry) > 1 else self.epoch
+                else:
+                    canonical_id, last_seen = str(entry), self.epoch
+                self._canonical[name] = canonical_id
+                self._variants.setdefault(canonical_id, {})[name] = None
+                self._last_seen[name] = last_seen
@@ -1,17 +1,21 @@
 # Standard library imports
+import io
 import os
 import json
 import shutil
 from datetime import datetime
 from functools import wraps
+from typing import Optional
 
 # Flask imports
 from flask import (
     Blueprint,
+    current_app,
     jsonify,
     redirect,
     render_template,
     request,
+    send_file,
     session,
     url_for,
 )
@@ -32,6 +36,7 @@ from config import (
     selection_logger,
     SKILL_ROSTER_AUTO_IMPORT,
     normalize_modality,
+    normalize_role,
     normalize_skill
 )
 from lib import usage_logger
@@ -40,26 +45,37 @@ from lib.utils import (
     get_next_workday,
     parse_time_range,
     TIME_FORMAT,
-    normalize_skill_value,
     skill_value_to_numeric,
-    calculate_shift_duration_hours
+    get_schedule_skill_value,
+    calculate_shift_duration_hours,
+    expand_schedule_df,
+    coerce_int
 )
 from data_manager import (
     modality_data,
     staged_modality_data,
     global_worker_data,
-    lock,
+    new_weighted_counts,
+    state_transaction,
+    publish_schedule_changes,
     save_state,
     get_canonical_worker_id,
     load_worker_skill_json,
     build_working_hours_from_medweb,
+    load_medweb_csv,
     auto_populate_skill_roster,
     load_staged_dataframe,
     backup_dataframe,
+    request_schedule_backup,
+    schedule_backup_status,
+    write_schedule_excel,
     _update_schedule_row,
     _add_worker_to_schedule,
     _delete_worker_from_schedule,
     _add_gap_to_schedule,
+    mark_schedule_changed,
+    schedule_changes_since,
+    schedule_version_epoch,
     preload_next_workday,
     _calculate_total_work_hours
 )
@@ -77,12 +93,12 @@ routes = Blueprint('routes', __name__)
 # -----------------------------------------------------------
 # Helpers for Routes
 # -----------------------------------------------------------
-def _df_to_api_response(df: pd.DataFrame) -> list:
+def _df_to_api_response(df: pd.DataFrame, row_indices: Optional[list] = None) -> list:
     if df is None or df.empty:
         return []
 
     data = []
-    for idx in df.index:
+    for idx in (df.index if row_indices is None else row_indices):
         row = df.loc[idx]
         worker_data = {
             'row_index': int(idx),
@@ -96,8 +112,7 @@ def _df_to_api_response(df: pd.DataFrame) -> list:
             worker_data['gaps'] = row.get('gaps', None)
 
         for skill in SKILL_COLUMNS:
-            value = row.get(skill, 0)
-            worker_data[skill] = normalize_skill_value(value) if pd.notnull(value) else 0
+            worker_data[skill] = get_schedule_skill_value(row, skill, SKILL_COLUMNS)
 
         tasks_val = row.get('tasks', '')
         if isinstance(tasks_val, list):
@@ -400,7 +415,9 @@ def edit_info():
         info_texts = [line.strip() for line in info_text.split('\n') if line.strip()]
 
         # Update the modality data
-        modality_data[modality]['info_texts'] = info_texts
+        with state_transaction(modality):
+            modality_data[modality]['info_texts'] = info_texts
+            mark_schedule_changed(modality)
 
         # Save the updated state and backup
         save_state()
@@ -463,6 +480,8 @@ def auto_preload_job():
         selection_logger.info(f"Starting auto-preload from {MASTER_CSV_PATH}")
 
         result = preload_next_workday(MASTER_CSV_PATH, APP_CONFIG)
+        # Runs outside a request, so publish staged schedules explicitly
+        publish_schedule_changes()
 
         if result['success']:
             selection_logger.info(
@@ -510,6 +529,7 @@ def preload_from_master():
                                 df['counts_for_hours'] = True
 
                             staged_modality_data[modality]['working_hours_df'] = df
+                            mark_schedule_changed(modality, use_staged=True)
                             staged_modality_data[modality]['info_texts'] = []
                             staged_modality_data[modality]['total_work_hours'] = _calculate_total_work_hours(df)
                             staged_modality_data[modality]['last_modified'] = get_local_berlin_now()
@@ -564,7 +584,7 @@ def upload_file():
         modality_stats[worker]['total'] = sum_counts.get(worker, 0)
 
     debug_info = (
-        d['working_hours_df'].to_html(index=True)
+        expand_schedule_df(d['working_hours_df'], SKILL_COLUMNS).to_html(index=True)
         if d['working_hours_df'] is not None else "Keine Daten verfügbar"
     )
 
@@ -676,28 +696,16 @@ def load_today_from_master():
     try:
         target_date = get_local_berlin_now()
 
-        # Debug: Check CSV content before parsing
+        # Read today's rows once (cached); build_working_hours_from_medweb reuses them
+        vendor_mapping = APP_CONFIG.get('medweb_mapping', {})
+        cols = vendor_mapping.get('columns', {
+            'date': 'Datum',
+            'activity': 'Beschreibung der Aktivität'
+        })
+        date_col = cols.get('date', 'Datum')
+        activity_col = cols.get('activity', 'Beschreibung der Aktivität')
         try:
-            vendor_mapping = APP_CONFIG.get('medweb_mapping', {})
-            cols = vendor_mapping.get('columns', {
-                'date': 'Datum',
-                'activity': 'Beschreibung der Aktivität'
-            })
-            date_col = cols.get('date', 'Datum')
-            activity_col = cols.get('activity', 'Beschreibung der Aktivität')
-
-            try:
-                debug_df = pd.read_csv(MASTER_CSV_PATH, sep=',', encoding='utf-8')
-            except UnicodeDecodeError:
-                debug_df = pd.read_csv(MASTER_CSV_PATH, sep=',', encoding='latin1')
-            if date_col not in debug_df.columns:
-                try:
-                    debug_df = pd.read_csv(MASTER_CSV_PATH, sep=';', encoding='utf-8')
-                except UnicodeDecodeError:
-                    debug_df = pd.read_csv(MASTER_CSV_PATH, sep=';', encoding='latin1')
-
-            available_dates = debug_df[date_col].unique().tolist() if date_col in debug_df.columns else []
-            available_activities = debug_df[activity_col].unique().tolist() if activity_col in debug_df.columns else []
+            parsed_csv = load_medweb_csv(MASTER_CSV_PATH, date_col, [target_date.date()])
         except Exception as e:
             return jsonify({"error": f"CSV-Lesefehler: {str(e)}"}), 400
 
@@ -708,6 +716,16 @@ def load_today_from_master():
         )
 
         if not modality_dfs:
+            # Diagnostics only: needs every day's activities
+            parsed_csv = load_medweb_csv(MASTER_CSV_PATH, date_col)
+            available_dates = [d.strftime('%d.%m.%Y') for d in parsed_csv['dates']]
+            available_activities = []
+            if activity_col in parsed_csv['columns']:
+                available_activities = list(dict.fromkeys(
+                    activity
+                    for day_rows in parsed_csv['rows_by_date'].values()
+                    for activity in day_rows[activity_col].tolist()
+                ))
             mapping_rules = APP_CONFIG.get('medweb_mapping', {}).get('rules', [])
             rule_matches = [r.get('match', '') for r in mapping_rules[:10]]
             matched_activities = []
@@ -728,20 +746,19 @@ def load_today_from_master():
                 }
             }), 400
 
-        with lock:
-            global_worker_data['weighted_counts'] = {}
+        with state_transaction():
+            global_worker_data['weighted_counts'] = new_weighted_counts()
 
             for modality, df in modality_dfs.items():
                 d = modality_data[modality]
                 d['draw_counts'] = {}
                 d['skill_counts'] = {skill: {} for skill in SKILL_COLUMNS}
-                d['WeightedCounts'] = {}
                 global_worker_data['assignments_per_mod'][modality] = {}
                 d['working_hours_df'] = df
+                mark_schedule_changed(modality)
 
                 for worker in df['PPL'].unique():
                     d['draw_counts'][worker] = 0
-                    d['WeightedCounts'][worker] = 0.0
                     for skill in SKILL_COLUMNS:
                         if skill not in d['skill_counts']:
                             d['skill_counts'][skill] = {}
@@ -750,7 +767,7 @@ def load_today_from_master():
                 d['info_texts'] = []
                 d['last_uploaded_filename'] = f"master_{target_date.strftime('%Y%m%d')}.csv"
 
-            save_state()
+            save_state(wait=True)
 
         workers_added = 0
         if SKILL_ROSTER_AUTO_IMPORT:
@@ -846,19 +863,22 @@ def prep_next_day():
         ui_colors=APP_CONFIG.get('ui_colors', {})
     )
 
+def _ensure_staged_loaded(modality: str) -> None:
+    if staged_modality_data[modality]['working_hours_df'] is None:
+        if not load_staged_dataframe(modality):
+            if modality_data[modality]['working_hours_df'] is not None:
+                staged_modality_data[modality]['working_hours_df'] = modality_data[modality]['working_hours_df'].copy()
+                staged_modality_data[modality]['info_texts'] = modality_data[modality]['info_texts'].copy()
+                mark_schedule_changed(modality, use_staged=True)
+                request_schedule_backup(modality, use_staged=True)
+
 @routes.route('/api/prep-next-day/data', methods=['GET'])
 @admin_required
 def get_prep_data():
     result = {}
 
     for modality in allowed_modalities:
-        if staged_modality_data[modality]['working_hours_df'] is None:
-            if not load_staged_dataframe(modality):
-                if modality_data[modality]['working_hours_df'] is not None:
-                    staged_modality_data[modality]['working_hours_df'] = modality_data[modality]['working_hours_df'].copy()
-                    staged_modality_data[modality]['info_texts'] = modality_data[modality]['info_texts'].copy()
-                    backup_dataframe(modality, use_staged=True)
-
+        _ensure_staged_loaded(modality)
         df = staged_modality_data[modality].get('working_hours_df')
         result[modality] = _df_to_api_response(df)
 
@@ -867,6 +887,79 @@ def get_prep_data():
         'last_prepped_at': staged_modality_data[allowed_modalities[0]].get('last_prepped_at')
     })
 
+# Tokens start with the state backend's epoch: per process for the local
+# backend, per database for a shared one (so every worker accepts them). A token
+# from another epoch falls back to a full reload.
+def _schedule_version_token(versions: list) -> str:
+    return '.'.join([schedule_version_epoch()] + [str(v) for v in versions])
+
+def _parse_schedule_version_token(token: Optional[str]) -> list:
+    """Per-modality versions from a token of the current epoch, else all None (full reload)."""
+    parts = (token or '').split('.')
+    if len(parts) != len(allowed_modalities) + 1 or parts[0] != schedule_version_epoch():
+        return [None] * len(allowed_modalities)
+    try:
+        return [int(p) for p in parts[1:]]
+    except ValueError:
+        return [None] * len(allowed_modalities)
+
+def _schedule_changes_response(use_staged: bool):
+    """
+    Rows changed since the ``since`` token for every modality.
+
+    Clients keep one row list per modality (position = row_index), replace the
+    returned rows, truncate to ``row_count`` and start from an empty list when
+    ``full`` is set. The token is also the ETag.
+    """
+    source = staged_modality_data if use_staged else modality_data
+    if use_staged:
+        for modality in allowed_modalities:
+            _ensure_staged_loaded(modality)
+
+    since_versions = _parse_schedule_version_token(request.args.get('since'))
+    versions = []
+    changes = {}
+    for modality, since_version in zip(allowed_modalities, since_versions):
+        version, rows = schedule_changes_since(modality, use_staged, since_version)
+        versions.append(version)
+        changes[modality] = rows
+
+    token = _schedule_version_token(versions)
+    if request.if_none_match.contains(token):
+        response = current_app.response_class(status=304)
+        response.set_etag(token)
+        return response
+
+    result = {}
+    for modality, rows in changes.items():
+        df = source[modality].get('working_hours_df')
+        row_count = 0 if df is None else len(df)
+        # Deltas address rows by position, which needs a plain 0..n-1 index
+        if df is not None and not df.index.equals(pd.RangeIndex(row_count)):
+            rows = None
+        result[modality] = {
+            'full': rows is None,
+            'row_count': row_count,
+            'rows': _df_to_api_response(df, rows),
+        }
+
+    payload = {'version': token, 'modalities': result}
+    if use_staged:
+        payload['last_prepped_at'] = staged_modality_data[allowed_modalities[0]].get('last_prepped_at')
+    response = jsonify(payload)
+    response.set_etag(token)
+    return response
+
+@routes.route('/api/live-schedule/changes', methods=['GET'])
+@admin_required
+def get_live_changes():
+    return _schedule_changes_response(use_staged=False)
+
+@routes.route('/api/prep-next-day/changes', methods=['GET'])
+@admin_required
+def get_prep_changes():
+    return _schedule_changes_response(use_staged=True)
+
 @routes.route('/api/prep-next-day/update-row', methods=['POST'])
 @admin_required
 def update_prep_row():
@@ -878,7 +971,8 @@ def update_prep_row():
     if modality not in staged_modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, error = _update_schedule_row(modality, row_index, updates, use_staged=True)
+    with state_transaction(modality):
+        success, error = _update_schedule_row(modality, row_index, updates, use_staged=True)
 
     if success:
         return jsonify({'success': True})
@@ -894,7 +988,8 @@ def add_prep_worker():
     if modality not in staged_modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, row_index, error = _add_worker_to_schedule(modality, worker_data, use_staged=True)
+    with state_transaction(modality):
+        success, row_index, error = _add_worker_to_schedule(modality, worker_data, use_staged=True)
 
     if success:
         return jsonify({'success': True, 'row_index': row_index})
@@ -911,7 +1006,8 @@ def delete_prep_worker():
     if modality not in staged_modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, worker_name, error = _delete_worker_from_schedule(modality, row_index, use_staged=True, verify_ppl=verify_ppl)
+    with state_transaction(modality):
+        success, worker_name, error = _delete_worker_from_schedule(modality, row_index, use_staged=True, verify_ppl=verify_ppl)
 
     if success:
         return jsonify({'success': True})
@@ -937,7 +1033,8 @@ def update_live_row():
     if modality not in modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, error = _update_schedule_row(modality, row_index, updates, use_staged=False)
+    with state_transaction(modality):
+        success, error = _update_schedule_row(modality, row_index, updates, use_staged=False)
 
     if success:
         selection_logger.info(f"Live schedule updated for {modality}, row {row_index} (no counter reset)")
@@ -955,20 +1052,19 @@ def add_live_worker():
         return jsonify({'error': 'Invalid modality'}), 400
 
     ppl_name = worker_data.get('PPL', 'Neuer Worker (NW)')
-    success, row_index, error = _add_worker_to_schedule(modality, worker_data, use_staged=False)
+    with state_transaction(modality):
+        success, row_index, error = _add_worker_to_schedule(modality, worker_data, use_staged=False)
+        if success:
+            d = modality_data[modality]
+            if ppl_name not in d['draw_counts']:
+                d['draw_counts'][ppl_name] = 0
+            for skill in SKILL_COLUMNS:
+                if skill not in d['skill_counts']:
+                    d['skill_counts'][skill] = {}
+                if ppl_name not in d['skill_counts'][skill]:
+                    d['skill_counts'][skill][ppl_name] = 0
 
     if success:
-        d = modality_data[modality]
-        if ppl_name not in d['draw_counts']:
-            d['draw_counts'][ppl_name] = 0
-        if ppl_name not in d['WeightedCounts']:
-            d['WeightedCounts'][ppl_name] = 0.0
-        for skill in SKILL_COLUMNS:
-            if skill not in d['skill_counts']:
-                d['skill_counts'][skill] = {}
-            if ppl_name not in d['skill_counts'][skill]:
-                d['skill_counts'][skill][ppl_name] = 0
-
         selection_logger.info(f"Worker {ppl_name} added to LIVE {modality} schedule (no counter reset)")
         return jsonify({'success': True, 'row_index': row_index})
 
@@ -985,7 +1081,8 @@ def delete_live_worker():
     if modality not in modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, worker_name, error = _delete_worker_from_schedule(modality, row_index, use_staged=False, verify_ppl=verify_ppl)
+    with state_transaction(modality):
+        success, worker_name, error = _delete_worker_from_schedule(modality, row_index, use_staged=False, verify_ppl=verify_ppl)
 
     if success:
         selection_logger.info(f"Worker {worker_name} deleted from LIVE {modality} schedule (no counter reset)")
@@ -1006,7 +1103,8 @@ def add_live_gap():
     if modality not in modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, action, error = _add_gap_to_schedule(modality, row_index, gap_type, gap_start, gap_end, use_staged=False)
+    with state_transaction(modality):
+        success, action, error = _add_gap_to_schedule(modality, row_index, gap_type, gap_start, gap_end, use_staged=False)
 
     if success:
         return jsonify({'success': True, 'action': action})
@@ -1025,12 +1123,108 @@ def add_staged_gap():
     if modality not in staged_modality_data:
         return jsonify({'error': 'Invalid modality'}), 400
 
-    success, action, error = _add_gap_to_schedule(modality, row_index, gap_type, gap_start, gap_end, use_staged=True)
+    with state_transaction(modality):
+        success, action, error = _add_gap_to_schedule(modality, row_index, gap_type, gap_start, gap_end, use_staged=True)
 
     if success:
         return jsonify({'success': True, 'action': action})
     return jsonify({'error': error}), 400
 
+def _schedule_excel_response(modality: Optional[str], use_staged: bool):
+    if modality not in modality_data:
+        return jsonify({'error': 'Invalid modality'}), 400
+
+    buffer = io.BytesIO()
+    if not write_schedule_excel(modality, buffer, use_staged=use_staged):
+        return jsonify({'error': 'Kein Zeitplan vorhanden'}), 404
+    buffer.seek(0)
+
+    suffix = "_staged" if use_staged else "_live"
+    return send_file(
+        buffer,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f"Cortex_{modality.upper()}{suffix}.xlsx",
+    )
+
+@routes.route('/api/live-schedule/export', methods=['GET'])
+@admin_required
+def export_live_schedule():
+    return _schedule_excel_response(request.args.get('modality'), use_staged=False)
+
+@routes.route('/api/prep-next-day/export', methods=['GET'])
+@admin_required
+def export_staged_schedule():
+    return _schedule_excel_response(request.args.get('modality'), use_staged=True)
+
+@routes.route('/api/live-schedule/save-status', methods=['GET'])
+@admin_required
+def live_save_status():
+    return jsonify(schedule_backup_status(use_staged=False))
+
+@routes.route('/api/prep-next-day/save-status', methods=['GET'])
+@admin_required
+def staged_save_status():
+    return jsonify(schedule_backup_status(use_staged=True))
+
+def _select_and_record(now: datetime, modality: str, role: str, allow_fallback: bool) -> Optional[dict]:
+    """
+    Select a worker and update all fairness counters.
+
+    Caller holds state_transaction() for ``modality``. Returns the assignment
+    payload, or None if no worker is available.
+    """
+    result = get_next_available_worker(
+        now,
+        role=role,
+        modality=modality,
+        allow_fallback=allow_fallback,
+    )
+    if result is None:
+        return None
+
+    candidate, used_column, source_modality = result
+    actual_modality = source_modality or modality
+    d = modality_data[actual_modality]
+
+    candidate = candidate.to_dict() if hasattr(candidate, "to_dict") else dict(candidate)
+    if "PPL" not in candidate:
+        raise ValueError("Candidate row is missing the 'PPL' field")
+    person = candidate['PPL']
+
+    actual_skill = candidate.get('__skill_source')
+    if not actual_skill and isinstance(used_column, str):
+        actual_skill = used_column
+    if not actual_skill:
+        actual_skill = role
+
+    selection_logger.info(
+        "Selected worker: %s using column %s (modality %s)",
+        person,
+        actual_skill,
+        actual_modality,
+    )
+
+    d['draw_counts'][person] = d['draw_counts'].get(person, 0) + 1
+    if actual_skill in SKILL_COLUMNS:
+        if actual_skill not in d['skill_counts']:
+            d['skill_counts'][actual_skill] = {}
+        if person not in d['skill_counts'][actual_skill]:
+            d['skill_counts'][actual_skill][person] = 0
+        d['skill_counts'][actual_skill][person] += 1
+
+    # Check if this is a weighted ('w') assignment - only 'w' uses modifier
+    is_weighted = candidate.get('__is_weighted', False)
+    canonical_id = update_global_assignment(person, actual_skill, actual_modality, is_weighted)
+
+    return {
+        "selected_person": person,
+        "canonical_id": canonical_id,
+        "source_modality": actual_modality,
+        "skill_used": actual_skill,
+        "is_weighted": is_weighted
+    }
+
 def _assign_worker(modality: str, role: str, allow_fallback: bool = True):
     try:
         now = get_local_berlin_now()
@@ -1042,64 +1236,22 @@ def _assign_worker(modality: str, role: str, allow_fallback: bool = True):
             now.strftime('%H:%M:%S'),
         )
 
-        with lock:
-            result = get_next_available_worker(
-                now,
-                role=role,
-                modality=modality,
-                allow_fallback=allow_fallback,
-            )
-            if result is not None:
-                candidate, used_column, source_modality = result
-                actual_modality = source_modality or modality
-                d = modality_data[actual_modality]
-
-                candidate = candidate.to_dict() if hasattr(candidate, "to_dict") else dict(candidate)
-                if "PPL" not in candidate:
-                    raise ValueError("Candidate row is missing the 'PPL' field")
-                person = candidate['PPL']
-
-                actual_skill = candidate.get('__skill_source')
-                if not actual_skill and isinstance(used_column, str):
-                    actual_skill = used_column
-                if not actual_skill:
-                    actual_skill = role
-
-                selection_logger.info(
-                    "Selected worker: %s using column %s (modality %s)",
-                    person,
-                    actual_skill,
-                    actual_modality,
-                )
-
-                d['draw_counts'][person] = d['draw_counts'].get(person, 0) + 1
-                if actual_skill in SKILL_COLUMNS:
-                    if actual_skill not in d['skill_counts']:
-                        d['skill_counts'][actual_skill] = {}
-                    if person not in d['skill_counts'][actual_skill]:
-                        d['skill_counts'][actual_skill][person] = 0
-                    d['skill_counts'][actual_skill][person] += 1
-
-                # Check if this is a weighted ('w') assignment - only 'w' uses modifier
-                is_weighted = candidate.get('__is_weighted', False)
-                canonical_id = update_global_assignment(person, actual_skill, actual_modality, is_weighted)
-
-                # Record skill-modality usage for analytics
-                usage_logger.record_skill_modality_usage(actual_skill, actual_modality)
-
-                # Check if it's time for scheduled export (7:30 AM)
-                usage_logger.check_and_export_at_scheduled_time()
-
-                return jsonify({
-                    "selected_person": person,
-                    "canonical_id": canonical_id,
-                    "source_modality": actual_modality,
-                    "skill_used": actual_skill,
-                    "is_weighted": is_weighted
-                })
-            else:
-                selection_logger.warning("No available worker found")
-                return jsonify({"error": "No available worker found"}), 404
+        # Select and count atomically; only this modality is locked, so requests
+        # for other modalities proceed in parallel (see lock order in data_manager)
+        with state_transaction(modality):
+            assignment = _select_and_record(now, modality, role, allow_fallback)
+
+        if assignment is None:
+            selection_logger.warning("No available worker found")
+            return jsonify({"error": "No available worker found"}), 404
+
+        # Record skill-modality usage for analytics
+        usage_logger.record_skill_modality_usage(assignment['skill_used'], assignment['source_modality'])
+
+        # Check if it's time for scheduled export (7:30 AM)
+        usage_logger.check_and_export_at_scheduled_time()
+
+        return jsonify(assignment)
 
     except Exception as e:
         selection_logger.error(f"Error selecting worker: {str(e)}", exc_info=True)
@@ -1111,6 +1263,8 @@ def assign_worker_api(modality, role):
     modality = modality.lower()
     if modality not in modality_data:
         return jsonify({"error": "Invalid modality"}), 400
+    if normalize_role(role) is None:
+        return jsonify({"error": "Invalid role"}), 400
     return _assign_worker(modality, role)
 
 @routes.route('/api/<modality>/<role>/strict', methods=['GET'])
@@ -1119,8 +1273,86 @@ def assign_worker_strict_api(modality, role):
     modality = modality.lower()
     if modality not in modality_data:
         return jsonify({"error": "Invalid modality"}), 400
+    if normalize_role(role) is None:
+        return jsonify({"error": "Invalid role"}), 400
     return _assign_worker(modality, role, allow_fallback=False)
 
+@routes.route('/api/assign-batch', methods=['POST'])
+@access_required
+def assign_worker_batch_api():
+    """
+    Assign workers for several cases in one call.
+
+    Body: {"requests": [{"modality": "ct", "role": "notfall", "strict": false}, ...]}
+    All selections run in one locked pass, in request order, with the same
+    fairness rules as /api/<modality>/<role>; each assignment sees the counters
+    updated by the previous ones. Roles are normalized like the single
+    endpoints (unknown roles fall back to 'normal').
+
+    Every modality and role is validated before anything is assigned. A case
+    whose ``strict`` is not a JSON boolean, that finds no worker or that fails
+    during selection gets an ``error`` entry; the other cases, before and after
+    it, are still assigned and counted.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty 'requests' list"}), 400
+    max_batch = coerce_int(BALANCER_SETTINGS.get('max_batch_assignments', 100), 100)
+    if len(items) > max_batch:
+        return jsonify({"error": f"At most {max_batch} requests per batch"}), 400
+
+    parsed = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({"error": f"Request {position} must be an object"}), 400
+        modality = str(item.get('modality', '')).lower()
+        role = str(item.get('role', '')).strip()
+        if modality not in modality_data:
+            return jsonify({"error": f"Request {position}: invalid modality"}), 400
+        if normalize_role(role) is None:
+            return jsonify({"error": f"Request {position}: invalid role"}), 400
+        strict = item.get('strict', False)
+        # JSON booleans only: bool("false") would silently mean strict
+        allow_fallback = (not strict) if isinstance(strict, bool) else None
+        parsed.append((modality, role, allow_fallback))
+
+    try:
+        now = get_local_berlin_now()
+        selection_logger.info("Batch assignment request: %d cases, time=%s", len(parsed), now.strftime('%H:%M:%S'))
+
+        assignments = []
+        with state_transaction():
+            for position, (modality, role, allow_fallback) in enumerate(parsed):
+                if allow_fallback is None:
+                    assignments.append({"index": position, "modality": modality, "role": role,
+                                        "error": "'strict' must be true or false"})
+                    continue
+                try:
+                    assignment = _select_and_record(now, modality, role, allow_fallback)
+                except Exception as e:
+                    selection_logger.error(f"Error in batch request {position}: {str(e)}", exc_info=True)
+                    assignment = {"error": str(e)}
+                if assignment is None:
+                    selection_logger.warning("No available worker found for batch request %d", position)
+                    assignment = {"error": "No available worker found"}
+                assignments.append({"index": position, "modality": modality, "role": role, **assignment})
+
+        for assignment in assignments:
+            if 'error' not in assignment:
+                usage_logger.record_skill_modality_usage(assignment['skill_used'], assignment['source_modality'])
+        usage_logger.check_and_export_at_scheduled_time()
+
+        return jsonify({
+            "assignments": assignments,
+            "assigned": sum(1 for a in assignments if 'error' not in a),
+            "requested": len(assignments)
+        })
+
+    except Exception as e:
+        selection_logger.error(f"Error in batch assignment: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 # Usage Statistics API Endpoints
 
 @routes.route('/api/usage-stats/current', methods=['GET'])
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""Balancer micro-benchmark and load test.
+
+Synthesizes rosters shaped like the output of build_working_hours_from_medweb()
+for every modality and skill configured in config.yaml, then measures:
+
+- selection latency of get_next_available_worker() (p50/p90/p99)
+- throughput and latency of /api/<modality>/<role> under concurrent
+  Flask test-client load
+- allocations per request (tracemalloc peak and retained bytes)
+
+Everything runs in memory against a fixed clock: fairness state and the
+worker name registry are written to a temporary directory and the local state
+backend is forced, so live data in uploads/ is never touched.
+
+Usage:
+    python scripts/benchmark_balancer.py
+    python scripts/benchmark_balancer.py --workers 50 500 2000 --threads 8 --output bench.json
+
+Notes:
+- ``--workers`` is the size of the worker pool; each worker covers one or two
+  modalities, so every modality gets roughly 0.75 x N schedule rows.
+- Results are written as JSON (one entry per roster size) for regression
+  tracking; compare runs on the same machine only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time as time_module
+import tracemalloc
+from datetime import datetime, time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import app as app_module
+import balancer
+import data_manager
+import routes
+from config import ROLE_MAP, SKILL_COLUMNS, allowed_modalities
+from lib.state_backend import LocalStateBackend
+from lib.utils import WEIGHTED_SKILL_MARKER, selection_logger
+
+DEFAULT_WORKER_COUNTS = [50, 200, 500, 2000]
+BENCH_NOW = datetime(2025, 12, 10, 10, 30)  # Wednesday, mid-morning peak
+
+# (start, end) templates; the last one runs overnight
+SHIFT_TEMPLATES = [
+    (time(7, 0), time(15, 0)),
+    (time(7, 30), time(16, 0)),
+    (time(8, 0), time(16, 30)),
+    (time(7, 0), time(12, 0)),
+    (time(12, 0), time(20, 0)),
+    (time(13, 0), time(21, 0)),
+    (time(21, 0), time(7, 0)),
+]
+SKILL_VALUES = [-1, 0, 0, 0, 1, 1, WEIGHTED_SKILL_MARKER]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max/mean of millisecond samples."""
+    if not samples:
+        return {}
+    values = np.asarray(samples, dtype=float)
+    return {
+        'p50': round(float(np.percentile(values, 50)), 4),
+        'p90': round(float(np.percentile(values, 90)), 4),
+        'p99': round(float(np.percentile(values, 99)), 4),
+        'max': round(float(values.max()), 4),
+        'mean': round(float(values.mean()), 4),
+    }
+
+
+def synthesize_rosters(worker_count: int, rng: random.Random) -> Dict[str, pd.DataFrame]:
+    """Build one schedule DataFrame per modality (medweb builder column layout)."""
+    rows: Dict[str, List[Dict[str, Any]]] = {mod: [] for mod in allowed_modalities}
+    for i in range(worker_count):
+        person = f"Dr. Bench{i} (B{i:04d})"
+        modifier = rng.choice([1.0, 1.0, 1.0, 0.5, 0.75, 1.5])
+        for mod in rng.sample(allowed_modalities, k=min(len(allowed_modalities), rng.choice([1, 1, 2]))):
+            start, end = rng.choice(SHIFT_TEMPLATES)
+            shifts = [(start, end)]
+            if rng.random() < 0.1 and end > start:
+                # Split shift, e.g. around a board/meeting gap
+                middle = time((start.hour + end.hour) // 2, 0)
+                shifts = [(start, middle), (time(middle.hour, 30), end)]
+            for shift_start, shift_end in shifts:
+                duration = (
+                    (shift_end.hour * 60 + shift_end.minute) - (shift_start.hour * 60 + shift_start.minute)
+                ) % 1440 / 60
+                row = {
+                    'PPL': person,
+                    'start_time': shift_start,
+                    'end_time': shift_end,
+                    'shift_duration': duration,
+                    'Modifier': modifier,
+                    'tasks': f"{mod.upper()} Dienst",
+                    'counts_for_hours': rng.random() > 0.1,
+                }
+                for skill in SKILL_COLUMNS:
+                    row[skill] = rng.choice(SKILL_VALUES)
+                rows[mod].append(row)
+    return {mod: pd.DataFrame(mod_rows) for mod, mod_rows in rows.items() if mod_rows}
+
+
+def install_rosters(modality_dfs: Dict[str, pd.DataFrame]) -> None:
+    """Load synthetic schedules as live data and reset all counters."""
+    today = BENCH_NOW.date()
+    data_manager.global_worker_data['weighted_counts'] = data_manager.new_weighted_counts()
+    data_manager.global_worker_data['assignments_per_mod'] = data_manager.new_assignment_counts()
+    data_manager.global_worker_data['last_reset_date'] = today
+    for mod in allowed_modalities:
+        d = data_manager.modality_data[mod]
+        df = modality_dfs.get(mod)
+        d['working_hours_df'] = df
+        d['draw_counts'] = {}
+        d['skill_counts'] = {skill: {} for skill in SKILL_COLUMNS}
+        d['last_reset_date'] = today  # Keep the daily reset from loading real files
+        if df is not None:
+            d['worker_modifiers'] = df.groupby('PPL')['Modifier'].first().to_dict()
+            d['total_work_hours'] = data_manager._calculate_total_work_hours(df)
+            data_manager.mark_schedule_changed(mod)
+
+
+def request_mix() -> List[tuple]:
+    """Every (modality, role) combination, in a fixed interleaved order."""
+    roles = [skill.lower() for skill in SKILL_COLUMNS if skill.lower() in ROLE_MAP] or ['normal']
+    return [(mod, role) for role in roles for mod in allowed_modalities]
+
+
+def record_selection(result, modality: str) -> None:
+    """Apply the counter updates _assign_worker performs after a selection."""
+    candidate, used_column, source_modality = result
+    actual_modality = source_modality or modality
+    candidate = candidate.to_dict() if hasattr(candidate, 'to_dict') else dict(candidate)
+    person = candidate['PPL']
+    d = data_manager.modality_data[actual_modality]
+    d['draw_counts'][person] = d['draw_counts'].get(person, 0) + 1
+    skill_counts = d['skill_counts'].setdefault(used_column, {})
+    skill_counts[person] = skill_counts.get(person, 0) + 1
+    balancer.update_global_assignment(
+        person, used_column, actual_modality, bool(candidate.get('__is_weighted', False))
+    )
+
+
+def bench_selection(selections: int) -> Dict[str, Any]:
+    mix = request_mix()
+    latencies = []
+    assigned = 0
+    for i in range(selections):
+        modality, role = mix[i % len(mix)]
+        started = time_module.perf_counter()
+        with data_manager.state_transaction(modality):
+            result = balancer.get_next_available_worker(BENCH_NOW, role=role, modality=modality)
+            latencies.append((time_module.perf_counter() - started) * 1000)
+            if result is not None:
+                record_selection(result, modality)
+                assigned += 1
+    return {'calls': selections, 'assigned': assigned, 'latency_ms': percentiles(latencies)}
+
+
+def _client():
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    return client
+
+
+def bench_endpoint(threads: int, requests_per_thread: int) -> Dict[str, Any]:
+    mix = request_mix()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    results_lock = threading.Lock()
+    start_barrier = threading.Barrier(threads + 1)
+
+    def run(offset: int) -> None:
+        client = _client()
+        local_latencies = []
+        local_statuses: Dict[int, int] = {}
+        start_barrier.wait()
+        for i in range(requests_per_thread):
+            modality, role = mix[(offset + i * threads) % len(mix)]
+            started = time_module.perf_counter()
+            response = client.get(f'/api/{modality}/{role}')
+            local_latencies.append((time_module.perf_counter() - started) * 1000)
+            local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+        with results_lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    start_barrier.wait()
+    started = time_module.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time_module.perf_counter() - started
+
+    total = threads * requests_per_thread
+    return {
+        'threads': threads,
+        'requests': total,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'latency_ms': percentiles(latencies),
+    }
+
+
+def bench_allocations(samples: int) -> Dict[str, Any]:
+    mix = request_mix()
+    client = _client()
+    client.get(f'/api/{mix[0][0]}/{mix[0][1]}')  # Warm caches before tracing
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for i in range(samples):
+            modality, role = mix[i % len(mix)]
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            client.get(f'/api/{modality}/{role}')
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - current) / 1024)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'requests': samples,
+        'peak_kib_per_request': percentiles(peaks),
+        'retained_bytes_per_request': round((retained - baseline) / samples, 1) if samples else 0,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def isolate_state(state_dir: str) -> None:
+    """Keep the benchmark away from live state files and shared backends."""
+    data_manager.STATE_FILE_PATH = os.path.join(state_dir, 'fairness_state.json')
+    data_manager.STATE_JOURNAL_PATH = os.path.join(state_dir, 'fairness_journal.jsonl')
+    data_manager.WORKER_IDS_PATH = os.path.join(state_dir, 'worker_ids.json')
+    data_manager.state_backend = LocalStateBackend()
+    balancer.state_backend = data_manager.state_backend
+    fixed_now = lambda: BENCH_NOW
+    for module in (routes, data_manager):
+        module.get_local_berlin_now = fixed_now
+    app_module.app.config['TESTING'] = True
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark balancer selection and the assignment API.")
+    parser.add_argument('--workers', type=int, nargs='+', default=DEFAULT_WORKER_COUNTS,
+                        help="Worker pool sizes to benchmark (default: %(default)s)")
+    parser.add_argument('--selections', type=int, default=500,
+                        help="Direct get_next_available_worker calls per roster (default: %(default)s)")
+    parser.add_argument('--threads', type=int, default=8,
+                        help="Concurrent test clients for the endpoint load test (default: %(default)s)")
+    parser.add_argument('--requests', type=int, default=50,
+                        help="Requests per client thread (default: %(default)s)")
+    parser.add_argument('--alloc-samples', type=int, default=100,
+                        help="Requests traced with tracemalloc (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--quiet-log', action='store_true',
+                        help="Raise selection.log to WARNING (excludes per-request logging cost)")
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout only)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.quiet_log:
+        selection_logger.setLevel('WARNING')
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='radimo-bench-') as state_dir:
+        isolate_state(state_dir)
+        for worker_count in args.workers:
+            rng = random.Random(args.seed + worker_count)
+            modality_dfs = synthesize_rosters(worker_count, rng)
+
+            install_rosters(modality_dfs)
+            selection = bench_selection(args.selections)
+            install_rosters(modality_dfs)
+            endpoint = bench_endpoint(args.threads, args.requests)
+            install_rosters(modality_dfs)
+            allocations = bench_allocations(args.alloc_samples)
+
+            entry = {
+                'workers': worker_count,
+                'rows_per_modality': {mod: len(df) for mod, df in modality_dfs.items()},
+                'selection': selection,
+                'endpoint': endpoint,
+                'allocations': allocations,
+            }
+            results.append(entry)
+            print(
+                f"workers={worker_count:5d}  select p50={selection['latency_ms'].get('p50')}ms "
+                f"p99={selection['latency_ms'].get('p99')}ms  "
+                f"api {endpoint['throughput_rps']} req/s p99={endpoint['latency_ms'].get('p99')}ms  "
+                f"peak/request={allocations['peak_kib_per_request'].get('p50')}KiB",
+                file=sys.stderr,
+            )
+        data_manager.flush_state()
+
+    report = {
+        'benchmark': 'balancer',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'bench_time': BENCH_NOW.isoformat(),
+        'parameters': {
+            'selections': args.selections,
+            'threads': args.threads,
+            'requests_per_thread': args.requests,
+            'alloc_samples': args.alloc_samples,
+            'seed': args.seed,
+            'quiet_log': args.quiet_log,
+        },
+        'results': results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(payload + '\n')
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""Offline day replay for tuning balancer settings.
+
+Replays a stream of (timestamp, modality, role) requests against one day's
+schedule, built with build_working_hours_from_medweb(), through the same
+selection path as /api/<modality>/<role> (routes._select_and_record: balancer
+selection plus all fairness counter updates). A simulated clock is injected
+into balancer, data_manager and routes, so a day replays as fast as the
+balancer can select; per request it reports selection latency, per day the
+fairness of the resulting weighted assignments.
+
+Request streams:
+- ``--requests FILE``: recorded stream, either the fairness journal
+  (``fairness_journal.jsonl``: ts/mod/skill; the skill a case was assigned
+  with is replayed as its requested role) or a CSV with
+  ``timestamp,modality,role[,strict]`` columns. Times of day are mapped onto
+  the schedule date; every calendar date in the file is one replayed day.
+- ``--synthetic N``: N requests per day from a seeded weekday arrival profile
+  over the modalities/roles the schedule can serve (one seed per day).
+
+Every ``--set key=v1,v2`` adds a BALANCER_SETTINGS dimension; each
+combination replays all days on fresh counters. The journal is disabled and
+state files, the worker name registry and the parsed-CSV cache go to a
+temporary directory that is removed at exit, so uploads/ stays untouched.
+Selection logging is raised to WARNING (logs/selection.log only receives
+warnings) and the precomputation thread stays off.
+Selections match the live balancer; compared with releases before workload
+ratios were rounded (balancer.RATIO_DECIMALS) they agree up to float ties.
+
+Usage:
+    python scripts/simulate_day.py --synthetic 300 --days 500
+    python scripts/simulate_day.py --medweb uploads/master_medweb.csv --date 2025-12-10 \\
+        --requests uploads/fairness_journal.jsonl \\
+        --set imbalance_threshold_pct=10,30,50 --set min_assignments_per_skill=0,3 --output sweep.json
+
+Fairness metrics are computed over workers with scheduled hours, on their
+weighted assignments per scheduled hour (the quantity the balancer evens
+out): coefficient of variation, Gini coefficient and max/min spread,
+averaged over days.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time as time_module
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import balancer
+import data_manager
+import routes
+from config import (
+    APP_CONFIG,
+    BALANCER_SETTINGS,
+    DEFAULT_BALANCER,
+    ROLE_MAP,
+    SKILL_COLUMNS,
+    SKILL_SLUG_MAP,
+    allowed_modalities,
+)
+from lib.state_backend import LocalStateBackend
+from lib.utils import WEIGHTED_SKILL_MARKER, selection_logger
+
+DEFAULT_MEDWEB = os.path.join('test_data', 'medweb_test_multiday.csv')
+DEFAULT_DATE = '2025-12-10'
+
+# Relative request volume per hour of day (weekday radiology pattern)
+HOURLY_PROFILE = [
+    1, 1, 1, 1, 1, 1, 2, 6,
+    10, 12, 12, 11, 9, 10, 11, 10,
+    8, 6, 4, 3, 3, 2, 2, 1,
+]
+
+Request = Tuple[datetime, str, str, bool]  # (timestamp, modality, role, strict)
+
+
+class SimulatedClock:
+    """Stand-in for get_local_berlin_now(); the replay loop sets ``now``."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max/mean of millisecond samples."""
+    if not samples:
+        return {}
+    values = np.asarray(samples, dtype=float)
+    return {
+        'p50': round(float(np.percentile(values, 50)), 4),
+        'p90': round(float(np.percentile(values, 90)), 4),
+        'p99': round(float(np.percentile(values, 99)), 4),
+        'max': round(float(values.max()), 4),
+        'mean': round(float(values.mean()), 4),
+    }
+
+
+def isolate_state(state_dir: str, clock: SimulatedClock) -> None:
+    """Keep the replay in memory: no journal, no shared backend, simulated time."""
+    data_manager.STATE_FILE_PATH = os.path.join(state_dir, 'fairness_state.json')
+    data_manager.STATE_JOURNAL_PATH = os.path.join(state_dir, 'fairness_journal.jsonl')
+    data_manager.WORKER_IDS_PATH = os.path.join(state_dir, 'worker_ids.json')
+    data_manager.MEDWEB_CACHE_DIR = state_dir
+    data_manager.state_backend = LocalStateBackend()
+    balancer.state_backend = data_manager.state_backend
+    balancer.record_assignment = lambda *args, **kwargs: None
+    BALANCER_SETTINGS['precompute_next_assignee'] = False
+    selection_logger.setLevel('WARNING')
+    for module in (balancer, routes, data_manager):
+        module.get_local_berlin_now = clock
+
+
+# -----------------------------------------------------------
+# Schedule
+# -----------------------------------------------------------
+def install_schedule(modality_dfs: Dict[str, pd.DataFrame], day: date) -> None:
+    """Load the day's schedules as live data (without roster auto-import)."""
+    for mod in allowed_modalities:
+        d = data_manager.modality_data[mod]
+        df = modality_dfs.get(mod)
+        d['working_hours_df'] = df
+        d['last_reset_date'] = day  # Keep the daily reset from loading real files
+        d['worker_modifiers'] = df.groupby('PPL')['Modifier'].first().to_dict() if df is not None else {}
+        d['total_work_hours'] = data_manager._calculate_total_work_hours(df)
+        data_manager.mark_schedule_changed(mod)
+    data_manager.global_worker_data['last_reset_date'] = day
+
+
+def reset_counters() -> None:
+    data_manager.global_worker_data['weighted_counts'] = data_manager.new_weighted_counts()
+    data_manager.global_worker_data['assignments_per_mod'] = data_manager.new_assignment_counts()
+    for mod in allowed_modalities:
+        d = data_manager.modality_data[mod]
+        d['draw_counts'] = {}
+        d['skill_counts'] = {skill: {} for skill in SKILL_COLUMNS}
+
+
+def scheduled_hours(modality_dfs: Dict[str, pd.DataFrame]) -> Dict[str, float]:
+    """
+    Hours on shift per canonical worker ID (rows that count for hours).
+
+    The same shift listed under several modalities counts once, so overlapping
+    rows are merged per worker on a minute grid.
+    """
+    minutes: Dict[str, np.ndarray] = {}
+    for df in modality_dfs.values():
+        if df is None or df.empty:
+            continue
+        if 'counts_for_hours' in df.columns:
+            df = df[df['counts_for_hours'] == True]
+        for person, start, end in zip(df['PPL'], df['start_min'], df['end_min']):
+            canonical_id = data_manager.get_canonical_worker_id(person)
+            grid = minutes.setdefault(canonical_id, np.zeros(1440, dtype=bool))
+            start, end = int(start) % 1440, int(end) % 1440
+            if end > start:
+                grid[start:end] = True
+            elif end < start:  # Overnight
+                grid[start:] = True
+                grid[:end] = True
+    return {canonical_id: grid.sum() / 60.0 for canonical_id, grid in minutes.items() if grid.any()}
+
+
+# -----------------------------------------------------------
+# Request streams
+# -----------------------------------------------------------
+def _role_for(value: Any) -> Optional[str]:
+    """Role slug for a role slug or skill column name ('msk', 'MSK', 'Päd')."""
+    text = str(value or '').strip()
+    if text.lower() in ROLE_MAP:
+        return text.lower()
+    return SKILL_SLUG_MAP.get(text)
+
+
+def load_recorded_requests(path: str, day: date) -> Tuple[List[List[Request]], int]:
+    """
+    Read a journal (.jsonl) or CSV stream; returns (one request list per
+    recorded date, number of skipped lines). Times are moved onto ``day``.
+    """
+    raw: List[Tuple[datetime, str, Any, bool]] = []
+    skipped = 0
+    with open(path, encoding='utf-8', newline='') as handle:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    raw.append((datetime.fromisoformat(record['ts']), record['mod'], record['skill'], False))
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+        else:
+            for row in csv.DictReader(handle):
+                try:
+                    strict = str(row.get('strict') or '').strip().lower() in ('1', 'true', 'yes')
+                    raw.append((datetime.fromisoformat(row['timestamp'].strip()), row['modality'], row['role'], strict))
+                except (ValueError, KeyError, AttributeError):
+                    skipped += 1
+
+    streams: Dict[date, List[Request]] = {}
+    for ts, modality, role_value, strict in raw:
+        modality = str(modality or '').strip().lower()
+        role = _role_for(role_value)
+        if modality not in allowed_modalities or role is None:
+            skipped += 1
+            continue
+        ts = ts.replace(tzinfo=None)
+        streams.setdefault(ts.date(), []).append((datetime.combine(day, ts.time()), modality, role, strict))
+    return [sorted(streams[d], key=lambda r: r[0]) for d in sorted(streams)], skipped
+
+
+def request_weights(modality_dfs: Dict[str, pd.DataFrame]) -> List[Tuple[Tuple[str, str], int]]:
+    """(modality, role) pairs the schedule can serve, weighted by rows holding the skill."""
+    weights = []
+    for mod, df in modality_dfs.items():
+        if mod not in allowed_modalities or df is None or df.empty:
+            continue
+        for skill in SKILL_COLUMNS:
+            role = SKILL_SLUG_MAP.get(skill)
+            if role not in ROLE_MAP or skill not in df.columns:
+                continue
+            rows = int(((df[skill] == 1) | (df[skill] == WEIGHTED_SKILL_MARKER)).sum())
+            if rows:
+                weights.append(((mod, role), rows))
+    return weights
+
+
+def synthetic_requests(weights: Sequence[Tuple[Tuple[str, str], int]], count: int,
+                       day: date, rng: random.Random) -> List[Request]:
+    pairs = [pair for pair, _ in weights]
+    pair_weights = [weight for _, weight in weights]
+    start = datetime.combine(day, datetime.min.time())
+    hours = rng.choices(range(24), weights=HOURLY_PROFILE, k=count)
+    stamps = sorted(start + timedelta(hours=hour, seconds=rng.randrange(3600)) for hour in hours)
+    return [
+        (ts, mod, role, False)
+        for ts, (mod, role) in zip(stamps, rng.choices(pairs, weights=pair_weights, k=count))
+    ]
+
+
+# -----------------------------------------------------------
+# Replay
+# -----------------------------------------------------------
+def fairness_metrics(hours: Dict[str, float]) -> Dict[str, float]:
+    """Spread of weighted assignments per scheduled hour over scheduled workers."""
+    weighted = data_manager.global_worker_data['weighted_counts']
+    ratios = np.asarray([weighted.get(cid, 0.0) / max(h, 0.5) for cid, h in hours.items()], dtype=float)
+    if len(ratios) == 0 or ratios.sum() <= 0:
+        return {'cv': 0.0, 'gini': 0.0, 'max_min_ratio': 0.0}
+    ordered = np.sort(ratios)
+    n = len(ordered)
+    gini = float((2 * np.arange(1, n + 1) - n - 1).dot(ordered) / (n * ordered.sum()))
+    return {
+        'cv': float(ratios.std() / ratios.mean()),
+        'gini': gini,
+        'max_min_ratio': float(ordered[-1] / ordered[0]) if ordered[0] > 0 else float('inf'),
+    }
+
+
+def replay_day(requests: Sequence[Request], clock: SimulatedClock,
+               latencies: List[float]) -> Dict[str, int]:
+    """Replay one day on fresh counters; appends per-request milliseconds to ``latencies``."""
+    reset_counters()
+    tally = {'requests': len(requests), 'assigned': 0, 'unassigned': 0, 'weighted': 0, 'cross_modality': 0}
+    perf_counter = time_module.perf_counter
+    for ts, modality, role, strict in requests:
+        clock.now = ts
+        started = perf_counter()
+        with data_manager.state_transaction(modality):
+            result = routes._select_and_record(ts, modality, role, not strict)
+        latencies.append((perf_counter() - started) * 1000)
+        if result is None:
+            tally['unassigned'] += 1
+            continue
+        tally['assigned'] += 1
+        if result['is_weighted']:
+            tally['weighted'] += 1
+        if result['source_modality'] != modality:
+            tally['cross_modality'] += 1
+    return tally
+
+
+def simulate(settings: Dict[str, Any], streams: Sequence[Sequence[Request]],
+             hours: Dict[str, float], clock: SimulatedClock) -> Dict[str, Any]:
+    """Replay every day stream with ``settings`` applied to BALANCER_SETTINGS."""
+    previous = dict(BALANCER_SETTINGS)
+    BALANCER_SETTINGS.update(settings)
+    latencies: List[float] = []
+    totals: Dict[str, int] = {}
+    per_day: Dict[str, List[float]] = {'cv': [], 'gini': [], 'max_min_ratio': []}
+    started = time_module.perf_counter()
+    try:
+        for requests in streams:
+            for key, value in replay_day(requests, clock, latencies).items():
+                totals[key] = totals.get(key, 0) + value
+            for key, value in fairness_metrics(hours).items():
+                per_day[key].append(value)
+    finally:
+        BALANCER_SETTINGS.clear()
+        BALANCER_SETTINGS.update(previous)
+    elapsed = time_module.perf_counter() - started
+
+    fairness = {}
+    for key, values in per_day.items():
+        finite = [v for v in values if np.isfinite(v)]
+        fairness[key] = {
+            'mean': round(float(np.mean(finite)), 4) if finite else None,
+            'p90': round(float(np.percentile(finite, 90)), 4) if finite else None,
+        }
+    return {
+        'settings': settings,
+        'days': len(streams),
+        **totals,
+        'fairness': fairness,
+        'latency_ms': percentiles(latencies),
+        'elapsed_s': round(elapsed, 4),
+        'days_per_minute': round(len(streams) * 60 / elapsed, 1) if elapsed else None,
+    }
+
+
+# -----------------------------------------------------------
+# Sweep driver (also run in worker processes with --jobs)
+# -----------------------------------------------------------
+_context: Dict[str, Any] = {}
+
+
+def prepare(medweb_path: str, day: date, state_dir: str) -> Dict[str, pd.DataFrame]:
+    clock = SimulatedClock(datetime.combine(day, datetime.min.time()))
+    isolate_state(state_dir, clock)
+    modality_dfs = data_manager.build_working_hours_from_medweb(medweb_path, day, APP_CONFIG)
+    install_schedule(modality_dfs, day)
+    _context.update(clock=clock, hours=scheduled_hours(modality_dfs))
+    return modality_dfs
+
+
+def _init_worker(medweb_path: str, day: date, state_dir: str, streams: Sequence[Sequence[Request]]) -> None:
+    prepare(medweb_path, day, state_dir)
+    _context['streams'] = streams
+
+
+def _simulate_in_worker(settings: Dict[str, Any]) -> Dict[str, Any]:
+    return simulate(settings, _context['streams'], _context['hours'], _context['clock'])
+
+
+def parse_setting(text: str) -> Tuple[str, List[Any]]:
+    """'imbalance_threshold_pct=10,30' -> ('imbalance_threshold_pct', [10, 30])."""
+    key, sep, values = text.partition('=')
+    key = key.strip()
+    if not sep or key not in DEFAULT_BALANCER:
+        raise argparse.ArgumentTypeError(
+            f"expected key=v1,v2 with key one of {', '.join(DEFAULT_BALANCER)}"
+        )
+    parsed = []
+    for value in values.split(','):
+        value = value.strip()
+        try:
+            parsed.append(json.loads(value.lower() if value.lower() in ('true', 'false') else value))
+        except ValueError:
+            parsed.append(value)
+    return key, parsed
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay request streams against one day's schedule.")
+    parser.add_argument('--medweb', default=DEFAULT_MEDWEB,
+                        help="Medweb CSV to build the schedule from (default: %(default)s)")
+    parser.add_argument('--date', default=DEFAULT_DATE,
+                        help="Schedule date, YYYY-MM-DD or DD.MM.YYYY (default: %(default)s)")
+    stream = parser.add_mutually_exclusive_group()
+    stream.add_argument('--requests', help="Recorded stream: fairness journal (.jsonl) or CSV")
+    stream.add_argument('--synthetic', type=int, default=300,
+                        help="Synthetic requests per day (default: %(default)s)")
+    parser.add_argument('--days', type=int, default=100,
+                        help="Synthetic days per setting combination (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Replay a recorded stream this many times (default: %(default)s)")
+    parser.add_argument('--set', dest='settings', action='append', type=parse_setting, default=[],
+                        metavar='KEY=V1,V2', help="Balancer setting values to sweep (repeatable)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Worker processes for sweeps (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout only)")
+    return parser.parse_args()
+
+
+def _parse_date(text: str) -> date:
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise SystemExit(f"Invalid --date: {text}")
+
+
+def main() -> None:
+    args = parse_args()
+    day = _parse_date(args.date)
+
+    with tempfile.TemporaryDirectory(prefix='radimo-sim-') as state_dir:
+        modality_dfs = prepare(args.medweb, day, state_dir)
+        if not modality_dfs:
+            raise SystemExit(f"No schedule for {day.isoformat()} in {args.medweb}")
+
+        skipped = 0
+        if args.requests:
+            recorded, skipped = load_recorded_requests(args.requests, day)
+            streams = recorded * max(args.repeat, 1)
+        else:
+            weights = request_weights(modality_dfs)
+            streams = [
+                synthetic_requests(weights, args.synthetic, day, random.Random(args.seed + n))
+                for n in range(args.days)
+            ]
+        if not streams:
+            raise SystemExit("No requests to replay")
+
+        keys = [key for key, _ in args.settings]
+        combinations = [
+            dict(zip(keys, values)) for values in itertools.product(*(values for _, values in args.settings))
+        ]
+        started = time_module.perf_counter()
+        if args.jobs > 1 and len(combinations) > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                     initargs=(args.medweb, day, state_dir, streams)) as pool:
+                results = list(pool.map(_simulate_in_worker, combinations))
+        else:
+            results = [
+                simulate(settings, streams, _context['hours'], _context['clock'])
+                for settings in combinations
+            ]
+        elapsed = time_module.perf_counter() - started
+
+    for entry in results:
+        label = ' '.join(f"{k}={v}" for k, v in entry['settings'].items()) or 'config defaults'
+        print(
+            f"{label}: cv={entry['fairness']['cv']['mean']} gini={entry['fairness']['gini']['mean']} "
+            f"assigned={entry['assigned']} unassigned={entry['unassigned']}  "
+            f"p50={entry['latency_ms'].get('p50')}ms p99={entry['latency_ms'].get('p99')}ms  "
+            f"{entry['days_per_minute']} days/min",
+            file=sys.stderr,
+        )
+
+    total_days = len(streams) * len(combinations)
+    report = {
+        'simulation': 'day_replay',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'parameters': {
+            'medweb': args.medweb,
+            'date': day.isoformat(),
+            'requests': args.requests,
+            'synthetic_per_day': None if args.requests else args.synthetic,
+            'days': len(streams),
+            'skipped_requests': skipped,
+            'seed': args.seed,
+            'jobs': args.jobs,
+            'base_settings': {key: BALANCER_SETTINGS.get(key) for key in DEFAULT_BALANCER},
+        },
+        'schedule_rows': {mod: len(df) for mod, df in modality_dfs.items()},
+        'simulated_days': total_days,
+        'elapsed_s': round(elapsed, 4),
+        'days_per_minute': round(total_days * 60 / elapsed, 1) if elapsed else None,
+        'results': results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(payload + '\n')
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import unittest
+from datetime import time
+
+from lib.intervals import (
+    align_to_shift,
+    interval_from_times,
+    minutes_to_time,
+    overlaps,
+    resolve_later_wins,
+    subtract_intervals,
+)
+
+
+class IntervalFromTimesTest(unittest.TestCase):
+    def test_day_shift(self):
+        self.assertEqual(interval_from_times(time(7, 0), time(15, 30)), (420, 930))
+
+    def test_overnight_shift_ends_next_day(self):
+        self.assertEqual(interval_from_times(time(22, 0), time(6, 0)), (1320, 1800))
+
+    def test_minutes_to_time_wraps(self):
+        self.assertEqual(minutes_to_time(1560), time(2, 0))
+
+
+class AlignToShiftTest(unittest.TestCase):
+    def test_gap_after_midnight_moves_into_overnight_shift(self):
+        shift = interval_from_times(time(22, 0), time(6, 0))
+        gap = align_to_shift(shift, interval_from_times(time(2, 0), time(3, 0)))
+        self.assertEqual(gap, (1560, 1620))
+        self.assertTrue(overlaps(shift, gap))
+        self.assertEqual(subtract_intervals(shift, [gap]), [(1320, 1560), (1620, 1800)])
+
+    def test_gap_before_midnight_stays(self):
+        shift = interval_from_times(time(22, 0), time(6, 0))
+        gap = interval_from_times(time(23, 0), time(23, 30))
+        self.assertEqual(align_to_shift(shift, gap), gap)
+
+    def test_day_shift_is_unchanged(self):
+        shift = interval_from_times(time(8, 0), time(16, 0))
+        gap = interval_from_times(time(2, 0), time(3, 0))
+        self.assertEqual(align_to_shift(shift, gap), gap)
+        self.assertFalse(overlaps(shift, gap))
+
+    def test_gap_after_overnight_shift_end_does_not_overlap(self):
+        shift = interval_from_times(time(22, 0), time(6, 0))
+        gap = align_to_shift(shift, interval_from_times(time(6, 0), time(7, 0)))
+        self.assertFalse(overlaps(shift, gap))
+
+
+class SubtractIntervalsTest(unittest.TestCase):
+    def test_crop_at_start(self):
+        self.assertEqual(subtract_intervals((420, 900), [(400, 480)]), [(480, 900)])
+
+    def test_crop_at_end(self):
+        self.assertEqual(subtract_intervals((420, 900), [(840, 960)]), [(420, 840)])
+
+    def test_split_in_middle(self):
+        self.assertEqual(subtract_intervals((420, 900), [(600, 660)]), [(420, 600), (660, 900)])
+
+    def test_full_cover_removes_interval(self):
+        self.assertEqual(subtract_intervals((420, 900), [(400, 960)]), [])
+
+    def test_overlapping_and_unsorted_cuts(self):
+        cuts = [(700, 760), (600, 660), (640, 680)]
+        self.assertEqual(subtract_intervals((420, 900), cuts), [(420, 600), (680, 700), (760, 900)])
+
+    def test_short_pieces_are_dropped(self):
+        self.assertEqual(subtract_intervals((420, 900), [(425, 895)], min_length=6), [])
+
+    def test_disjoint_cut_keeps_base(self):
+        self.assertEqual(subtract_intervals((420, 900), [(900, 960)]), [(420, 900)])
+
+
+class ResolveLaterWinsTest(unittest.TestCase):
+    def test_later_shift_crops_earlier_one(self):
+        order, ends = resolve_later_wins([(720, 1200), (420, 900)])
+        self.assertEqual(order, [1, 0])
+        self.assertEqual(ends, [720, 1200])
+
+    def test_fully_covered_shift_is_dropped(self):
+        order, ends = resolve_later_wins([(420, 900), (420, 960)])
+        self.assertEqual(order, [0, 1])
+        self.assertEqual(ends, [None, 960])
+
+    def test_non_overlapping_shifts_are_kept(self):
+        order, ends = resolve_later_wins([(420, 720), (780, 1020)])
+        self.assertEqual(order, [0, 1])
+        self.assertEqual(ends, [720, 1020])
+
+    def test_overnight_shift_after_day_shift(self):
+        order, ends = resolve_later_wins([(1260, 1860), (420, 1320)])
+        self.assertEqual(order, [1, 0])
+        self.assertEqual(ends, [1260, 1860])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import pandas as pd
+
+import data_manager
+from data_manager import parse_medweb_dates, read_medweb_csv, sniff_csv_format
+
+HEADER = '"Datum","Name des Mitarbeiters","Beschreibung der Aktivität"\n'
+ROWS = [
+    ('10.12.2025', 'Dr. Müller', 'CT Assistent'),
+    ('2025-12-10', 'Dr. Weber', 'CT Spätdienst'),
+    ('11.12.2025', 'Dr. Schmidt', 'MR Assistent'),
+    ('12/12/2025', 'Dr. Becker', 'CT Assistent'),
+    ('11.12.2025', 'Dr. Wagner', 'MR Spätdienst'),
+    ('kein Datum', 'Dr. Fischer', 'Sonstiges'),
+]
+
+
+class MedwebCsvTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data, name='master.csv'):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def write_rows(self, rows=ROWS, separator=',', encoding='utf-8'):
+        lines = [HEADER.replace(',', separator)]
+        lines += [separator.join(f'"{value}"' for value in row) + '\n' for row in rows]
+        return self.write(''.join(lines).encode(encoding))
+
+
+class SniffCsvFormatTest(MedwebCsvTestCase):
+    def test_comma_utf8_with_bom(self):
+        path = self.write(b'\xef\xbb\xbf' + HEADER.encode('utf-8'))
+        self.assertEqual(sniff_csv_format(path), (',', 'utf-8-sig'))
+
+    def test_semicolon(self):
+        path = self.write_rows(separator=';')
+        self.assertEqual(sniff_csv_format(path), (';', 'utf-8-sig'))
+
+    def test_latin1(self):
+        path = self.write_rows(encoding='latin1')
+        self.assertEqual(sniff_csv_format(path), (',', 'latin1'))
+
+    def test_character_cut_at_sample_end_stays_utf8(self):
+        data = HEADER.encode('utf-8')
+        cut = data.index('ä'.encode('utf-8')) + 1
+        path = self.write(data)
+        with mock.patch.object(data_manager, '_CSV_SNIFF_BYTES', cut):
+            self.assertEqual(sniff_csv_format(path), (',', 'utf-8-sig'))
+
+    def test_empty_file(self):
+        self.assertEqual(sniff_csv_format(self.write(b'')), (',', 'utf-8-sig'))
+
+
+class ParseMedwebDatesTest(unittest.TestCase):
+    def test_formats_and_cache(self):
+        cache = {}
+        values = pd.Series(['10.12.2025', '2025-12-11', '12/12/2025', 'kein Datum', None])
+        parsed = parse_medweb_dates(values, cache)
+        self.assertEqual(parsed.tolist(), [date(2025, 12, 10), date(2025, 12, 11), date(2025, 12, 12), None, None])
+        self.assertEqual(cache['10.12.2025'], date(2025, 12, 10))
+        self.assertIsNone(cache['kein Datum'])
+
+
+class ReadMedwebCsvTest(MedwebCsvTestCase):
+    def read(self, path, target_dates=None, chunk_rows=2):
+        with mock.patch.object(data_manager, 'MEDWEB_CSV_CHUNK_ROWS', chunk_rows):
+            return read_medweb_csv(path, 'Datum', target_dates)
+
+    def test_chunked_filter_matches_whole_file(self):
+        path = self.write_rows()
+        full, _ = self.read(path, chunk_rows=100)
+        for day in (date(2025, 12, 10), date(2025, 12, 11), date(2025, 12, 12)):
+            rows, _ = self.read(path, {day})
+            expected = full[full['Datum_parsed'] == day].reset_index(drop=True)
+            pd.testing.assert_frame_equal(rows, expected)
+
+    def test_keeps_only_target_dates_and_lists_all_dates(self):
+        rows, available = self.read(self.write_rows(), {date(2025, 12, 11)})
+        self.assertEqual(rows['Name des Mitarbeiters'].tolist(), ['Dr. Schmidt', 'Dr. Wagner'])
+        self.assertEqual(set(rows['Datum_parsed']), {date(2025, 12, 11)})
+        self.assertEqual(available, [date(2025, 12, 10), date(2025, 12, 11), date(2025, 12, 12)])
+
+    def test_no_matching_rows(self):
+        rows, available = self.read(self.write_rows(), {date(2026, 1, 1)})
+        self.assertTrue(rows.empty)
+        self.assertIn('Datum_parsed', rows.columns)
+        self.assertEqual(len(available), 3)
+
+    def test_semicolon_and_latin1(self):
+        path = self.write_rows(separator=';', encoding='latin1')
+        rows, _ = self.read(path, {date(2025, 12, 10)})
+        self.assertEqual(rows['Name des Mitarbeiters'].tolist(), ['Dr. Müller', 'Dr. Weber'])
+
+    def test_latin1_after_the_sniffed_sample(self):
+        path = self.write(HEADER.encode('utf-8') + '"10.12.2025","Dr. Müller","CT"\n'.encode('latin1'))
+        with mock.patch.object(data_manager, '_CSV_SNIFF_BYTES', len(HEADER.encode('utf-8'))):
+            rows, _ = self.read(path, {date(2025, 12, 10)})
+        self.assertEqual(rows['Name des Mitarbeiters'].tolist(), ['Dr. Müller'])
+
+    def test_missing_date_column(self):
+        with self.assertRaises(ValueError):
+            read_medweb_csv(self.write_rows(), 'WorkDate')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from datetime import time
+from unittest import mock
+
+import pandas as pd
+
+import data_manager
+from data_manager import (
+    _delete_worker_from_schedule,
+    _shared_sync,
+    mark_schedule_changed,
+    modality_data,
+    publish_schedule_changes,
+    schedule_changes_since,
+    schedule_version_epoch,
+    sync_shared_state,
+)
+from lib.state_backend import SQLiteStateBackend
+
+MODALITY = data_manager.allowed_modalities[0]
+TRACKED_KEYS = (
+    'working_hours_df', 'schedule_version', 'rows_base_version', 'row_versions',
+    'shared_schedule_version', 'shared_rows_base_version', 'shared_row_versions',
+)
+
+
+def make_schedule(names, gap_ids=None):
+    return pd.DataFrame({
+        'PPL': [f'{name} ({name})' for name in names],
+        'start_time': [time(7, 0)] * len(names),
+        'end_time': [time(15, 0)] * len(names),
+        'Modifier': [1.0] * len(names),
+        'gap_id': gap_ids or [None] * len(names),
+    })
+
+
+class ScheduleChangesTestCase(unittest.TestCase):
+    def setUp(self):
+        data_dict = modality_data[MODALITY]
+        self.saved = {key: data_dict[key] for key in TRACKED_KEYS if key in data_dict}
+        for key in TRACKED_KEYS:
+            data_dict.pop(key, None)
+        patch = mock.patch.object(data_manager, 'request_schedule_backup')
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        data_dict = modality_data[MODALITY]
+        for key in TRACKED_KEYS:
+            data_dict.pop(key, None)
+        data_dict.update(self.saved)
+
+    def load(self, schedule):
+        modality_data[MODALITY]['working_hours_df'] = schedule
+        return mark_schedule_changed(MODALITY)
+
+    def changes(self, since):
+        return schedule_changes_since(MODALITY, False, since)
+
+
+class ScheduleChangesSinceTest(ScheduleChangesTestCase):
+    def test_full_reload_without_or_outside_version(self):
+        version = self.load(make_schedule('ABCD'))
+        self.assertEqual(self.changes(None), (version, None))
+        self.assertEqual(self.changes(version - 1), (version, None))
+        self.assertEqual(self.changes(version + 1), (version, None))
+        self.assertEqual(self.changes(version), (version, []))
+
+    def test_row_edit(self):
+        base = self.load(make_schedule('ABCD'))
+        version = mark_schedule_changed(MODALITY, changed_rows=[2])
+        self.assertEqual(self.changes(base), (version, [2]))
+        self.assertEqual(self.changes(version), (version, []))
+
+    def test_delete_returns_shifted_rows(self):
+        base = self.load(make_schedule('ABCDE'))
+        self.assertTrue(_delete_worker_from_schedule(MODALITY, 1, False)[0])
+        version, rows = self.changes(base)
+        self.assertEqual(rows, [1, 2, 3])
+        self.assertEqual(len(modality_data[MODALITY]['working_hours_df']), 4)
+        self.assertEqual(version, base + 1)
+
+    def test_delete_drops_edits_past_the_new_end(self):
+        base = self.load(make_schedule('ABCDE'))
+        mark_schedule_changed(MODALITY, changed_rows=[4])
+        self.assertTrue(_delete_worker_from_schedule(MODALITY, 3, False)[0])
+        self.assertEqual(self.changes(base)[1], [3])
+        self.assertNotIn(4, modality_data[MODALITY]['row_versions'])
+
+    def test_delete_linked_gap_rows(self):
+        base = self.load(make_schedule('ABBCD', gap_ids=[None, 'g1', 'g1', None, None]))
+        self.assertTrue(_delete_worker_from_schedule(MODALITY, 2, False)[0])
+        self.assertEqual(self.changes(base)[1], [1, 2])
+        self.assertEqual(modality_data[MODALITY]['working_hours_df']['PPL'].tolist(), ['A (A)', 'C (C)', 'D (D)'])
+
+    def test_delete_last_row(self):
+        base = self.load(make_schedule('AB'))
+        self.assertTrue(_delete_worker_from_schedule(MODALITY, 1, False)[0])
+        self.assertEqual(self.changes(base)[1], [])
+
+
+class SharedScheduleChangesTest(ScheduleChangesTestCase):
+    """Versions and row deltas come from the shared backend, identical in every worker."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteStateBackend(os.path.join(self.tmp.name, 'state.sqlite'))
+        saved_sync = {key: _shared_sync[key] for key in ('schedule_versions', 'dirty')}
+        _shared_sync.update(schedule_versions={}, dirty={})
+        patch = mock.patch.object(data_manager, 'state_backend', self.backend)
+        patch.start()
+
+        def restore():
+            patch.stop()
+            _shared_sync.update(saved_sync)
+            self.backend._connection().close()
+            self.tmp.cleanup()
+        self.addCleanup(restore)
+
+    def become_other_worker(self):
+        data_dict = modality_data[MODALITY]
+        for key in TRACKED_KEYS:
+            data_dict.pop(key, None)
+        _shared_sync['schedule_versions'] = {}
+        with self.backend.transaction():
+            sync_shared_state()
+
+    def test_epoch_is_the_backends(self):
+        self.assertEqual(schedule_version_epoch(), self.backend.epoch)
+        other = SQLiteStateBackend(self.backend.path)
+        self.assertEqual(other.epoch, self.backend.epoch)
+        other._connection().close()
+
+    def test_unpublished_edit_is_a_full_reload(self):
+        self.load(make_schedule('ABC'))
+        self.assertEqual(self.changes(0), (0, None))
+        publish_schedule_changes()
+        self.assertEqual(self.changes(1), (1, []))
+
+    def test_other_worker_serves_the_same_deltas_after_deletes(self):
+        self.load(make_schedule('ABCDE'))
+        publish_schedule_changes()
+        mark_schedule_changed(MODALITY, changed_rows=[0])
+        publish_schedule_changes()
+        self.assertTrue(_delete_worker_from_schedule(MODALITY, 2, False)[0])
+        publish_schedule_changes()
+        expected = {since: self.changes(since) for since in (1, 2, 3)}
+        self.assertEqual(expected, {1: (3, [0, 2, 3]), 2: (3, [2, 3]), 3: (3, [])})
+
+        self.become_other_worker()
+        self.assertEqual({since: self.changes(since) for since in (1, 2, 3)}, expected)
+        self.assertEqual(len(modality_data[MODALITY]['working_hours_df']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
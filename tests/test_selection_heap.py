@@ -0,0 +1,105 @@
+import heapq
+import random
+import unittest
+
+import numpy as np
+
+from balancer import _quantize_ratios, _select_least_loaded
+
+
+class SelectionHeapTest(unittest.TestCase):
+    """_select_least_loaded against a scan over the rows in schedule order."""
+
+    def setUp(self):
+        self.weights = []
+        self.hours = []
+
+    def row_ratio(self, pos):
+        return float(_quantize_ratios(np.float64(self.weights[pos]) / max(self.hours[pos], 0.5)))
+
+    def make_state(self):
+        rows = list(range(len(self.weights)))
+        heap = [(self.row_ratio(pos), pos) for pos in rows]
+        heapq.heapify(heap)
+        return {'rows': rows, 'heap': heap}
+
+    def scan(self, valid, prefer=None):
+        # First row with the lowest ratio, preferred rows first (baseline row order)
+        best = None
+        for want_preferred in ((True, False) if prefer else (False,)):
+            for pos in range(len(self.weights)):
+                if not valid[pos] or (want_preferred and not prefer(pos)):
+                    continue
+                if best is None or self.row_ratio(pos) < best[1]:
+                    best = (pos, self.row_ratio(pos))
+            if best is not None:
+                return best
+        return None
+
+    def test_ties_resolve_to_lowest_row(self):
+        self.weights = [2.0, 1.0, 1.0, 1.0]
+        self.hours = [8.0, 8.0, 8.0, 8.0]
+        state = self.make_state()
+        valid = np.array([True, False, True, True])
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio), (2, 0.125))
+
+    def test_float_rounding_differences_are_ties(self):
+        self.weights = [0.1 + 0.2, 0.3]
+        self.hours = [1.0, 1.0]
+        state = self.make_state()
+        valid = np.array([True, True])
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio)[0], 0)
+
+    def test_stale_keys_are_rekeyed(self):
+        self.weights = [0.0, 1.0, 2.0]
+        self.hours = [8.0, 8.0, 8.0]
+        state = self.make_state()
+        valid = np.ones(3, dtype=bool)
+        self.weights[0] = 3.0
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio), (1, 0.125))
+        self.assertIn((0.375, 0), state['heap'])
+        self.assertEqual(len(state['heap']), 3)
+
+    def test_top_count_going_down_rebuilds_heap(self):
+        self.weights = [1.0, 2.0, 3.0]
+        self.hours = [8.0, 8.0, 8.0]
+        state = self.make_state()
+        self.weights = [0.5, 2.0, 0.0]
+        valid = np.ones(3, dtype=bool)
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio), (2, 0.0))
+
+    def test_prefer_falls_back_to_best_valid_row(self):
+        self.weights = [1.0, 2.0, 3.0]
+        self.hours = [8.0, 8.0, 8.0]
+        state = self.make_state()
+        valid = np.ones(3, dtype=bool)
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio, prefer=lambda pos: pos == 2)[0], 2)
+        self.assertEqual(_select_least_loaded(state, valid, self.row_ratio, prefer=lambda pos: False)[0], 0)
+        self.assertEqual(len(state['heap']), 3)
+
+    def test_no_valid_row(self):
+        self.weights = [1.0]
+        self.hours = [8.0]
+        self.assertIsNone(_select_least_loaded(self.make_state(), np.zeros(1, dtype=bool), self.row_ratio))
+
+    def test_matches_row_order_scan_over_many_assignments(self):
+        rng = random.Random(7)
+        self.weights = [float(rng.randint(0, 3)) for _ in range(40)]
+        self.hours = [rng.choice([0.0, 4.0, 8.0, 12.0]) for _ in range(40)]
+        state = self.make_state()
+        for step in range(500):
+            valid = np.array([rng.random() < 0.7 for _ in range(40)])
+            preferred = {pos for pos in range(40) if rng.random() < 0.2}
+            prefer = (lambda pos: pos in preferred) if step % 2 else None
+            expected = self.scan(valid, prefer)
+            self.assertEqual(_select_least_loaded(state, valid, self.row_ratio, prefer=prefer), expected)
+            if expected is not None:
+                self.weights[expected[0]] += rng.choice([0.5, 1.0, 1.0 / 3.0])
+            if step % 100 == 99:
+                # Resets replace the counts; _get_selection_heap then rebuilds the heap
+                self.weights = [0.0] * 40
+                state = self.make_state()
+
+
+if __name__ == '__main__':
+    unittest.main()
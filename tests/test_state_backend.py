@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+from lib.state_backend import LocalStateBackend, SQLiteStateBackend, create_state_backend
+
+
+class SQLiteScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteStateBackend(os.path.join(self.tmp.name, 'state.sqlite'))
+
+    def tearDown(self):
+        self.backend._connection().close()
+        self.tmp.cleanup()
+
+    def test_schedule_round_trip_is_bytes_and_json(self):
+        meta = json.dumps({'info_texts': ['a']})
+        self.assertEqual(self.backend.publish_schedule('live:ct', b'PAR1data', meta), 1)
+        self.assertEqual(self.backend.read_schedule('live:ct'), (1, b'PAR1data', meta))
+
+    def test_schedule_without_frame(self):
+        self.backend.publish_schedule('staged:mr', None, '{}')
+        self.assertEqual(self.backend.read_schedule('staged:mr'), (1, None, '{}'))
+        self.assertIsNone(self.backend.read_schedule('live:mr'))
+
+    def test_sync_markers_track_every_change(self):
+        self.assertEqual(self.backend.sync_markers(), (0, 0, {}))
+        self.backend.publish_schedule('live:ct', None, '{}')
+        self.backend.publish_schedule('live:ct', None, '{}')
+        seq = self.backend.append_assignment(
+            {'ts': '2025-12-10T10:00:00', 'mod': 'ct', 'ppl': 'A (A)', 'id': 'A', 'skill': 'normal', 'w': 1.0}
+        )
+        self.assertEqual(self.backend.sync_markers(), (0, seq, {'live:ct': 2}))
+        self.backend.write_snapshot('{}', seq)
+        self.assertEqual(self.backend.sync_markers(), (1, 0, {'live:ct': 2}))
+
+
+class CreateStateBackendTest(unittest.TestCase):
+    def test_unknown_type_falls_back_to_local(self):
+        self.assertIsInstance(create_state_backend({'type': 'redis'}), LocalStateBackend)
+
+    def test_sqlite_is_refused_under_gevent(self):
+        monkey = types.ModuleType('gevent.monkey')
+        monkey.is_module_patched = lambda name: name == 'threading'
+        sys.modules['gevent.monkey'] = monkey
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                with self.assertRaises(RuntimeError):
+                    create_state_backend({'type': 'sqlite', 'path': os.path.join(tmp, 'state.sqlite')})
+        finally:
+            del sys.modules['gevent.monkey']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import data_manager
+from data_manager import (
+    _apply_assignment_record,
+    _journal_state,
+    _replay_state_journal,
+    _state_io_lock,
+    _write_pending_state,
+    allowed_modalities,
+    flush_state,
+    global_worker_data,
+    load_state,
+    modality_data,
+    new_assignment_counts,
+    new_weighted_counts,
+    record_assignment,
+)
+
+MODALITY = allowed_modalities[0]
+SKILL = data_manager.SKILL_COLUMNS[0]
+
+
+def reset_counters():
+    for d in modality_data.values():
+        d['draw_counts'] = {}
+        d['skill_counts'] = {skill: {} for skill in data_manager.SKILL_COLUMNS}
+    global_worker_data['weighted_counts'] = new_weighted_counts()
+    global_worker_data['assignments_per_mod'] = new_assignment_counts()
+
+
+class StateJournalTestCase(unittest.TestCase):
+    """Runs the journal against a temp directory with empty counters."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with _state_io_lock:
+            self.patches = [
+                mock.patch.object(data_manager, name, os.path.join(self.tmp.name, filename))
+                for name, filename in (
+                    ('STATE_FILE_PATH', 'fairness_state.json'),
+                    ('STATE_JOURNAL_PATH', 'fairness_state.journal'),
+                    ('WORKER_IDS_PATH', 'worker_ids.json'),
+                )
+            ]
+            for patch in self.patches:
+                patch.start()
+            self.reset_journal()
+        reset_counters()
+
+    def tearDown(self):
+        with _state_io_lock:
+            self.reset_journal()
+            for patch in self.patches:
+                patch.stop()
+        reset_counters()
+        self.tmp.cleanup()
+
+    def reset_journal(self):
+        # Caller holds _state_io_lock
+        if _journal_state['file'] is not None:
+            _journal_state['file'].close()
+        _journal_state.update(file=None, seq=0, pending=[], unsynced=0, since_compaction=0, snapshot_requested=False)
+
+    def assign(self, person):
+        # Like the request path: count the assignment, then journal it
+        _apply_assignment_record({'mod': MODALITY, 'ppl': person, 'id': person, 'skill': SKILL, 'w': 1.0})
+        record_assignment(MODALITY, person, person, SKILL, 1.0)
+
+    def write_journal(self):
+        with _state_io_lock:
+            _write_pending_state(fsync=True)
+
+    def journal_lines(self):
+        with open(data_manager.STATE_JOURNAL_PATH, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def assert_draws(self, expected):
+        self.assertEqual(modality_data[MODALITY]['draw_counts'], expected)
+        self.assertEqual(
+            global_worker_data['weighted_counts'].to_dict(),
+            {canonical_id: float(n) for canonical_id, n in expected.items()}
+        )
+
+
+class JournalReplayTest(StateJournalTestCase):
+    def test_records_are_appended_with_increasing_seq(self):
+        self.assign('A')
+        self.assign('B')
+        self.write_journal()
+        self.assertEqual([json.loads(line)['seq'] for line in self.journal_lines()], [1, 2])
+
+    def test_replay_restores_counters(self):
+        for person in ('A', 'B', 'A'):
+            self.assign(person)
+        self.write_journal()
+        reset_counters()
+
+        self.assertEqual(_replay_state_journal(0), 3)
+        self.assert_draws({'A': 2, 'B': 1})
+        self.assertEqual(modality_data[MODALITY]['skill_counts'][SKILL], {'A': 2, 'B': 1})
+        self.assertEqual(_journal_state['seq'], 3)
+
+    def test_torn_last_line_is_skipped_and_terminated(self):
+        self.assign('A')
+        self.write_journal()
+        with open(data_manager.STATE_JOURNAL_PATH, 'a', encoding='utf-8') as f:
+            f.write('{"seq":2,"mod":"' + MODALITY)
+        reset_counters()
+
+        self.assertEqual(_replay_state_journal(0), 1)
+        self.assert_draws({'A': 1})
+
+        # The next append starts on a fresh line and stays readable
+        self.assign('B')
+        self.write_journal()
+        self.assertEqual(json.loads(self.journal_lines()[-1])['ppl'], 'B')
+        reset_counters()
+        self.assertEqual(_replay_state_journal(0), 2)
+        self.assert_draws({'A': 1, 'B': 1})
+
+
+class SnapshotHandoffTest(StateJournalTestCase):
+    def test_snapshot_truncates_journal_and_keeps_seq(self):
+        self.assign('A')
+        self.assign('B')
+        flush_state()
+        with open(data_manager.STATE_FILE_PATH, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['journal_seq'], 2)
+        self.assertEqual(self.journal_lines(), [])
+
+        self.assign('A')
+        self.write_journal()
+        self.assertEqual(json.loads(self.journal_lines()[0])['seq'], 3)
+
+        reset_counters()
+        with _state_io_lock:
+            self.reset_journal()
+        load_state()
+        self.assert_draws({'A': 2, 'B': 1})
+        self.assertEqual(_journal_state['seq'], 3)
+
+    def test_replay_skips_records_covered_by_snapshot(self):
+        # Crash after the snapshot was replaced but before the journal was truncated
+        self.assign('A')
+        self.assign('B')
+        self.write_journal()
+        stale_journal = self.journal_lines()
+        flush_state()
+        with open(data_manager.STATE_JOURNAL_PATH, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(stale_journal) + '\n')
+
+        reset_counters()
+        with _state_io_lock:
+            self.reset_journal()
+        load_state()
+        self.assert_draws({'A': 1, 'B': 1})
+
+    def test_skipped_snapshot_is_requested_again(self):
+        self.assign('A')
+        with mock.patch.object(data_manager, 'acquire_whole_state', return_value=False):
+            with _state_io_lock:
+                written = _write_pending_state(force_snapshot=True, fsync=True, timeout=0)
+        self.assertFalse(written)
+        self.assertTrue(_journal_state['snapshot_requested'])
+        self.assertFalse(os.path.exists(data_manager.STATE_FILE_PATH))
+        self.assertEqual(len(self.journal_lines()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from lib.worker_counters import AssignmentCounts, WeightedCounts, WorkerIndex
+
+MODALITIES = ['ct', 'mr']
+SKILLS = ['Notfall', 'MSK']
+
+
+class WorkerIndexTest(unittest.TestCase):
+    def test_codes_are_dense_and_stable(self):
+        index = WorkerIndex()
+        self.assertEqual([index.code('A'), index.code('B'), index.code('A')], [0, 1, 0])
+        self.assertEqual(index.codes_for(['B', 'C']).tolist(), [1, 2])
+        self.assertEqual(len(index), 3)
+
+    def test_compact_renumbers_kept_ids_in_order(self):
+        index = WorkerIndex()
+        for canonical_id in 'ABCD':
+            index.code(canonical_id)
+        self.assertEqual(index.compact({'B', 'D'}), 2)
+        self.assertEqual(index.ids, ['B', 'D'])
+        self.assertEqual(index.codes, {'B': 0, 'D': 1})
+        self.assertEqual(index.generation, 1)
+
+    def test_compact_without_drops_keeps_generation(self):
+        index = WorkerIndex()
+        index.code('A')
+        self.assertEqual(index.compact({'A', 'unknown'}), 0)
+        self.assertEqual(index.generation, 0)
+
+
+class WeightedCountsTest(unittest.TestCase):
+    def test_dict_api(self):
+        counts = WeightedCounts(WorkerIndex(), {'A': 1.5})
+        counts.add('A', 1.0)
+        counts.add('B', 0.5)
+        self.assertEqual(counts['A'], 2.5)
+        self.assertIsNone(counts.get('C'))
+        self.assertNotIn('C', counts)
+        del counts['B']
+        self.assertEqual(counts.to_dict(), {'A': 2.5})
+        self.assertEqual(len(counts), 1)
+
+    def test_values_for_unknown_codes_is_zero(self):
+        index = WorkerIndex()
+        counts = WeightedCounts(index, {'A': 2.0})
+        codes = index.codes_for(['A', 'B'])
+        np.testing.assert_array_equal(counts.values_for(codes), [2.0, 0.0])
+
+    def test_grows_past_initial_capacity(self):
+        counts = WeightedCounts(WorkerIndex())
+        for i in range(200):
+            counts.add(f'W{i}', float(i))
+        self.assertEqual(len(counts), 200)
+        self.assertEqual(counts['W199'], 199.0)
+
+    def test_rebuilt_after_compact(self):
+        index = WorkerIndex()
+        counts = WeightedCounts(index, {'A': 1.0, 'B': 2.0, 'C': 3.0})
+        data = counts.to_dict()
+        index.compact({'C'})
+        counts = WeightedCounts(index, {k: v for k, v in data.items() if k in index.codes})
+        self.assertEqual(counts.to_dict(), {'C': 3.0})
+        self.assertEqual(counts.values_for(index.codes_for(['C'])).tolist(), [3.0])
+
+
+class AssignmentCountsTest(unittest.TestCase):
+    def setUp(self):
+        self.index = WorkerIndex()
+        self.counts = AssignmentCounts(self.index, MODALITIES, SKILLS)
+
+    def test_add_counts_skill_and_total(self):
+        self.counts.add('ct', 'A', 'MSK')
+        self.counts.add('ct', 'A', 'unknown skill')
+        self.assertEqual(dict(self.counts['ct']['A']), {'Notfall': 0, 'MSK': 1, 'total': 2})
+        self.assertNotIn('A', self.counts['mr'])
+
+    def test_worker_totals_sum_modalities(self):
+        self.counts.add('ct', 'A', 'Notfall')
+        self.counts.add('mr', 'A', 'Notfall')
+        self.assertEqual(self.counts.worker_totals('A'), {'Notfall': 2, 'MSK': 0, 'total': 2})
+        self.assertEqual(self.counts.worker_totals('B'), {'Notfall': 0, 'MSK': 0, 'total': 0})
+
+    def test_to_dict_round_trip(self):
+        data = {'ct': {'A': {'Notfall': 1, 'MSK': 0, 'total': 1}}, 'mr': {}}
+        counts = AssignmentCounts(WorkerIndex(), MODALITIES, SKILLS, data)
+        self.assertEqual(counts.to_dict(), data)
+
+    def test_assigning_a_modality_replaces_it(self):
+        self.counts.add('ct', 'A', 'MSK')
+        self.counts['ct'] = {'B': {'total': 3}}
+        self.assertEqual(list(self.counts['ct']), ['B'])
+        self.assertEqual(self.counts['ct']['B']['total'], 3)
+        with self.assertRaises(TypeError):
+            del self.counts['ct']
+
+
+if __name__ == '__main__':
+    unittest.main()
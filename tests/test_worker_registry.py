@@ -0,0 +1,72 @@
+import unittest
+
+from lib.worker_registry import WorkerNameRegistry, parse_canonical_id
+
+
+class ParseCanonicalIdTest(unittest.TestCase):
+    def test_abbreviation_in_parentheses(self):
+        self.assertEqual(parse_canonical_id('Dr. Anna Müller (AM)'), 'AM')
+
+    def test_name_without_abbreviation_is_its_own_id(self):
+        self.assertEqual(parse_canonical_id('Anna Müller'), 'Anna Müller')
+        self.assertEqual(parse_canonical_id('Anna ()'), 'Anna ()')
+
+
+class WorkerNameRegistryTest(unittest.TestCase):
+    def test_variants_share_the_canonical_id(self):
+        registry = WorkerNameRegistry()
+        self.assertEqual(registry.canonical_id(' Dr. Anna Müller (AM) '), 'AM')
+        self.assertEqual(registry.canonical_id('A. Müller (AM)'), 'AM')
+        self.assertEqual(registry.variants('AM'), ['Dr. Anna Müller (AM)', 'A. Müller (AM)'])
+        self.assertEqual(registry.by_canonical_id(), {'AM': ['Dr. Anna Müller (AM)', 'A. Müller (AM)']})
+
+    def test_compact_evicts_idle_variants(self):
+        registry = WorkerNameRegistry()
+        registry.canonical_id('Old (OLD)')
+        registry.canonical_id('Kept (KPT)')
+        for _ in range(2):
+            registry.compact(max_idle_epochs=2)
+            registry.canonical_id('Seen (SEE)')
+        self.assertEqual(registry.compact(keep=['Kept (KPT)'], max_idle_epochs=2), 1)
+        self.assertEqual(set(registry.by_canonical_id()), {'KPT', 'SEE'})
+        self.assertEqual(registry.variants('OLD'), [])
+
+    def test_compact_enforces_size_limit_least_recently_seen_first(self):
+        registry = WorkerNameRegistry(max_variants=2)
+        for name in ('A (A)', 'B (B)', 'C (C)'):
+            registry.compact()
+            registry.canonical_id(name)
+        self.assertEqual(registry.compact(), 1)
+        self.assertEqual(set(registry.by_canonical_id()), {'B', 'C'})
+
+    def test_to_dict_load_round_trip(self):
+        registry = WorkerNameRegistry()
+        registry.compact()
+        registry.canonical_id('Anna (AM)')
+        registry.register('Anna M.', 'AM')
+
+        restored = WorkerNameRegistry()
+        restored.load(registry.to_dict())
+        self.assertEqual(restored.to_dict(), registry.to_dict())
+        self.assertEqual(restored.epoch, 1)
+
+    def test_load_accepts_legacy_flat_map(self):
+        registry = WorkerNameRegistry()
+        registry.load({'Anna (AM)': 'AM', 'Anna M.': 'AM'})
+        self.assertEqual(registry.variants('AM'), ['Anna (AM)', 'Anna M.'])
+        self.assertEqual(registry.epoch, 0)
+
+    def test_load_keeps_known_variants(self):
+        registry = WorkerNameRegistry()
+        registry.register('Anna', 'AM')
+        registry.load({'Anna': 'XX'})
+        self.assertEqual(registry.canonical_id('Anna'), 'AM')
+
+    def test_load_ignores_empty_payload(self):
+        registry = WorkerNameRegistry()
+        registry.load(None)
+        self.assertEqual(len(registry), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()